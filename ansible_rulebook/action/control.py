@@ -14,7 +14,7 @@
 
 import asyncio
 from dataclasses import dataclass
-from typing import List
+from typing import List, MutableMapping
 
 
 @dataclass(frozen=True)
@@ -31,9 +31,10 @@ class Control:
        it could be a directory or an inventory name from the controller
     hosts: list[str]
        The list of servers passed into ansible-playbook or controller
-    variables: dict
+    variables: MutableMapping
        The variables passed in from the command line plus the matching event
-       data with event or events key.
+       data with event or events key. The event data is usually a layer of
+       a ChainMap over the shared variables, which must not be modified.
     project_data_file: str
        This is the directory where the collection data is sent from the
        AAP server over the websocket is untarred to. The collection could
@@ -50,5 +51,5 @@ class Control:
     queue: asyncio.Queue
     inventory: str
     hosts: List[str]
-    variables: dict
+    variables: MutableMapping
     project_data_file: str
@@ -17,9 +17,9 @@ import sys
 from dataclasses import asdict
 
 import dpath
-from drools import ruleset as lang
 
-from ansible_rulebook import terminal
+from ansible_rulebook import rule_engine as lang, terminal
+from ansible_rulebook.engine_executor import run_in_engine
 
 from .control import Control
 from .helper import Helper
@@ -78,7 +78,11 @@ class Debug:
             self.display.banner("debug: kwargs", args, pretty=True)
             self.display.banner(
                 "debug: facts",
-                lang.get_facts(self.helper.metadata.rule_set),
+                await run_in_engine(
+                    self.helper.metadata.rule_set,
+                    lang.get_facts,
+                    self.helper.metadata.rule_set,
+                ),
                 pretty=True,
             )
 
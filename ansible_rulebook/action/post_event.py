@@ -14,7 +14,8 @@
 
 import logging
 
-from drools import ruleset as lang
+from ansible_rulebook import rule_engine as lang
+from ansible_rulebook.engine_executor import run_in_engine
 
 from .control import Control
 from .helper import Helper
@@ -41,7 +42,9 @@ class PostEvent:
         self.action_args = action_args
 
     async def __call__(self):
-        lang.post(
+        await run_in_engine(
+            self.action_args["ruleset"],
+            lang.post,
             self.action_args["ruleset"],
             self.helper.embellish_internal_event(self.action_args["event"]),
         )
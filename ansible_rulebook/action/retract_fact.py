@@ -14,7 +14,8 @@
 
 import logging
 
-from drools import ruleset as lang
+from ansible_rulebook import rule_engine as lang
+from ansible_rulebook.engine_executor import run_in_engine
 
 from .control import Control
 from .helper import Helper
@@ -53,7 +54,9 @@ class RetractFact:
         else:
             exclude_keys = []
 
-        lang.retract_matching_facts(
+        await run_in_engine(
+            self.action_args["ruleset"],
+            lang.retract_matching_facts,
             self.action_args["ruleset"],
             self.action_args["fact"],
             partial,
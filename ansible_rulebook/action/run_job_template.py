@@ -17,10 +17,9 @@ import logging
 import uuid
 from urllib.parse import urljoin
 
-from drools import ruleset as lang
-
-from ansible_rulebook import terminal
+from ansible_rulebook import rule_engine as lang, terminal
 from ansible_rulebook.conf import settings
+from ansible_rulebook.engine_executor import run_in_engine
 from ansible_rulebook.exception import (
     ControllerApiException,
     JobTemplateNotFoundException,
@@ -152,9 +151,11 @@ class RunJobTemplate:
                 facts = self.helper.embellish_internal_event(facts)
                 self.display.output(facts, level=level, pretty=True)
                 if set_facts:
-                    lang.assert_fact(ruleset, facts)
+                    await run_in_engine(
+                        ruleset, lang.assert_fact, ruleset, facts
+                    )
                 if post_events:
-                    lang.post(ruleset, facts)
+                    await run_in_engine(ruleset, lang.post, ruleset, facts)
             else:
                 self.display.output("Empty facts are not set", level=level)
             self.display.banner(level=level)
@@ -22,15 +22,15 @@ import tempfile
 import uuid
 
 import yaml
-from drools import ruleset as lang
 
-from ansible_rulebook import terminal
+from ansible_rulebook import rule_engine as lang, terminal
 from ansible_rulebook.collection import (
     find_playbook,
     has_playbook,
     split_collection_name,
 )
 from ansible_rulebook.conf import settings
+from ansible_rulebook.engine_executor import run_in_engine
 from ansible_rulebook.exception import (
     MissingArtifactKeyException,
     PlaybookNotFoundException,
@@ -249,9 +249,11 @@ class RunPlaybook:
                 self.display.output(fact, level=level, pretty=True)
 
                 if set_facts:
-                    lang.assert_fact(ruleset, fact)
+                    await run_in_engine(
+                        ruleset, lang.assert_fact, ruleset, fact
+                    )
                 if post_events:
-                    lang.post(ruleset, fact)
+                    await run_in_engine(ruleset, lang.post, ruleset, fact)
 
             self.display.banner(level=level)
 
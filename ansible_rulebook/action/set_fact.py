@@ -14,7 +14,8 @@
 
 import logging
 
-from drools import ruleset as lang
+from ansible_rulebook import rule_engine as lang
+from ansible_rulebook.engine_executor import run_in_engine
 
 from .control import Control
 from .helper import Helper
@@ -46,7 +47,9 @@ class SetFact:
             self.action_args["ruleset"],
             self.action_args["fact"],
         )
-        lang.assert_fact(
+        await run_in_engine(
+            self.action_args["ruleset"],
+            lang.assert_fact,
             self.action_args["ruleset"],
             self.helper.embellish_internal_event(self.action_args["fact"]),
         )
@@ -14,6 +14,8 @@
 
 import argparse
 import asyncio
+import dataclasses
+import json
 import logging
 import os
 import sys
@@ -31,12 +33,28 @@ from ansible_rulebook.collection import (
 )
 from ansible_rulebook.common import StartupArgs
 from ansible_rulebook.conf import settings
-from ansible_rulebook.engine import run_rulesets, start_source
+from ansible_rulebook.engine import (
+    retire_source_queue,
+    run_rulesets,
+    start_source,
+)
 from ansible_rulebook.job_template_runner import job_template_runner
-from ansible_rulebook.rule_types import RuleSet, RuleSetQueue
+from ansible_rulebook.rule_types import (
+    EventSource,
+    RuleSet,
+    RuleSetChanges,
+    RuleSetQueue,
+)
+from ansible_rulebook.ruleset_process import run_rulesets_in_processes
+from ansible_rulebook.source_queue import (
+    FairSourceQueue,
+    FanOutQueue,
+    SourceQueue,
+)
 from ansible_rulebook.util import (
     decryptable,
     decrypted_context,
+    needs_rendering,
     startup_logging,
     substitute_variables,
     validate_url,
@@ -50,6 +68,7 @@ from ansible_rulebook.websocket import (
 
 from .exception import (
     ControllerNeededException,
+    HotReloadException,
     InvalidUrlException,
     InventoryNeededException,
     InventoryNotFound,
@@ -62,6 +81,9 @@ class NullQueue:
     async def put(self, _data):
         pass
 
+    def put_nowait(self, _data):
+        pass
+
     def qsize(self):
         return 0
 
@@ -133,13 +155,24 @@ async def run(parsed_args: argparse.Namespace) -> None:
     else:
         event_log = NullQueue()
 
+    sharded = any(ruleset.shards > 1 for ruleset in startup_args.rulesets)
+    if sharded or (
+        settings.ruleset_processes and len(startup_args.rulesets) > 1
+    ):
+        await run_in_processes(
+            event_log, startup_args, parsed_args, file_monitor
+        )
+        return
+
     logger.info("Starting sources")
-    tasks, ruleset_queues = spawn_sources(
-        startup_args.rulesets,
+    sources = RunningSources(
         startup_args.variables,
         [parsed_args.source_dir],
         parsed_args.shutdown_delay,
     )
+    ruleset_queues = [
+        sources.add_ruleset(ruleset) for ruleset in startup_args.rulesets
+    ]
 
     logger.info("Starting rules")
 
@@ -148,7 +181,12 @@ async def run(parsed_args: argparse.Namespace) -> None:
         feedback_task = asyncio.create_task(
             send_event_log_to_websocket(event_log=event_log)
         )
-        tasks.append(feedback_task)
+
+    reloader = None
+    if file_monitor:
+        reloader = RulebookReloader(
+            parsed_args, startup_args, sources, ruleset_queues
+        )
 
     should_reload = await run_rulesets(
         event_log,
@@ -158,6 +196,7 @@ async def run(parsed_args: argparse.Namespace) -> None:
         parsed_args,
         startup_args.project_data_file,
         file_monitor,
+        reloader,
     )
 
     await event_log.put(dict(type="Exit"))
@@ -167,8 +206,10 @@ async def run(parsed_args: argparse.Namespace) -> None:
         )
 
     logger.info("Cancelling event source tasks")
-    for task in tasks:
-        task.cancel()
+    tasks = sources.stop()
+    if feedback_task:
+        feedback_task.cancel()
+        tasks.append(feedback_task)
 
     error_found = False
     results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -190,6 +231,42 @@ async def run(parsed_args: argparse.Namespace) -> None:
         await run(parsed_args)
 
 
+async def run_in_processes(
+    event_log: Any,
+    startup_args: StartupArgs,
+    parsed_args: argparse.Namespace,
+    file_monitor: Optional[str],
+) -> None:
+    logger.info("Starting a process per ruleset")
+    feedback_task = None
+    if parsed_args.websocket_url:
+        feedback_task = asyncio.create_task(
+            send_event_log_to_websocket(event_log=event_log)
+        )
+
+    should_reload, error_found = await run_rulesets_in_processes(
+        event_log,
+        startup_args,
+        parsed_args,
+        bool(parsed_args.websocket_url),
+        file_monitor,
+    )
+
+    await event_log.put(dict(type="Exit"))
+    if feedback_task:
+        await asyncio.wait(
+            [feedback_task], timeout=settings.max_feedback_timeout
+        )
+
+    logger.info("Main complete")
+    await job_template_runner.close_session()
+    if error_found:
+        raise Exception("One of the ruleset processes failed")
+    elif should_reload is True:
+        logger.critical("HOT-RELOAD! rules file changed, now restarting")
+        await run(parsed_args)
+
+
 # TODO(cutwater): Maybe move to util.py
 def load_vars(parsed_args) -> Dict[str, str]:
     variables = dict()
@@ -247,29 +324,268 @@ def load_rulebook(
     return rulesets
 
 
+class RunningSources:
+    """The sources started for the running rulesets.
+
+    Identical sources, with the same name, plugin, args and filters, are
+    started once and their events are put on the queue of every ruleset
+    declaring them. The sources of a ruleset with several sources put
+    their events on their own lane of a FairSourceQueue. A source is
+    stopped, without shutting down the other rulesets, once the queues
+    of all the rulesets declaring it are released.
+    """
+
+    def __init__(
+        self,
+        variables: Dict[str, Any],
+        source_dirs: List[str],
+        shutdown_delay: float,
+    ):
+        self.variables = variables
+        self.source_dirs = source_dirs
+        self.shutdown_delay = shutdown_delay
+        self.fan_outs: Dict[str, FanOutQueue] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        # Source keys and lanes of each ruleset queue
+        self.subscriptions: Dict[Any, List[Tuple[str, asyncio.Queue]]] = {}
+        self.stopped: List[asyncio.Task] = []
+
+    def add_ruleset(self, ruleset: RuleSet) -> RuleSetQueue:
+        if len(ruleset.sources) > 1:
+            source_queue = FairSourceQueue(
+                ruleset.source_queue_size, ruleset.source_queue_overflow
+            )
+        else:
+            source_queue = SourceQueue(
+                ruleset.source_queue_size, ruleset.source_queue_overflow
+            )
+        subscriptions = self.subscriptions[source_queue] = []
+        for source in ruleset.sources:
+            if isinstance(source_queue, FairSourceQueue):
+                lane = source_queue.add_source(source.name, source.weight)
+            else:
+                lane = source_queue
+            key = source_key(source, self.variables)
+            subscriptions.append((key, lane))
+            if key in self.fan_outs:
+                logger.info(
+                    "Ruleset %s shares source %s", ruleset.name, source.name
+                )
+                self.fan_outs[key].subscribe(lane)
+                continue
+            self.fan_outs[key] = FanOutQueue([lane])
+            self.tasks[key] = asyncio.create_task(
+                start_source(
+                    source,
+                    self.source_dirs,
+                    self.variables,
+                    self.fan_outs[key],
+                    self.shutdown_delay,
+                )
+            )
+        return RuleSetQueue(ruleset, source_queue)
+
+    def release(self, source_queue: Any) -> None:
+        """Unsubscribe the queue of a stopped ruleset from its sources and
+        stop the sources no other ruleset is subscribed to.
+        """
+        for key, lane in self.subscriptions.pop(source_queue, []):
+            fan_out = self.fan_outs[key]
+            fan_out.unsubscribe(lane)
+            if fan_out.queues:
+                continue
+            del self.fan_outs[key]
+            retire_source_queue(fan_out)
+            task = self.tasks.pop(key)
+            task.cancel()
+            self.stopped.append(task)
+        if hasattr(source_queue, "close"):
+            source_queue.close()
+
+    def stop(self) -> List[asyncio.Task]:
+        """Cancel all the sources and return their tasks"""
+        for fan_out in self.fan_outs.values():
+            retire_source_queue(fan_out)
+        tasks = [*self.stopped, *self.tasks.values()]
+        for task in tasks:
+            task.cancel()
+        return tasks
+
+
 def spawn_sources(
     rulesets: List[RuleSet],
     variables: Dict[str, Any],
     source_dirs: List[str],
     shutdown_delay: float,
 ) -> Tuple[List[asyncio.Task], List[RuleSetQueue]]:
-    tasks = []
-    ruleset_queues = []
-    for ruleset in rulesets:
-        source_queue = asyncio.Queue(1)
-        for source in ruleset.sources:
-            task = asyncio.create_task(
-                start_source(
-                    source,
-                    source_dirs,
-                    variables,
-                    source_queue,
-                    shutdown_delay,
+    """Start the sources of the rulesets, see RunningSources"""
+    sources = RunningSources(variables, source_dirs, shutdown_delay)
+    ruleset_queues = [sources.add_ruleset(ruleset) for ruleset in rulesets]
+    return list(sources.tasks.values()), ruleset_queues
+
+
+class RulebookReloader:
+    """Reloads the changed rulesets of a hot-reloaded rulebook.
+
+    The rulesets of the new rulebook are compared with the running ones,
+    only the added and changed rulesets are started and only the removed
+    and changed rulesets are stopped. The other rulesets keep running
+    with their sources and rule engine sessions. A changed ruleset with
+    the same sources keeps its source queue and the events waiting in it.
+    """
+
+    def __init__(
+        self,
+        parsed_args: argparse.Namespace,
+        startup_args: StartupArgs,
+        sources: RunningSources,
+        ruleset_queues: List[RuleSetQueue],
+    ):
+        self.parsed_args = parsed_args
+        self.startup_args = startup_args
+        self.sources = sources
+        self.running = {
+            ruleset_queue.ruleset.name: ruleset_queue
+            for ruleset_queue in ruleset_queues
+        }
+        self.released: List[Any] = []
+
+    async def prepare(self) -> Optional[RuleSetChanges]:
+        """Load the rulebook and start the sources of the rulesets to
+        start, returns None when no ruleset changed.
+
+        Raises HotReloadException when the activation has to be
+        restarted.
+        """
+        startup_args = dataclasses.replace(self.startup_args)
+        try:
+            startup_args.rulesets = load_rulebook(
+                self.parsed_args, startup_args
+            )
+            validate_actions(startup_args)
+        except Exception as e:
+            logger.error(
+                "HOT-RELOAD: Keeping the running rulesets, "
+                "the rulebook could not be loaded: %s",
+                e,
+            )
+            return None
+
+        if any(ruleset.shards > 1 for ruleset in startup_args.rulesets) or (
+            settings.ruleset_processes and len(startup_args.rulesets) > 1
+        ):
+            raise HotReloadException("Rulesets have to run in processes")
+        if (
+            startup_args.check_controller_connection
+            and not self.startup_args.check_controller_connection
+        ):
+            raise HotReloadException("Controller connection has to be checked")
+
+        new_rulesets = {
+            ruleset.name: ruleset for ruleset in startup_args.rulesets
+        }
+        stopped = []
+        for name, ruleset_queue in self.running.items():
+            if name not in new_rulesets:
+                stopped.append(name)
+                self.released.append(ruleset_queue.source_queue)
+
+        started = []
+        running = {}
+        for ruleset in startup_args.rulesets:
+            ruleset_queue = self.running.get(ruleset.name)
+            if ruleset_queue and same_ruleset(ruleset_queue.ruleset, ruleset):
+                running[ruleset.name] = ruleset_queue
+                continue
+            if not ruleset_queue:
+                ruleset_queue = self.sources.add_ruleset(ruleset)
+            elif same_sources(ruleset_queue.ruleset, ruleset):
+                stopped.append(ruleset.name)
+                ruleset_queue = RuleSetQueue(
+                    ruleset, ruleset_queue.source_queue
                 )
+            else:
+                stopped.append(ruleset.name)
+                self.released.append(ruleset_queue.source_queue)
+                ruleset_queue = self.sources.add_ruleset(ruleset)
+            running[ruleset.name] = ruleset_queue
+            started.append(ruleset_queue)
+
+        self.running = running
+        self.startup_args = startup_args
+        startup_args.rulesets = [
+            ruleset_queue.ruleset for ruleset_queue in running.values()
+        ]
+        logger.critical(
+            "HOT-RELOAD! rules file changed, %d rulesets stopped, "
+            "%d started, %d unchanged",
+            len(stopped),
+            len(started),
+            len(running) - len(started),
+        )
+        if not stopped and not started:
+            return None
+        return RuleSetChanges(stopped, started)
+
+    def commit(self) -> None:
+        """Release the source queues of the stopped rulesets"""
+        for source_queue in self.released:
+            self.sources.release(source_queue)
+        self.released = []
+
+
+def same_ruleset(ruleset: RuleSet, other: RuleSet) -> bool:
+    """Whether two parsed rulesets are the same, apart from their uuids"""
+    return _without_uuids(ruleset) == _without_uuids(other)
+
+
+def same_sources(ruleset: RuleSet, other: RuleSet) -> bool:
+    """Whether two rulesets have the same sources and source queue"""
+    return (
+        ruleset.sources == other.sources
+        and ruleset.source_queue_size == other.source_queue_size
+        and ruleset.source_queue_overflow == other.source_queue_overflow
+    )
+
+
+def _without_uuids(ruleset: RuleSet) -> RuleSet:
+    return ruleset._replace(
+        uuid=None,
+        rules=[
+            rule._replace(
+                uuid=None,
+                actions=[
+                    action._replace(uuid=None) for action in rule.actions
+                ],
             )
-            tasks.append(task)
-        ruleset_queues.append(RuleSetQueue(ruleset, source_queue))
-    return tasks, ruleset_queues
+            for rule in ruleset.rules
+        ],
+    )
+
+
+def source_key(source: EventSource, variables: Dict[str, Any]) -> str:
+    """Identity of a source, the same for sources emitting the same
+    events.
+    """
+    try:
+        args = {
+            k: substitute_variables(v, variables)
+            for k, v in source.source_args.items()
+        }
+    except Exception:
+        # The error is reported when the source is started
+        args = source.source_args
+    return json.dumps(
+        [
+            source.name,
+            source.source_name,
+            args,
+            [[f.filter_name, f.filter_args] for f in source.source_filters],
+            source.isolation,
+        ],
+        sort_keys=True,
+        default=repr,
+    )
 
 
 def validate_variables(startup_args: StartupArgs) -> None:
@@ -310,22 +626,54 @@ def validate_actions(startup_args: StartupArgs) -> None:
                     decryptable(action.action_args)
 
 
+def configure_controller(startup_args: StartupArgs) -> None:
+    if not startup_args.controller_url:
+        return
+    job_template_runner.host = startup_args.controller_url
+    job_template_runner.token = startup_args.controller_token
+    if startup_args.controller_ssl_verify:
+        job_template_runner.verify_ssl = startup_args.controller_ssl_verify
+
+    if startup_args.controller_username and startup_args.controller_password:
+        job_template_runner.username = startup_args.controller_username
+        job_template_runner.password = startup_args.controller_password
+
+
 async def validate_controller_params(startup_args: StartupArgs) -> None:
     if startup_args.controller_url:
         if not validate_url(startup_args.controller_url, "controller"):
             raise InvalidUrlException("Invalid controller url.")
 
-        job_template_runner.host = startup_args.controller_url
-        job_template_runner.token = startup_args.controller_token
-        if startup_args.controller_ssl_verify:
-            job_template_runner.verify_ssl = startup_args.controller_ssl_verify
-
-        if (
-            startup_args.controller_username
-            and startup_args.controller_password
-        ):
-            job_template_runner.username = startup_args.controller_username
-            job_template_runner.password = startup_args.controller_password
-
+        configure_controller(startup_args)
         data = await job_template_runner.get_config()
         logger.info("AAP Version %s", data["version"])
+
+        if job_template_runner.template_cache_warmup:
+            await job_template_runner.warm_template_cache(
+                referenced_templates(startup_args)
+            )
+
+
+def referenced_templates(startup_args: StartupArgs) -> List[Tuple]:
+    """The controller templates named literally by the actions"""
+    unified_types = dict(
+        run_job_template="job_template",
+        run_workflow_template="workflow_job_template",
+    )
+    templates = []
+    for ruleset in startup_args.rulesets:
+        for rule in ruleset.rules:
+            for action in rule.actions:
+                if action.action not in unified_types:
+                    continue
+                name = action.action_args.get("name")
+                organization = action.action_args.get("organization")
+                if (
+                    isinstance(name, str)
+                    and isinstance(organization, str)
+                    and not needs_rendering([name, organization])
+                ):
+                    templates.append(
+                        (name, organization, unified_types[action.action])
+                    )
+    return templates
@@ -201,6 +201,135 @@ def get_parser() -> argparse.ArgumentParser:
         help="Run the garbage collector after this number of events. "
         "It can be configured with the environment variable EDA_GC_AFTER",
     )
+    parser.add_argument(
+        "--post-batch-size",
+        default=os.environ.get(
+            "EDA_POST_BATCH_SIZE", settings.post_batch_size
+        ),
+        type=int,
+        help="Maximum number of events taken from a ruleset's source queue "
+        "and posted to the rule engine as one batch. Default is 1, events "
+        "are posted one at a time. It can be configured with the "
+        "environment variable EDA_POST_BATCH_SIZE",
+    )
+    parser.add_argument(
+        "--post-batch-window-ms",
+        default=os.environ.get(
+            "EDA_POST_BATCH_WINDOW_MS", settings.post_batch_window_ms
+        ),
+        type=int,
+        help="Maximum number of milliseconds to wait for a batch to fill "
+        "up before posting it. Default is 0, only the events already "
+        "queued are batched. It can be configured with the environment "
+        "variable EDA_POST_BATCH_WINDOW_MS",
+    )
+    parser.add_argument(
+        "--plan-queue-high-watermark",
+        default=os.environ.get(
+            "EDA_PLAN_QUEUE_HIGH_WATERMARK",
+            settings.plan_queue_high_watermark,
+        ),
+        type=int,
+        help="Stop taking events from the sources of a ruleset when more "
+        "than this number of matched rules are waiting for their actions. "
+        "Default is 10. It can be configured with the environment "
+        "variable EDA_PLAN_QUEUE_HIGH_WATERMARK",
+    )
+    parser.add_argument(
+        "--plan-queue-low-watermark",
+        default=os.environ.get(
+            "EDA_PLAN_QUEUE_LOW_WATERMARK",
+            settings.plan_queue_low_watermark,
+        ),
+        type=int,
+        help="Resume taking events once the matched rules waiting for "
+        "their actions are down to this number. Default is 5. It can be "
+        "configured with the environment variable "
+        "EDA_PLAN_QUEUE_LOW_WATERMARK",
+    )
+    parser.add_argument(
+        "--source-restart-limit",
+        default=os.environ.get(
+            "EDA_SOURCE_RESTART_LIMIT", settings.source_restart_limit
+        ),
+        type=int,
+        help="Number of times in a row a failed source plugin is restarted "
+        "before shutting down. Default is 0, a failed source shuts down "
+        "all the rulesets. It can be configured with the environment "
+        "variable EDA_SOURCE_RESTART_LIMIT",
+    )
+    parser.add_argument(
+        "--source-restart-delay",
+        default=os.environ.get(
+            "EDA_SOURCE_RESTART_DELAY", settings.source_restart_delay
+        ),
+        type=float,
+        help="Seconds to wait before the first restart of a failed source "
+        "plugin, doubled on every restart in a row. Default is 1. It can "
+        "be configured with the environment variable "
+        "EDA_SOURCE_RESTART_DELAY",
+    )
+    parser.add_argument(
+        "--event-journal-dir",
+        default=os.environ.get(
+            "EDA_EVENT_JOURNAL_DIR", settings.event_journal_dir
+        ),
+        help="Directory of the journals of the events posted to each "
+        "ruleset. The events younger than the default_events_ttl of a "
+        "ruleset are replayed when it starts again. Default is no journal. "
+        "It can be configured with the environment variable "
+        "EDA_EVENT_JOURNAL_DIR",
+    )
+    parser.add_argument(
+        "--event-journal-sync-ms",
+        default=os.environ.get(
+            "EDA_EVENT_JOURNAL_SYNC_MS", settings.event_journal_sync_ms
+        ),
+        type=int,
+        help="Maximum number of milliseconds between two syncs of the event "
+        "journals to disk. Default is 100, 0 syncs every batch of events. "
+        "It can be configured with the environment variable "
+        "EDA_EVENT_JOURNAL_SYNC_MS",
+    )
+    parser.add_argument(
+        "--fact-checkpoint-dir",
+        default=os.environ.get(
+            "EDA_FACT_CHECKPOINT_DIR", settings.fact_checkpoint_dir
+        ),
+        help="Directory of the checkpoints of the facts of each ruleset. "
+        "The checkpointed facts are restored, instead of gathering the "
+        "facts of the hosts, when a ruleset starts again. Default is no "
+        "checkpoint. It can be configured with the environment variable "
+        "EDA_FACT_CHECKPOINT_DIR",
+    )
+    parser.add_argument(
+        "--fact-checkpoint-interval",
+        default=os.environ.get(
+            "EDA_FACT_CHECKPOINT_INTERVAL", settings.fact_checkpoint_interval
+        ),
+        type=float,
+        help="Seconds between two checkpoints of the facts of a ruleset. "
+        "Default is 30. It can be configured with the environment "
+        "variable EDA_FACT_CHECKPOINT_INTERVAL",
+    )
+    parser.add_argument(
+        "--event-projection",
+        action="store_true",
+        default=settings.event_projection,
+        help="Post to the rule engine only the attributes of the events "
+        "referenced by the conditions and throttles of each ruleset, the "
+        "actions still get the full events",
+    )
+    parser.add_argument(
+        "--rule-engine",
+        default=os.environ.get("EDA_RULE_ENGINE", settings.rule_engine),
+        choices=["auto", "drools"],
+        help="The rule engine of the rulesets. With auto, the rulesets "
+        "whose rules each match a single event, without a timeout or a "
+        "throttle, run in Python and the others on drools. Default is "
+        "auto. It can be configured with the environment variable "
+        "EDA_RULE_ENGINE",
+    )
     parser.add_argument(
         "--heartbeat",
         default=0,
@@ -230,6 +359,14 @@ def get_parser() -> argparse.ArgumentParser:
         default=settings.skip_audit_events,
         help="Don't send audit events to the server",
     )
+    parser.add_argument(
+        "--ruleset-processes",
+        action="store_true",
+        default=settings.ruleset_processes,
+        help="Run each ruleset of the rulebook, with its sources, in its "
+        "own process. Facts and events posted to a ruleset and shutdowns "
+        "are passed between the processes",
+    )
     parser.add_argument(
         "--vault-password-file",
         help="The file containing one ansible vault password, "
@@ -256,6 +393,29 @@ def validate_args(args: argparse.Namespace) -> None:
         raise ValueError("Worker mode needs an id and websocket url specfied")
     if not args.worker and not args.rulebook:
         raise ValueError("Rulebook must be specified in non worker mode")
+    if args.post_batch_size < 1:
+        raise ValueError("Post batch size must be at least 1")
+    if args.post_batch_window_ms < 0:
+        raise ValueError("Post batch window cannot be negative")
+    if args.plan_queue_high_watermark < 1:
+        raise ValueError("Plan queue high watermark must be at least 1")
+    if not (
+        0 <= args.plan_queue_low_watermark <= args.plan_queue_high_watermark
+    ):
+        raise ValueError(
+            "Plan queue low watermark must be between 0 and the "
+            "high watermark"
+        )
+    if args.source_restart_limit < 0:
+        raise ValueError("Source restart limit cannot be negative")
+    if args.source_restart_delay < 0:
+        raise ValueError("Source restart delay cannot be negative")
+    if args.event_journal_sync_ms < 0:
+        raise ValueError("Event journal sync interval cannot be negative")
+    if args.fact_checkpoint_interval <= 0:
+        raise ValueError("Fact checkpoint interval must be positive")
+    if args.rule_engine not in ("auto", "drools"):
+        raise ValueError("Rule engine must be auto or drools")
 
 
 def setup_logging_and_display(args: argparse.Namespace) -> None:
@@ -286,6 +446,19 @@ def update_settings(args: argparse.Namespace) -> None:
     if args.gc_after is not None:
         settings.gc_after = args.gc_after
 
+    settings.post_batch_size = args.post_batch_size
+    settings.post_batch_window_ms = args.post_batch_window_ms
+    settings.plan_queue_high_watermark = args.plan_queue_high_watermark
+    settings.plan_queue_low_watermark = args.plan_queue_low_watermark
+    settings.source_restart_limit = args.source_restart_limit
+    settings.source_restart_delay = args.source_restart_delay
+    settings.event_journal_dir = args.event_journal_dir
+    settings.event_journal_sync_ms = args.event_journal_sync_ms
+    settings.fact_checkpoint_dir = args.fact_checkpoint_dir
+    settings.fact_checkpoint_interval = args.fact_checkpoint_interval
+    settings.event_projection = args.event_projection
+    settings.rule_engine = args.rule_engine
+
     if args.execution_strategy:
         settings.default_execution_strategy = args.execution_strategy
 
@@ -296,6 +469,7 @@ def update_settings(args: argparse.Namespace) -> None:
     settings.websocket_access_token = args.websocket_access_token
     settings.websocket_refresh_token = args.websocket_refresh_token
     settings.skip_audit_events = args.skip_audit_events
+    settings.ruleset_processes = args.ruleset_processes
     parse_vault_passwords(args)
 
 
@@ -12,15 +12,18 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import configparser
+import json
 import logging
 import os
-import subprocess
+import sys
+import tempfile
 from functools import lru_cache
+from typing import Dict, List, Optional
 
 import yaml
 
 from ansible_rulebook import terminal
-from ansible_rulebook.conf import settings
 from ansible_rulebook.exception import RulebookNotFoundException
 from ansible_rulebook.vault import has_vaulted_str
 
@@ -38,10 +41,44 @@ EDA_SOURCE_PATHS = [
     "plugins/event_source",
 ]
 
+EDA_RULEBOOK_PATHS = [f"{EDA_PATH_PREFIX}/rulebooks", "rulebooks"]
+
 EDA_PLAYBOOKS_PATHS = [".", "playbooks"]
 
 EDA_YAML_EXTENSIONS = [".yml", ".yaml"]
 
+# The directories of each kind of object of the collection index
+COLLECTION_OBJECT_PATHS = {
+    "sources": EDA_SOURCE_PATHS,
+    "filters": EDA_FILTER_PATHS,
+    "rulebooks": EDA_RULEBOOK_PATHS,
+    "playbooks": EDA_PLAYBOOKS_PATHS,
+}
+
+# The files and directories of a collection whose mtime changes when it
+# is upgraded in place or one of its EDA plugins is added or removed
+COLLECTION_SIGNATURE_PATHS = [
+    "MANIFEST.json",
+    "FILES.json",
+    "galaxy.yml",
+    *EDA_SOURCE_PATHS,
+    *EDA_FILTER_PATHS,
+    *EDA_RULEBOOK_PATHS,
+    *EDA_PLAYBOOKS_PATHS,
+]
+
+DEFAULT_COLLECTIONS_PATHS = [
+    "~/.ansible/collections",
+    "/usr/share/ansible/collections",
+]
+ANSIBLE_CONFIG_FILES = [
+    "ansible.cfg",
+    "~/.ansible.cfg",
+    "/etc/ansible/ansible.cfg",
+]
+COLLECTION_INDEX_FILE = "collection_index.json"
+COLLECTION_INDEX_VERSION = 1
+
 logger = logging.getLogger(__name__)
 
 
@@ -50,75 +87,298 @@ def split_collection_name(collection_resource):
     return collection, resource
 
 
-@lru_cache
 def find_collection(name):
-    if settings.ansible_galaxy_path is None:
-        raise Exception("ansible-galaxy is not installed")
-    try:
-        env = os.environ.copy()
-        env["ANSIBLE_LOCAL_TEMP"] = "/tmp"
-        output = subprocess.check_output(
-            [settings.ansible_galaxy_path, "collection", "list", name],
-            stderr=subprocess.STDOUT,
-            env=env,
-        )
-    except subprocess.CalledProcessError as e:
-        logger.error("Error listing collections: %s", e.output)
+    collection = collection_index()["collections"].get(name)
+    if collection is None:
+        return None
+    return collection["path"]
+
+
+@lru_cache
+def collection_index() -> Dict:
+    """Return the index of the installed collections.
+
+    The index records the path, version and EDA plugin files of every
+    collection found in the collection search paths. It is stored in the
+    cache directory and rebuilt, by scanning the search paths, when the
+    mtimes of the search paths, of their namespace directories or of the
+    metadata files and plugin directories of a collection change.
+
+    The index is read once per process. The object lookups check it
+    again against the collections on disk, and rebuild it if needed,
+    when an object is missing from it or its file no longer exists.
+    """
+    roots = collection_roots()
+    signature = _index_signature(roots)
+    index_file = os.path.join(_cache_dir(), COLLECTION_INDEX_FILE)
+
+    index = _read_index(index_file)
+    if (
+        index
+        and index.get("version") == COLLECTION_INDEX_VERSION
+        and index.get("signature") == signature
+    ):
+        return index
+
+    logger.debug("Building collection index from %s", roots)
+    index = dict(
+        version=COLLECTION_INDEX_VERSION,
+        signature=signature,
+        collections=_scan_collections(roots),
+    )
+    _write_index(index_file, index)
+    return index
+
+
+def collection_roots() -> List[str]:
+    """Return the existing ansible_collections directories in the order
+    ansible searches them: the configured collections paths followed by
+    the python path.
+    """
+    paths = (
+        os.environ.get("ANSIBLE_COLLECTIONS_PATH")
+        or os.environ.get("ANSIBLE_COLLECTIONS_PATHS")
+        or _configured_collections_paths()
+    )
+    if paths:
+        paths = paths.split(os.pathsep)
+    else:
+        paths = DEFAULT_COLLECTIONS_PATHS
+
+    roots = []
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        if os.path.basename(path) != "ansible_collections":
+            path = os.path.join(path, "ansible_collections")
+        roots.append(path)
+
+    scan_sys_path = os.environ.get("ANSIBLE_COLLECTIONS_SCAN_SYS_PATH", "true")
+    if scan_sys_path.lower() in ["true", "yes", "1"]:
+        for path in sys.path:
+            roots.append(
+                os.path.join(os.path.abspath(path), "ansible_collections")
+            )
+
+    result = []
+    for root in roots:
+        if root not in result and os.path.isdir(root):
+            result.append(root)
+    return result
+
+
+def _configured_collections_paths() -> Optional[str]:
+    config_files = ANSIBLE_CONFIG_FILES
+    if os.environ.get("ANSIBLE_CONFIG"):
+        config_files = [os.environ["ANSIBLE_CONFIG"]] + config_files
+
+    for config_file in config_files:
+        config_file = os.path.expanduser(config_file)
+        if not os.path.isfile(config_file):
+            continue
+        config = configparser.ConfigParser(interpolation=None)
+        try:
+            config.read(config_file)
+        except configparser.Error as e:
+            logger.debug("Cannot parse %s: %s", config_file, e)
+            return None
+        for key in ["collections_path", "collections_paths"]:
+            if config.has_option("defaults", key):
+                return config.get("defaults", key)
         return None
-    output = output.decode()
-    parts = name.split(".")
-    for line in output.splitlines():
-        if line.startswith("# "):
-            location = line[2:]
-            location = os.path.join(location, *parts)
-            if os.path.exists(location):
-                return location
     return None
 
 
-def has_object(collection, name, object_types, extensions):
-    if find_collection(collection) is None:
-        return False
+def _cache_dir() -> str:
+    if os.environ.get("EDA_CACHE_DIR"):
+        return os.environ["EDA_CACHE_DIR"]
+    cache_home = os.environ.get(
+        "XDG_CACHE_HOME", os.path.expanduser("~/.cache")
+    )
+    return os.path.join(cache_home, "ansible-rulebook")
+
+
+def _index_signature(roots: List[str]) -> Dict[str, int]:
+    signature = {}
+    for root in roots:
+        signature[root] = os.stat(root).st_mtime_ns
+        for namespace in _subdirs(root):
+            signature[namespace.path] = namespace.stat().st_mtime_ns
+            for collection in _subdirs(namespace.path):
+                for name in COLLECTION_SIGNATURE_PATHS:
+                    path = os.path.normpath(
+                        os.path.join(collection.path, name)
+                    )
+                    try:
+                        signature[path] = os.stat(path).st_mtime_ns
+                    except OSError:
+                        continue
+    return signature
+
+
+def _subdirs(path: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(path) as entries:
+            return sorted(
+                (
+                    entry
+                    for entry in entries
+                    if entry.name.isidentifier() and entry.is_dir()
+                ),
+                key=lambda entry: entry.name,
+            )
+    except OSError:
+        return []
+
+
+def _scan_collections(roots: List[str]) -> Dict[str, Dict]:
+    collections = {}
+    for root in roots:
+        for namespace in _subdirs(root):
+            for collection in _subdirs(namespace.path):
+                name = f"{namespace.name}.{collection.name}"
+                if name in collections:
+                    continue
+                collections[name] = dict(
+                    path=collection.path,
+                    root=root,
+                    version=_collection_version(collection.path),
+                    sources=_plugin_files(collection.path, "sources", [".py"]),
+                    filters=_plugin_files(collection.path, "filters", [".py"]),
+                    rulebooks=_plugin_files(
+                        collection.path,
+                        "rulebooks",
+                        EDA_YAML_EXTENSIONS,
+                    ),
+                    playbooks=_plugin_files(
+                        collection.path,
+                        "playbooks",
+                        EDA_YAML_EXTENSIONS,
+                    ),
+                )
+    return collections
+
+
+def _collection_version(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, "MANIFEST.json")) as f:
+            return json.load(f)["collection_info"]["version"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    try:
+        with open(os.path.join(path, "galaxy.yml")) as f:
+            return yaml.safe_load(f)["version"]
+    except (OSError, yaml.YAMLError, KeyError, TypeError):
+        return None
+
+
+def _plugin_files(path: str, kind: str, extensions: List[str]) -> List[str]:
+    files = []
+    for object_type in COLLECTION_OBJECT_PATHS[kind]:
+        try:
+            with os.scandir(os.path.join(path, object_type)) as entries:
+                for entry in entries:
+                    if (
+                        os.path.splitext(entry.name)[1] in extensions
+                        and entry.is_file()
+                    ):
+                        files.append(os.path.join(object_type, entry.name))
+        except OSError:
+            continue
+    return sorted(files)
 
-    if not isinstance(extensions, list):
-        extensions = [extensions]
 
-    for object_type in object_types:
-        for extension in extensions:
-            if os.path.exists(
-                os.path.join(find_collection(collection), object_type, name)
-                + extension
-            ):
-                return True
-    return False
+def _read_index(index_file: str) -> Optional[Dict]:
+    try:
+        with open(index_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_index(index_file: str, index: Dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(index_file), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(index_file), delete=False
+        ) as f:
+            json.dump(index, f)
+        os.replace(f.name, index_file)
+    except OSError as e:
+        logger.debug("Cannot write collection index %s: %s", index_file, e)
+
+
+def format_installed_collections() -> Optional[str]:
+    """Describe the installed collections like ansible-galaxy does"""
+    collections = collection_index()["collections"]
+    if not collections:
+        return None
+
+    lines = []
+    for root in collection_roots():
+        names = sorted(
+            name
+            for name, collection in collections.items()
+            if collection["root"] == root
+        )
+        if not names:
+            continue
+        width = max(len(name) for name in names)
+        lines.append(f"\n# {root}")
+        for name in names:
+            version = collections[name]["version"] or "*"
+            lines.append(f"{name:<{width}} {version}")
+    return "\n".join(lines).strip() + "\n"
+
+
+def has_object(collection, name, kind, extensions):
+    return _indexed_object(collection, name, kind, extensions) is not None
+
+
+def find_object(collection, name, kind, extensions):
+    location = _indexed_object(collection, name, kind, extensions)
+    if location is None:
+        if find_collection(collection) is None:
+            return False
+        raise FileNotFoundError(
+            f"Cannot find {kind} {name} in {collection} at "
+            f"{find_collection(collection)}"
+        )
+    return location
 
 
-def find_object(collection, name, object_types, extensions):
-    if find_collection(collection) is None:
-        return False
+def _indexed_object(collection, name, kind, extensions) -> Optional[str]:
+    """Return the path of an object of a kind of the collection index,
+    looked up in the directories of the kind in order.
 
+    The index of the process is rebuilt, when the collections changed
+    on disk, if the object is missing from it or no longer exists.
+    """
     if not isinstance(extensions, list):
         extensions = [extensions]
 
-    for object_type in object_types:
-        for extension in extensions:
-            location = (
-                os.path.join(find_collection(collection), object_type, name)
-                + extension
-            )
-            if os.path.exists(location):
-                return location
-
-    raise FileNotFoundError(
-        f"Cannot find {object_type} {name} in {collection} at {location}"
-    )
+    for reindexed in (False, True):
+        if reindexed:
+            collection_index.cache_clear()
+        entry = collection_index()["collections"].get(collection)
+        if entry is None:
+            continue
+        files = set(entry[kind])
+        for object_type in COLLECTION_OBJECT_PATHS[kind]:
+            for extension in extensions:
+                path = os.path.join(object_type, name) + extension
+                if path not in files:
+                    continue
+                location = os.path.join(entry["path"], path)
+                if os.path.exists(location):
+                    return location
+    return None
 
 
 def has_rulebook(collection, rulebook):
     return has_object(
         collection,
         rulebook,
-        [f"{EDA_PATH_PREFIX}/rulebooks", "rulebooks"],
+        "rulebooks",
         ".yml",
     )
 
@@ -127,7 +387,7 @@ def load_rulebook(collection, rulebook):
     location = find_object(
         collection,
         rulebook,
-        [f"{EDA_PATH_PREFIX}/rulebooks", "rulebooks"],
+        "rulebooks",
         ".yml",
     )
     if not location:
@@ -146,7 +406,7 @@ def has_source(collection, source):
     return has_object(
         collection,
         source,
-        EDA_SOURCE_PATHS,
+        "sources",
         ".py",
     )
 
@@ -155,7 +415,7 @@ def find_source(collection, source):
     return find_object(
         collection,
         source,
-        EDA_SOURCE_PATHS,
+        "sources",
         ".py",
     )
 
@@ -164,7 +424,7 @@ def has_source_filter(collection, source_filter):
     return has_object(
         collection,
         source_filter,
-        EDA_FILTER_PATHS,
+        "filters",
         ".py",
     )
 
@@ -173,18 +433,14 @@ def find_source_filter(collection, source_filter):
     return find_object(
         collection,
         source_filter,
-        EDA_FILTER_PATHS,
+        "filters",
         ".py",
     )
 
 
 def has_playbook(collection, playbook):
-    return has_object(
-        collection, playbook, EDA_PLAYBOOKS_PATHS, EDA_YAML_EXTENSIONS
-    )
+    return has_object(collection, playbook, "playbooks", EDA_YAML_EXTENSIONS)
 
 
 def find_playbook(collection, playbook):
-    return find_object(
-        collection, playbook, EDA_PLAYBOOKS_PATHS, EDA_YAML_EXTENSIONS
-    )
+    return find_object(collection, playbook, "playbooks", EDA_YAML_EXTENSIONS)
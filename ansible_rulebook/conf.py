@@ -12,7 +12,6 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import shutil
 import uuid
 
 from ansible_rulebook.vault import Vault
@@ -22,6 +21,18 @@ class _Settings:
     def __init__(self):
         self.identifier = str(uuid.uuid4())
         self.gc_after = 1000
+        self.post_batch_size = 1
+        self.post_batch_window_ms = 0
+        self.plan_queue_high_watermark = 10
+        self.plan_queue_low_watermark = 5
+        self.source_restart_limit = 0
+        self.source_restart_delay = 1.0
+        self.event_journal_dir = None
+        self.event_journal_sync_ms = 100
+        self.fact_checkpoint_dir = None
+        self.fact_checkpoint_interval = 30
+        self.event_projection = False
+        self.rule_engine = "auto"
         self.default_execution_strategy = "sequential"
         self.max_feedback_timeout = 5
         self.print_events = False
@@ -31,8 +42,8 @@ class _Settings:
         self.websocket_access_token = None
         self.websocket_refresh_token = None
         self.skip_audit_events = False
+        self.ruleset_processes = False
         self.vault = Vault()
-        self.ansible_galaxy_path = shutil.which("ansible-galaxy")
 
 
 settings = _Settings()
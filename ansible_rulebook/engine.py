@@ -14,14 +14,18 @@
 
 import argparse
 import asyncio
+import functools
+import hashlib
+import importlib.util
+import keyword
 import logging
 import os
-import runpy
+import sys
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from drools.dispatch import establish_async_channel, handle_async_messages
-from drools.ruleset import session_stats
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
@@ -33,13 +37,21 @@ from ansible_rulebook.collection import (
     has_source_filter,
     split_collection_name,
 )
+from ansible_rulebook.conf import settings
+from ansible_rulebook.fact_checkpoint import has_fact_checkpoint
 from ansible_rulebook.messages import Shutdown
+from ansible_rulebook.python_ruleset import PythonRuleset
+from ansible_rulebook.raw_event import parse_event
 from ansible_rulebook.rule_set_runner import RuleSetRunner
 from ansible_rulebook.rule_types import (
     EventSource,
     EventSourceFilter,
     RuleSetQueue,
 )
+from ansible_rulebook.source_process import (
+    ISOLATION_PROCESS,
+    run_source_process,
+)
 from ansible_rulebook.util import (
     collect_ansible_facts,
     find_builtin_filter,
@@ -60,40 +72,207 @@ logger = logging.getLogger(__name__)
 
 
 all_source_queues = []
+_shutdown_forwarder: Optional[Callable] = None
 
 
 async def heartbeat_task(
-    event_log: asyncio.Queue, rule_set_names: List[str], interval: int
+    event_log: asyncio.Queue,
+    ruleset_runners: List[RuleSetRunner],
+    interval: int,
 ):
     while True:
-        for name in rule_set_names:
-            await send_session_stats(event_log, session_stats(name))
+        for ruleset_runner in ruleset_runners:
+            await send_session_stats(
+                event_log, await ruleset_runner.session_stats()
+            )
         await asyncio.sleep(interval)
 
 
+def set_shutdown_forwarder(forwarder: Optional[Callable]) -> None:
+    """Set the function forwarding the broadcast shutdowns to the
+    rulesets that run in other processes.
+    """
+    global _shutdown_forwarder
+    _shutdown_forwarder = forwarder
+
+
 async def broadcast(shutdown: Shutdown):
+    if _shutdown_forwarder is not None:
+        _shutdown_forwarder(shutdown)
+    await broadcast_local(shutdown)
+
+
+async def broadcast_local(shutdown: Shutdown):
     logger.debug(f"Broadcast to queues: {all_source_queues}")
     logger.debug(f"Broadcasting shutdown: {shutdown}")
-    for queue in all_source_queues:
-        await queue.put(shutdown)
+    for queue in list(all_source_queues):
+        try:
+            await queue.put(shutdown)
+        except Exception as e:
+            logger.warning(
+                "Could not broadcast the shutdown to %s: %s", queue, e
+            )
+
+
+def retire_source_queue(queue: Any) -> None:
+    """Stop broadcasting shutdowns to the queue of a source, the source
+    then stops without shutting down the rulesets when it is cancelled.
+    """
+    if queue in all_source_queues:
+        all_source_queues.remove(queue)
+
+
+# Loaded source and filter plugins, keyed by their real path and mtime
+_plugin_modules: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+
+def load_plugin(path: str) -> Dict[str, Any]:
+    """Import a source or filter plugin and return its namespace.
+
+    Each plugin file is imported once as a regular module, so its
+    bytecode is cached in __pycache__, and every source referencing it
+    gets the same namespace. A plugin is imported again when the
+    modification time of the file changes.
+    """
+    path = os.path.realpath(path)
+    key = (path, os.stat(path).st_mtime_ns)
+    if key in _plugin_modules:
+        return _plugin_modules[key]
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(path.encode()).hexdigest()[:12]
+    module_name = f"eda_plugin_{stem}_{digest}"
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+
+    for stale_key in [k for k in _plugin_modules if k[0] == path]:
+        del _plugin_modules[stale_key]
+    _plugin_modules[key] = vars(module)
+    logger.debug("Loaded plugin %s from %s", module_name, path)
+    return _plugin_modules[key]
+
+
+def compile_filter_chain(
+    filters: List[Tuple[Callable, Optional[Dict]]]
+) -> Callable[[Any], Any]:
+    """Compile the (filter, kwargs) pairs of a source into one callable.
+
+    The chain, the filters of the source followed by the builtin
+    insert_meta_info, is fused into a single generated function that
+    calls the filters nested, f1(f0(data, a=a0_0), b=a1_0), with the
+    kwargs of every filter bound as constants when the source starts.
+    Putting an event costs one call instead of a loop over the filters.
+    """
+    if not filters:
+        return _no_filter
+    if len(filters) == 1 and not filters[0][1]:
+        return filters[0][0]
+
+    namespace: Dict[str, Any] = {}
+    call = "data"
+    for index, (f, kwargs) in enumerate(filters):
+        namespace[f"f{index}"] = f
+        args = [call]
+        if kwargs and all(
+            name.isidentifier() and not keyword.iskeyword(name)
+            for name in kwargs
+        ):
+            for position, (name, value) in enumerate(kwargs.items()):
+                namespace[f"a{index}_{position}"] = value
+                args.append(f"{name}=a{index}_{position}")
+        elif kwargs:
+            # Names that can't be written as keywords are unpacked
+            namespace[f"k{index}"] = dict(kwargs)
+            args.append(f"**k{index}")
+        call = f"f{index}({', '.join(args)})"
+
+    code = f"def apply_filters(data):\n    return {call}\n"
+    exec(compile(code, "<filter chain>", "exec"), namespace)
+    return namespace["apply_filters"]
+
+
+def _no_filter(data):
+    return data
 
 
 class FilteredQueue:
     def __init__(self, filters, queue: asyncio.Queue):
         self.filters = filters
         self.queue = queue
+        self.apply_filters = compile_filter_chain(filters)
 
     async def put(self, data):
-        for f, kwargs in self.filters:
-            kwargs = kwargs or {}
-            data = f(data, **kwargs)
-        await self.queue.put(data)
+        await self.queue.put(self.apply_filters(data))
 
     def put_nowait(self, data):
-        for f, kwargs in self.filters:
-            kwargs = kwargs or {}
-            data = f(data, **kwargs)
-        self.queue.put_nowait(data)
+        self.queue.put_nowait(self.apply_filters(data))
+
+    async def put_many(self, events: Iterable):
+        """Run a batch of events through the filters and queue them in
+        order, waiting for room in the queue as needed.
+        """
+        for data in map(self.apply_filters, events):
+            await self.queue.put(data)
+
+    def record_restart(self) -> None:
+        record_restart = getattr(self.queue, "record_restart", None)
+        if record_restart:
+            record_restart()
+
+
+SOURCE_RESTART_MAX_DELAY = 60.0
+
+
+async def supervise_source(
+    name: str,
+    entrypoint: Callable,
+    queue: FilteredQueue,
+    args: Dict[str, Any],
+) -> None:
+    """Run the entrypoint of a source plugin, restarting it in place with
+    an exponential backoff when it fails.
+
+    The source is restarted at most settings.source_restart_limit times
+    in a row, a source that ran for longer than the maximum backoff has
+    its budget reset. Once the budget is exhausted the error is raised,
+    which shuts down all the rulesets.
+    """
+    restarts = 0
+    while True:
+        started = time.monotonic()
+        try:
+            await entrypoint(queue, dict(args))
+            return
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            raise
+        except Exception as e:
+            if time.monotonic() - started > SOURCE_RESTART_MAX_DELAY:
+                restarts = 0
+            if restarts >= settings.source_restart_limit:
+                raise
+            restarts += 1
+            delay = min(
+                settings.source_restart_delay * 2 ** (restarts - 1),
+                SOURCE_RESTART_MAX_DELAY,
+            )
+            logger.warning(
+                "Source %s failed with %s: %s, restart %d of %d in %.1f "
+                "seconds",
+                name,
+                type(e).__name__,
+                e,
+                restarts,
+                settings.source_restart_limit,
+                delay,
+            )
+            queue.record_restart()
+            await asyncio.sleep(delay)
 
 
 async def start_source(
@@ -113,28 +292,31 @@ async def start_source(
                 os.path.join(source_dirs[0], source.source_name + ".py")
             )
         ):
-            module = runpy.run_path(
-                os.path.join(source_dirs[0], source.source_name + ".py")
+            source_path = os.path.join(
+                source_dirs[0], source.source_name + ".py"
             )
         elif has_source(*split_collection_name(source.source_name)):
-            module = runpy.run_path(
-                find_source(*split_collection_name(source.source_name))
+            source_path = find_source(
+                *split_collection_name(source.source_name)
             )
         else:
             raise SourcePluginNotFoundException(
                 f"Could not find source plugin for {source.source_name}"
             )
+        module = load_plugin(source_path)
 
         source_filters = []
+        # Raw events are parsed before the first filter that doesn't take
+        # them
+        raw_events = True
 
-        source.source_filters.append(meta_info_filter(source))
-
-        for source_filter in source.source_filters:
+        filters = [*source.source_filters, meta_info_filter(source)]
+        for source_filter in filters:
             logger.info("loading source filter %s", source_filter.filter_name)
             if os.path.exists(
                 os.path.join("event_filter", source_filter.filter_name + ".py")
             ):
-                source_filter_module = runpy.run_path(
+                source_filter_module = load_plugin(
                     os.path.join(
                         "event_filter", source_filter.filter_name + ".py"
                     )
@@ -142,13 +324,13 @@ async def start_source(
             elif has_source_filter(
                 *split_collection_name(source_filter.filter_name)
             ):
-                source_filter_module = runpy.run_path(
+                source_filter_module = load_plugin(
                     find_source_filter(
                         *split_collection_name(source_filter.filter_name)
                     )
                 )
             elif has_builtin_filter(source_filter.filter_name):
-                source_filter_module = runpy.run_path(
+                source_filter_module = load_plugin(
                     find_builtin_filter(source_filter.filter_name)
                 )
             else:
@@ -156,6 +338,9 @@ async def start_source(
                     f"Could not find source filter plugin "
                     f"for {source_filter.filter_name}"
                 )
+            if raw_events and not source_filter_module.get("RAW_EVENTS"):
+                source_filters.append((parse_event, None))
+                raw_events = False
             source_filters.append(
                 (source_filter_module["main"], source_filter.filter_args)
             )
@@ -180,7 +365,12 @@ async def start_source(
                 "Entrypoint is not a coroutine function."
             )
 
-        await entrypoint(fqueue, args)
+        if source.isolation == ISOLATION_PROCESS:
+            entrypoint = functools.partial(
+                run_source_process, source.source_name, source_path
+            )
+
+        await supervise_source(source.source_name, entrypoint, fqueue, args)
         shutdown_msg = (
             f"Source {source.source_name} initiated shutdown at "
             f"{str(datetime.now())}"
@@ -219,16 +409,28 @@ async def start_source(
         logger.error(shutdown_msg)
         raise
     finally:
-        logger.debug("Broadcast shutdown to all source plugins")
-        asyncio.create_task(
-            broadcast(
-                Shutdown(
-                    message=shutdown_msg,
-                    source_plugin=source.source_name,
-                    delay=shutdown_delay,
-                ),
+        if queue not in all_source_queues:
+            logger.debug("Source %s was retired", source.source_name)
+        else:
+            logger.debug("Broadcast shutdown to all source plugins")
+            # The queue of an ended source gets the shutdown it broadcasts
+            # and no other
+            retire_source_queue(queue)
+            asyncio.create_task(
+                _broadcast_shutdown(
+                    queue,
+                    Shutdown(
+                        message=shutdown_msg,
+                        source_plugin=source.source_name,
+                        delay=shutdown_delay,
+                    ),
+                )
             )
-        )
+
+
+async def _broadcast_shutdown(queue: Any, shutdown: Shutdown) -> None:
+    await queue.put(shutdown)
+    await broadcast(shutdown)
 
 
 class RulebookFileChangeHandler(FileSystemEventHandler):
@@ -242,12 +444,25 @@ class RulebookFileChangeHandler(FileSystemEventHandler):
         return self.modified
 
 
-async def monitor_rulebook(rulebook_file):
+def rulebook_mtime(rulebook_file: str) -> Optional[int]:
+    try:
+        return os.stat(rulebook_file).st_mtime_ns
+    except OSError:
+        return None
+
+
+async def monitor_rulebook(rulebook_file, loaded_mtime: Optional[int] = None):
+    """Raise HotReloadException when the rulebook file changes, or right
+    away when it changed since it had the loaded_mtime.
+    """
     event_handler = RulebookFileChangeHandler()
     to_observe = os.path.abspath(rulebook_file)
     observer = Observer()
     observer.schedule(event_handler, to_observe, recursive=True)
     observer.start()
+    if loaded_mtime is not None and rulebook_mtime(to_observe) != loaded_mtime:
+        logger.debug("Rulebook file %s changed while loading", to_observe)
+        event_handler.modified = True
     try:
         while not event_handler.is_modified():
             await asyncio.sleep(1)
@@ -274,7 +489,16 @@ async def run_rulesets(
     parsed_args: argparse.Namespace = None,
     project_data_file: Optional[str] = None,
     file_monitor: str = None,
+    reloader: Any = None,
 ) -> bool:
+    """Run the rulesets until they end, returns True when the rulebook
+    file changed and the activation has to be restarted.
+
+    With a reloader, a change of the rulebook file only stops and starts
+    the rulesets returned by reloader.prepare(), the other rulesets keep
+    running with their sessions. The reloader raises HotReloadException
+    when the whole activation has to be restarted.
+    """
     logger.debug("run_ruleset")
     rulesets_queue_plans = rule_generator.generate_rulesets(
         ruleset_queues, variables, inventory
@@ -283,69 +507,149 @@ async def run_rulesets(
     if not rulesets_queue_plans:
         return
 
-    for ruleset_queue_plan in rulesets_queue_plans:
-        logger.debug("ruleset define: %s", ruleset_queue_plan.ruleset.define())
-
+    async_task = None
     hosts_facts = []
-    ruleset_names = []
-    rulesets = {}
-    for ruleset, _ in ruleset_queues:
-        if ruleset.gather_facts and not hosts_facts:
-            hosts_facts = collect_ansible_facts(inventory)
-        ruleset_names.append(ruleset.name)
-        rulesets[ruleset.name] = ruleset
-
-    ruleset_tasks = []
-    reader, writer = await establish_async_channel()
-    async_task = asyncio.create_task(
-        handle_async_messages(reader, writer), name="drools_async_task"
-    )
+    ruleset_runners = []
+    ruleset_tasks = {}
+
+    async def start_rulesets(ruleset_queues, rulesets_queue_plans):
+        nonlocal async_task, hosts_facts
+        # The async channel of drools is only needed, and the JVM only
+        # started, when a ruleset runs on drools
+        if async_task is None and not all(
+            isinstance(plan.ruleset, PythonRuleset)
+            for plan in rulesets_queue_plans
+        ):
+            reader, writer = await establish_async_channel()
+            async_task = asyncio.create_task(
+                handle_async_messages(reader, writer),
+                name="drools_async_task",
+            )
+        for ruleset_queue_plan in rulesets_queue_plans:
+            logger.debug(
+                "ruleset define: %s", ruleset_queue_plan.ruleset.define()
+            )
+
+        rulesets = {}
+        for ruleset, _ in ruleset_queues:
+            if (
+                ruleset.gather_facts
+                and not hosts_facts
+                and not has_fact_checkpoint(ruleset.name)
+            ):
+                hosts_facts = collect_ansible_facts(inventory)
+            rulesets[ruleset.name] = ruleset
+
+        for ruleset_queue_plan in rulesets_queue_plans:
+            ruleset_runner = RuleSetRunner(
+                event_log=event_log,
+                ruleset_queue_plan=ruleset_queue_plan,
+                hosts_facts=hosts_facts,
+                variables=variables,
+                rule_set=rulesets[ruleset_queue_plan.ruleset.name],
+                project_data_file=project_data_file,
+                parsed_args=parsed_args,
+                broadcast_method=broadcast,
+            )
+            ruleset_runners.append(ruleset_runner)
+            task_name = f"main_ruleset :: {ruleset_queue_plan.ruleset.name}"
+            ruleset_tasks[ruleset_runner.name] = asyncio.create_task(
+                ruleset_runner.run_ruleset(), name=task_name
+            )
+
+    async def stop_rulesets(names):
+        # The runners post the events they took from their source queues
+        # and run the rules matched so far, the events left in the queues
+        # go to the sessions that replace them
+        await asyncio.gather(
+            *(
+                runner.stop()
+                for runner in ruleset_runners
+                if runner.name in names
+            ),
+            return_exceptions=True,
+        )
+        stopped = []
+        for name in names:
+            task = ruleset_tasks.pop(name)
+            if not task.done():
+                logger.info("Cancelling " + task.get_name())
+                task.cancel()
+            stopped.append(task)
+        ruleset_runners[:] = [
+            runner for runner in ruleset_runners if runner.name not in names
+        ]
+        await asyncio.gather(*stopped, return_exceptions=True)
+
+    await start_rulesets(ruleset_queues, rulesets_queue_plans)
 
     send_heartbeat_task = None
     if parsed_args and parsed_args.heartbeat > 0 and event_log:
         send_heartbeat_task = asyncio.create_task(
-            heartbeat_task(event_log, ruleset_names, parsed_args.heartbeat),
+            heartbeat_task(event_log, ruleset_runners, parsed_args.heartbeat),
             name="heartbeat_task",
         )
 
-    for ruleset_queue_plan in rulesets_queue_plans:
-        ruleset_runner = RuleSetRunner(
-            event_log=event_log,
-            ruleset_queue_plan=ruleset_queue_plan,
-            hosts_facts=hosts_facts,
-            variables=variables,
-            rule_set=rulesets[ruleset_queue_plan.ruleset.name],
-            project_data_file=project_data_file,
-            parsed_args=parsed_args,
-            broadcast_method=broadcast,
-        )
-        task_name = f"main_ruleset :: {ruleset_queue_plan.ruleset.name}"
-        ruleset_task = asyncio.create_task(
-            ruleset_runner.run_ruleset(), name=task_name
-        )
-        ruleset_tasks.append(ruleset_task)
-
     monitor_task = None
     if file_monitor:
         monitor_task = asyncio.create_task(monitor_rulebook(file_monitor))
-        ruleset_tasks.append(monitor_task)
 
     logger.info("Waiting for all ruleset tasks to end")
-    await asyncio.wait(ruleset_tasks, return_when=asyncio.FIRST_EXCEPTION)
-    async_task.cancel()
+    should_reload = False
+    while True:
+        tasks = list(ruleset_tasks.values())
+        if monitor_task:
+            tasks.append(monitor_task)
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        if not (
+            monitor_task
+            and monitor_task.done()
+            and isinstance(monitor_task.exception(), HotReloadException)
+        ):
+            break
+        if reloader is None:
+            logger.debug("Hot-reload, setting should_reload")
+            should_reload = True
+            break
+
+        # A change made while the rulebook is loaded is caught by the
+        # next monitor
+        loaded_mtime = rulebook_mtime(file_monitor)
+        try:
+            changes = await reloader.prepare()
+        except HotReloadException:
+            logger.debug("Hot-reload, setting should_reload")
+            should_reload = True
+            break
+        monitor_task = asyncio.create_task(
+            monitor_rulebook(file_monitor, loaded_mtime)
+        )
+        if not changes:
+            continue
+
+        # Sessions are keyed by the ruleset name, the session of a
+        # changed ruleset is rebuilt once the previous one has ended
+        await stop_rulesets(changes.stopped)
+        reloader.commit()
+        if changes.started:
+            await start_rulesets(
+                changes.started,
+                rule_generator.generate_rulesets(
+                    changes.started, variables, inventory
+                ),
+            )
+
+    if async_task:
+        async_task.cancel()
     logger.info("Cancelling all ruleset tasks")
+    ruleset_tasks = list(ruleset_tasks.values())
+    if monitor_task:
+        ruleset_tasks.append(monitor_task)
     for task in ruleset_tasks:
         if not task.done():
             logger.info("Cancelling " + task.get_name())
             task.cancel()
 
-    should_reload = False
-    if monitor_task and isinstance(
-        monitor_task.exception(), HotReloadException
-    ):
-        logger.debug("Hot-reload, setting should_reload")
-        should_reload = True
-
     logger.debug("Waiting on gather")
     asyncio.gather(*ruleset_tasks, return_exceptions=True)
     logger.debug("Returning from run_rulesets")
@@ -0,0 +1,114 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EngineExecutor:
+    """Runs the rule engine calls of a ruleset session on its own thread.
+
+    The calls are handed to a single worker thread, so the calls of a
+    session are serialized while the sessions of different rulesets
+    evaluate in parallel and the event loop stays responsive. The rule
+    callbacks fired by a call run on the worker thread and are handed
+    back to the event loop with call_in_loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"engine-{name}"
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+
+    async def submit(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on the engine thread and wait for its result"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+        return await self._loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    def call_in_loop(self, fn: Callable, *args) -> None:
+        """Call fn on the event loop thread, directly if already there"""
+        if self._loop is None or threading.get_ident() == self._loop_thread_id:
+            fn(*args)
+        else:
+            self._loop.call_soon_threadsafe(fn, *args)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_engine_executors: Dict[str, EngineExecutor] = {}
+_remote_engine: Optional[Callable] = None
+_executor_listener: Optional[Callable] = None
+
+
+def create_engine_executor(name: str) -> EngineExecutor:
+    remove_engine_executor(name)
+    executor = EngineExecutor(name)
+    _engine_executors[name] = executor
+    if _executor_listener is not None:
+        _executor_listener(name)
+    return executor
+
+
+def get_engine_executor(name: str) -> Optional[EngineExecutor]:
+    return _engine_executors.get(name)
+
+
+def remove_engine_executor(name: str) -> None:
+    executor = _engine_executors.pop(name, None)
+    if executor:
+        executor.shutdown()
+
+
+def set_remote_engine(dispatch: Optional[Callable]) -> None:
+    """Set the function handling the calls for the rulesets that run in
+    another process, it is called with the ruleset name, the rule engine
+    function and its arguments. The calls sent to another process return
+    None, the dispatch raises for the calls whose result is needed.
+    """
+    global _remote_engine
+    _remote_engine = dispatch
+
+
+def set_executor_listener(listener: Optional[Callable]) -> None:
+    """Set the function called with the ruleset name when the engine
+    executor of a ruleset is created.
+    """
+    global _executor_listener
+    _executor_listener = listener
+
+
+async def run_in_engine(ruleset_name: str, fn: Callable, *args) -> Any:
+    """Run a rule engine call on the thread of the ruleset's session,
+    or directly when the ruleset has no engine executor.
+    """
+    executor = _engine_executors.get(ruleset_name)
+    if executor is None:
+        if _remote_engine is not None:
+            return _remote_engine(ruleset_name, fn, args)
+        return fn(*args)
+    return await executor.submit(fn, *args)
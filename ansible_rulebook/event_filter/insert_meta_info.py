@@ -6,7 +6,8 @@ in the event meta field. A source name is needed to track where the
 event originated from. If the event meta already has a source.name
 or source.type field specified it will be ignored. This filter is
 automatically added to every source. This filter also adds the
-received_at iso8601 UTC datetime stamp to every event.
+received_at iso8601 UTC datetime stamp to every event. The meta of a
+raw event without meta is spliced into its JSON, without parsing it.
 
 Arguments:
           source_name
@@ -18,31 +19,34 @@ Example:
 
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Dict, Union
+
+from ansible_rulebook.raw_event import RawEvent
+
+# Raw events are passed to this filter without being parsed
+RAW_EVENTS = True
 
 
 def main(
-    event: Dict[str, Any],
+    event: Union[Dict[str, Any], RawEvent],
     source_name: str,
     source_type: str,
-) -> Dict[str, Any]:
-    if "meta" not in event:
-        event["meta"] = {}
-
-    if "source" not in event["meta"]:
-        event["meta"]["source"] = {}
-
-    if "name" not in event["meta"]["source"]:
-        event["meta"]["source"]["name"] = source_name
-
-    if "type" not in event["meta"]["source"]:
-        event["meta"]["source"]["type"] = source_type
-
-    if "received_at" not in event["meta"]:
-        event["meta"]["received_at"] = _received_at()
-
-    if "uuid" not in event["meta"]:
-        event["meta"]["uuid"] = str(uuid.uuid4())
+) -> Union[Dict[str, Any], RawEvent]:
+    if isinstance(event, RawEvent) and not event.has_meta():
+        event.meta = meta = {}
+    else:
+        if isinstance(event, RawEvent):
+            event = event.event()
+        meta = event.setdefault("meta", {})
+    source = meta.setdefault("source", {})
+    source.setdefault("name", source_name)
+    source.setdefault("type", source_type)
+
+    if "received_at" not in meta:
+        meta["received_at"] = _received_at()
+
+    if "uuid" not in meta:
+        meta["uuid"] = str(uuid.uuid4())
 
     return event
 
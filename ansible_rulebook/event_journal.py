@@ -0,0 +1,207 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Journal of the events posted to the rule engine session of a ruleset.
+
+The events a ruleset takes from its source queue are appended, after
+their filters ran, to segment files before they are posted to the rule
+engine. When the ruleset starts again the journaled events younger than
+its events TTL are replayed into the new session, so that multi-event
+conditions and throttles carry on from where they were.
+
+A record is a header holding the length of the payload, the time the
+event was journaled and the CRC32 of the payload, followed by the
+payload, the event as compact JSON. A torn or corrupt record ends the
+replay of its segment.
+
+The rule engine has no way to post an event at a past time, it expires
+a replayed event, and times the windows of the conditions it matches,
+from the replay. The time the event was journaled is restored in its
+meta.received_at when the event has a meta without one.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from ansible_rulebook.raw_event import RawEvent
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct("<IdI")
+SEGMENT_SUFFIX = ".journal"
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+# The rule engine expires the events after 2 hours, unless the ruleset
+# sets default_events_ttl
+DEFAULT_EVENTS_TTL = 2 * 60 * 60
+TTL_UNITS = {"second": 1, "minute": 60, "hour": 60 * 60, "day": 24 * 60 * 60}
+
+
+def parse_events_ttl(ttl: Optional[str]) -> float:
+    """Return the seconds of a default_events_ttl like '5 minutes'"""
+    if not ttl:
+        return DEFAULT_EVENTS_TTL
+    value, unit = ttl.split()
+    return int(value) * TTL_UNITS[unit.rstrip("s")]
+
+
+class EventJournal:
+    """Append only journal of events in a directory of segment files.
+
+    Each batch of events is written with a single write and flushed to
+    the operating system, the segment is synced to disk at most every
+    sync_interval seconds. A new segment is started once the current one
+    is larger than segment_size, the segments holding only events older
+    than the TTL are removed then.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: float = DEFAULT_EVENTS_TTL,
+        sync_interval: float = 0.0,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.segment_size = segment_size
+        self.appended = 0
+        self.replayed = 0
+        self.syncs = 0
+        self._file = None
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    def stats(self) -> Dict:
+        return {
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "syncs": self.syncs,
+            "segments": len(self.segments()),
+        }
+
+    def segments(self) -> List[str]:
+        return [
+            os.path.join(self.directory, name)
+            for name in sorted(os.listdir(self.directory))
+            if name.endswith(SEGMENT_SUFFIX)
+        ]
+
+    def append(self, events: List[Any], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        records = []
+        for event in events:
+            if isinstance(event, RawEvent):
+                payload = event.to_json().encode()
+            else:
+                payload = json.dumps(
+                    event, separators=(",", ":"), default=str
+                ).encode()
+            records.append(
+                RECORD_HEADER.pack(len(payload), now, zlib.crc32(payload))
+            )
+            records.append(payload)
+
+        if self._file is None or self._file.tell() >= self.segment_size:
+            self._next_segment(now)
+        self._file.write(b"".join(records))
+        self._file.flush()
+        self.appended += len(events)
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        if self._file:
+            os.fsync(self._file.fileno())
+            self.syncs += 1
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._file:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def replay(self, now: Optional[float] = None) -> Iterator[Any]:
+        """Yield the journaled events younger than the TTL, oldest first"""
+        since = (time.time() if now is None else now) - self.ttl
+        for path in self.segments():
+            # Every event of a segment last written before since is expired
+            if os.stat(path).st_mtime < since:
+                continue
+            for event in self._read_segment(path, since):
+                self.replayed += 1
+                yield event
+
+    def _read_segment(self, path: str, since: float) -> Iterator[Any]:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset = 0
+                while offset < size:
+                    start = offset + RECORD_HEADER.size
+                    if start > size:
+                        logger.warning(
+                            "Journal %s is truncated at %d", path, offset
+                        )
+                        return
+                    length, timestamp, crc = RECORD_HEADER.unpack_from(
+                        data, offset
+                    )
+                    payload = data[start : start + length]
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        logger.warning(
+                            "Journal %s is corrupt at %d", path, offset
+                        )
+                        return
+                    offset = start + length
+                    if timestamp >= since:
+                        yield _restore_received_at(
+                            json.loads(payload), timestamp
+                        )
+
+    def _next_segment(self, now: float) -> None:
+        if self._file:
+            self.close()
+        segments = self.segments()
+        for path in segments:
+            if os.stat(path).st_mtime < now - self.ttl:
+                logger.debug("Removing expired journal %s", path)
+                os.remove(path)
+
+        number = 0
+        if segments:
+            last = os.path.basename(segments[-1])
+            number = int(last[: -len(SEGMENT_SUFFIX)]) + 1
+        self._file = open(
+            os.path.join(self.directory, f"{number:016d}{SEGMENT_SUFFIX}"),
+            "ab",
+        )
+
+
+def _restore_received_at(event: Any, timestamp: float) -> Any:
+    meta = event.get("meta") if isinstance(event, dict) else None
+    if isinstance(meta, dict) and "received_at" not in meta:
+        received_at = datetime.fromtimestamp(timestamp, timezone.utc)
+        meta["received_at"] = received_at.isoformat().replace("+00:00", "Z")
+    return event
@@ -0,0 +1,226 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Pre-filter of the events posted to the rule engine session of a ruleset.
+
+When every rule of a ruleset matches a single event, without facts or a
+timeout, an event can only be matched by a rule whose condition holds on
+the event alone. The pre-filter keeps, for each rule, the equality and
+`is defined` checks its condition can't hold without, the other parts of
+the condition are assumed to hold. The events that fail the checks of
+every rule are dropped before they are posted to the rule engine.
+
+The equality checks are indexed by attribute and constant, so an event
+is only checked against the rules whose constant matches its value.
+Values of different types, like a number and a string, are never
+assumed to be different.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from ansible_rulebook.condition_types import (
+    Boolean,
+    Condition,
+    Float,
+    Identifier,
+    Integer,
+    OperatorExpression,
+    String,
+)
+from ansible_rulebook.event_projection import parse_path
+from ansible_rulebook.json_generator import condition_identifiers, event_path
+from ansible_rulebook.rule_types import RuleSet
+from ansible_rulebook.util import needs_rendering
+
+MISSING = object()
+# A product of alternatives in a condition larger than this is not
+# expanded, only the checks of its smaller side are kept
+MAX_CONJUNCTIONS = 64
+
+# A check is ("defined", keys) or ("eq", keys, constant), a conjunction
+# is a list of checks and a requirement a list of alternative
+# conjunctions, None when nothing is required
+Check = Tuple
+Requirement = Optional[List[List[Check]]]
+
+
+def _constant(value: Any) -> Tuple[str, Any]:
+    if isinstance(value, bool):
+        return ("bool", value)
+    if isinstance(value, (int, float)):
+        return ("number", float(value))
+    if isinstance(value, str):
+        return ("str", value)
+    return ("other", None)
+
+
+def _lookup(event: Any, keys: Tuple) -> Any:
+    value = event
+    for key in keys:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return MISSING
+    return value
+
+
+def _holds(check: Check, event: Dict) -> bool:
+    value = _lookup(event, check[1])
+    if value is MISSING:
+        return False
+    if check[0] == "defined":
+        return True
+    constant = _constant(value)
+    return constant[0] != check[2][0] or constant == check[2]
+
+
+def _event_keys(node: Any) -> Optional[Tuple]:
+    if not isinstance(node, Identifier) or node.value.startswith("events"):
+        return None
+    path = event_path(node.value)
+    if not path:
+        return None
+    keys = parse_path(path, indexes=True)
+    return tuple(keys) if keys else None
+
+
+def _literal(node: Any) -> Optional[Tuple[str, Any]]:
+    if isinstance(node, (Integer, Float)):
+        return _constant(node.value)
+    if isinstance(node, Boolean):
+        return _constant(node.value == "true")
+    if isinstance(node, String) and not needs_rendering(node.value):
+        return _constant(node.value)
+    return None
+
+
+def _requirement(node: Any) -> Requirement:
+    if isinstance(node, Condition):
+        return _requirement(node.value)
+    if not isinstance(node, OperatorExpression):
+        return None
+    if node.operator == "<<":
+        return _requirement(node.right)
+    if node.operator == "and":
+        left, right = _requirement(node.left), _requirement(node.right)
+        if left is None or right is None:
+            return right if left is None else left
+        if len(left) * len(right) > MAX_CONJUNCTIONS:
+            return left if len(left) <= len(right) else right
+        return [a + b for a in left for b in right]
+    if node.operator == "or":
+        left, right = _requirement(node.left), _requirement(node.right)
+        if left is None or right is None:
+            return None
+        return left + right
+    if node.operator == "==":
+        for side, other in ((node.left, node.right), (node.right, node.left)):
+            keys, constant = _event_keys(side), _literal(other)
+            if keys and constant:
+                return [[("eq", keys, constant)]]
+    if (
+        node.operator == "is"
+        and isinstance(node.right, String)
+        and node.right.value == "defined"
+    ):
+        keys = _event_keys(node.left)
+        if keys:
+            return [[("defined", keys)]]
+    return None
+
+
+def compile_prefilter(ruleset: RuleSet) -> Optional["EventPrefilter"]:
+    """Return the pre-filter of the events of a ruleset, None when the
+    ruleset has a rule matching several events or facts, a rule with a
+    timeout, or a rule that could match any event.
+    """
+    conjunctions = []
+    for rule in ruleset.rules:
+        if not rule.enabled:
+            continue
+        condition = rule.condition
+        if (
+            condition.timeout
+            or condition.when == "not_all"
+            or (condition.when == "all" and len(condition.value) > 1)
+        ):
+            return None
+        for identifier in condition_identifiers(condition.value):
+            if identifier.startswith(("fact", "events")):
+                return None
+        for value in condition.value:
+            requirement = _requirement(value)
+            if requirement is None:
+                return None
+            conjunctions.extend(requirement)
+    if not conjunctions:
+        return None
+    return EventPrefilter(conjunctions)
+
+
+class EventPrefilter:
+    """Predicate dropping the events no rule of a ruleset can match"""
+
+    def __init__(self, conjunctions: List[List[Check]]):
+        self.passed = 0
+        self.skipped = 0
+        # The conjunctions with an equality, by the attribute and the
+        # constant of their first equality, holding the other checks
+        self._index: Dict[Tuple, Dict[Tuple, List[List[Check]]]] = {}
+        self._by_type: Dict[Tuple, Dict[str, List[List[Check]]]] = {}
+        self._scan: List[List[Check]] = []
+        for conjunction in conjunctions:
+            equality = next(
+                (check for check in conjunction if check[0] == "eq"), None
+            )
+            if equality is None:
+                self._scan.append(conjunction)
+                continue
+            _, keys, constant = equality
+            rest = [check for check in conjunction if check is not equality]
+            self._index.setdefault(keys, {}).setdefault(constant, []).append(
+                rest
+            )
+            self._by_type.setdefault(keys, {}).setdefault(
+                constant[0], []
+            ).append(rest)
+
+    def stats(self) -> Dict:
+        return {"passed": self.passed, "skipped": self.skipped}
+
+    def __call__(self, event: Dict) -> bool:
+        if self._match(event):
+            self.passed += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def _match(self, event: Dict) -> bool:
+        for keys, constants in self._index.items():
+            value = _lookup(event, keys)
+            if value is MISSING:
+                continue
+            constant = _constant(value)
+            candidates = [constants.get(constant, [])]
+            for kind, conjunctions in self._by_type[keys].items():
+                if kind != constant[0]:
+                    candidates.append(conjunctions)
+            for conjunctions in candidates:
+                for rest in conjunctions:
+                    if all(_holds(check, event) for check in rest):
+                        return True
+        for conjunction in self._scan:
+            if all(_holds(check, event) for check in conjunction):
+                return True
+        return False
@@ -0,0 +1,178 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Projection of the events posted to the rule engine session of a ruleset.
+
+The rule engine only needs the attributes of an event its conditions and
+throttles reference, so an event is posted with only those attributes
+and its meta. The full event is kept, keyed by its meta uuid, until it is
+matched or its TTL expires, and is put back in the results of the rules
+it matched before their actions run.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+PATH_KEY = re.compile(
+    r"""\.?([^.\[\]'"]+)|\[(\d+)\]|\["([^"]*)"\]|\['([^']*)'\]"""
+)
+
+# A projection tree maps the keys to keep to the tree of their value,
+# None keeps the whole value
+ProjectionTree = Dict[str, Optional[Dict]]
+
+
+def parse_path(
+    path: str, indexes: bool = False
+) -> Optional[List[Union[str, int]]]:
+    """Return the keys of an event path up to its first list index, or
+    with the list indexes when indexes is set, None when the path can't
+    be parsed.
+    """
+    keys = []
+    position = 0
+    while position < len(path):
+        match = PATH_KEY.match(path, position)
+        if not match:
+            return None
+        name, index, double_quoted, single_quoted = match.groups()
+        if index is not None:
+            if not indexes:
+                break
+            keys.append(int(index))
+        for key in (name, double_quoted, single_quoted):
+            if key is not None:
+                keys.append(key)
+                break
+        position = match.end()
+    return keys or None
+
+
+def projection_tree(paths: Iterable[str]) -> Optional[ProjectionTree]:
+    """Return the projection tree of event paths, None when a path can't
+    be parsed.
+    """
+    tree: ProjectionTree = {"meta": None}
+    for path in paths:
+        keys = parse_path(path)
+        if keys is None:
+            return None
+        node = tree
+        for key in keys[:-1]:
+            if key in node and node[key] is None:
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+def project(value: Any, tree: ProjectionTree) -> Any:
+    if not isinstance(value, dict):
+        return value
+    projected = {}
+    for key, subtree in tree.items():
+        if key in value:
+            projected[key] = (
+                value[key] if subtree is None else project(value[key], subtree)
+            )
+    return projected
+
+
+def compile_projection(
+    paths: Optional[Iterable[str]],
+) -> Optional[Callable[[Dict], Dict]]:
+    """Return a function projecting an event on the paths, None when the
+    events can't be projected.
+    """
+    if paths is None:
+        return None
+    tree = projection_tree(paths)
+    if tree is None:
+        return None
+    return lambda event: project(event, tree)
+
+
+class EventProjection:
+    """Projects the events of a ruleset and keeps the full events.
+
+    Events are projected on the rule engine thread of the ruleset while
+    the matches are restored on the event loop, so the full events are
+    guarded by a lock.
+    """
+
+    def __init__(self, projection: Callable[[Dict], Dict], ttl: float):
+        self.projection = projection
+        self.ttl = ttl
+        self.projected = 0
+        self.restored = 0
+        self.missing = 0
+        self._events: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict:
+        return {
+            "projected": self.projected,
+            "stored": len(self._events),
+            "restored": self.restored,
+            "missing": self.missing,
+        }
+
+    def project(self, event: Dict, now: Optional[float] = None) -> Dict:
+        """Return the projected event, the full event is kept until it is
+        matched or its TTL expires.
+        """
+        uuid = event.get("meta", {}).get("uuid")
+        if uuid is None:
+            return event
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            self._events[uuid] = (now, event)
+            self._events.move_to_end(uuid)
+        self.projected += 1
+        return self.projection(event)
+
+    def restore(self, data: Dict, consume: bool = True) -> None:
+        """Put the full events back in the data of a rule engine result.
+
+        The full events are dropped when consume is set, the rule engine
+        retracts the events a rule matched unless the ruleset matches
+        multiple rules.
+        """
+        with self._lock:
+            for name, value in data.items():
+                if not isinstance(value, dict) or "meta" not in value:
+                    continue
+                uuid = value["meta"].get("uuid")
+                if consume:
+                    entry = self._events.pop(uuid, None)
+                else:
+                    entry = self._events.get(uuid)
+                if entry:
+                    data[name] = entry[1]
+                    self.restored += 1
+                else:
+                    self.missing += 1
+
+    def _expire(self, now: float) -> None:
+        since = now - self.ttl
+        while self._events:
+            timestamp, _ = next(iter(self._events.values()))
+            if timestamp >= since:
+                break
+            self._events.popitem(last=False)
@@ -153,3 +153,19 @@ class AnsibleVaultNotFound(Exception):
 
 class InvalidUrlException(Exception):
     pass
+
+
+class RulesetPartitionException(Exception):
+    pass
+
+
+class SourceProcessException(Exception):
+    pass
+
+
+class SourceProcessCrashedException(Exception):
+    pass
+
+
+class RemoteEngineCallException(Exception):
+    pass
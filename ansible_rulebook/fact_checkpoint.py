@@ -0,0 +1,209 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Checkpoints of the facts of the rule engine session of a ruleset.
+
+The facts of a session are saved in a directory holding a snapshot, the
+gzipped JSON list of the facts, and a log of the facts added and removed
+since the snapshot, one compact JSON line per change. A checkpoint only
+appends the changes to the log, the snapshot is rewritten once the log
+holds more changes than the snapshot holds facts. Each snapshot has a
+generation and only the log of the same generation is applied to it, so
+a crash while rewriting the snapshot never applies a log twice. The
+facts are restored from the snapshot and its log when the ruleset
+starts again.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+from ansible_rulebook.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "facts.json.gz"
+LOG_FILE = "changes-{generation}.jsonl"
+# Changes logged before the snapshot is rewritten, when the snapshot
+# holds fewer facts
+MIN_COMPACTION_CHANGES = 1000
+
+
+def fact_checkpoint_dir(ruleset_name: str) -> Optional[str]:
+    """The checkpoint directory of a ruleset, None when disabled"""
+    if not settings.fact_checkpoint_dir:
+        return None
+    return os.path.join(
+        settings.fact_checkpoint_dir, quote(ruleset_name, safe="")
+    )
+
+
+def has_fact_checkpoint(ruleset_name: str) -> bool:
+    directory = fact_checkpoint_dir(ruleset_name)
+    return bool(directory) and os.path.exists(
+        os.path.join(directory, SNAPSHOT_FILE)
+    )
+
+
+def _serialize(fact: Any) -> str:
+    return json.dumps(fact, separators=(",", ":"), sort_keys=True, default=str)
+
+
+def _fact_key(serialized: str) -> str:
+    return hashlib.sha1(serialized.encode()).hexdigest()
+
+
+class FactCheckpoint:
+    """Incremental checkpoints of a fact set in a directory.
+
+    The checkpoint keeps the keys of the facts it saved last, so that
+    save only writes the facts added and removed since then. It is not
+    thread safe, the saves of a checkpoint have to be serialized.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.saves = 0
+        self.compactions = 0
+        self._facts: Dict[str, str] = {}
+        self._counts: Counter = Counter()
+        self._logged = 0
+        self._generation = 0
+        self._loaded = False
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(
+            self.directory, LOG_FILE.format(generation=self._generation)
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "facts": sum(self._counts.values()),
+            "saves": self.saves,
+            "compactions": self.compactions,
+            "loggedChanges": self._logged,
+        }
+
+    def load(self) -> Optional[List[Any]]:
+        """Return the checkpointed facts, None when there is no checkpoint"""
+        self._loaded = True
+        self._facts = {}
+        self._counts = Counter()
+        self._logged = 0
+        if not os.path.exists(self.snapshot_path):
+            return None
+        with gzip.open(self.snapshot_path, "rt") as f:
+            snapshot = json.load(f)
+        self._generation = snapshot["generation"]
+        for fact in snapshot["facts"]:
+            self._add(_serialize(fact))
+        if os.path.exists(self.log_path):
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        op, value = json.loads(line)
+                    except ValueError:
+                        logger.warning(
+                            "Fact checkpoint log %s is truncated",
+                            self.log_path,
+                        )
+                        # Rewrite the snapshot on the next save, the
+                        # changes appended after a torn line are lost
+                        self._logged = float("inf")
+                        break
+                    if op == "+":
+                        self._add(_serialize(value))
+                    else:
+                        self._remove(value)
+                    self._logged += 1
+        return [
+            json.loads(self._facts[key])
+            for key, count in self._counts.items()
+            for _ in range(count)
+        ]
+
+    def save(self, facts: List[Any]) -> None:
+        """Write the facts added and removed since the last save"""
+        if not self._loaded:
+            self.load()
+        counts = Counter()
+        serialized = {}
+        for fact in facts:
+            data = _serialize(fact)
+            key = _fact_key(data)
+            counts[key] += 1
+            serialized[key] = data
+
+        changes = []
+        for key in (counts - self._counts).elements():
+            changes.append(f'["+",{serialized[key]}]\n')
+        for key in (self._counts - counts).elements():
+            changes.append(f'["-","{key}"]\n')
+        self._counts = counts
+        self._facts = serialized
+        self.saves += 1
+
+        if self._logged + len(changes) > max(
+            len(facts), MIN_COMPACTION_CHANGES
+        ) or not os.path.exists(self.snapshot_path):
+            self._write_snapshot()
+        elif changes:
+            with open(self.log_path, "a") as f:
+                f.write("".join(changes))
+                f.flush()
+                os.fsync(f.fileno())
+            self._logged += len(changes)
+
+    def _write_snapshot(self) -> None:
+        old_log_path = self.log_path
+        self._generation += 1
+        facts = ",".join(
+            self._facts[key]
+            for key, count in self._counts.items()
+            for _ in range(count)
+        )
+        data = f'{{"generation":{self._generation},"facts":[{facts}]}}'
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(data.encode()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if os.path.exists(old_log_path):
+            os.remove(old_log_path)
+        self._logged = 0
+        self.compactions += 1
+
+    def _add(self, data: str) -> None:
+        key = _fact_key(data)
+        self._facts[key] = data
+        self._counts[key] += 1
+
+    def _remove(self, key: str) -> None:
+        if self._counts[key] > 1:
+            self._counts[key] -= 1
+        else:
+            self._counts.pop(key, None)
+            self._facts.pop(key, None)
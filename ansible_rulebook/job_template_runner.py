@@ -17,8 +17,9 @@ import json
 import logging
 import os
 import ssl
+import time
 from functools import cached_property
-from typing import Union
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
 from urllib.parse import urljoin, urlparse
 
 import aiohttp
@@ -33,6 +34,9 @@ from ansible_rulebook.exception import (
 
 logger = logging.getLogger(__name__)
 
+# name, organization and type of a unified job template
+TemplateKey = Tuple[str, str, str]
+
 
 class JobTemplateRunner:
     LEGACY_UNIFIED_TEMPLATE_SLUG = "api/v2/unified_job_templates/"
@@ -40,6 +44,8 @@ class JobTemplateRunner:
     GATEWAY_UNIFIED_TEMPLATE_SLUG = "v2/unified_job_templates/"
     GATEWAY_CONFIG_SLUG = "v2/config/"
     JOB_COMPLETION_STATUSES = ["successful", "failed", "error", "canceled"]
+    JOB_MONITOR_MIN_DELAY = 1.0
+    JOB_MONITOR_PAGE_SIZE = 200
 
     def __init__(
         self,
@@ -50,6 +56,8 @@ class JobTemplateRunner:
         verify_ssl: str = "yes",
     ):
         self.token = token
+        self._template_cache: Dict[TemplateKey, Tuple[float, dict]] = {}
+        self._template_lookups: Dict[TemplateKey, asyncio.Future] = {}
         self._host = ""
         self.host = host
         self.username = username
@@ -58,7 +66,17 @@ class JobTemplateRunner:
         self.refresh_delay = float(
             os.environ.get("EDA_JOB_TEMPLATE_REFRESH_DELAY", 10.0)
         )
+        self.template_cache_ttl = float(
+            os.environ.get("EDA_CONTROLLER_TEMPLATE_CACHE_TTL", 300.0)
+        )
+        self.template_cache_warmup = os.environ.get(
+            "EDA_CONTROLLER_TEMPLATE_CACHE_WARMUP", "false"
+        ).lower() in ["yes", "true"]
         self._session = None
+        self._monitored_jobs: Dict[str, Dict[str, asyncio.Future]] = {}
+        # The jobs left out of the last id__in list, by list url and id
+        self._missing_jobs: Set[Tuple[str, str]] = set()
+        self._monitor_task = None
         self._config_slug = self.LEGACY_CONFIG_SLUG
         self._unified_job_template_slug = self.LEGACY_UNIFIED_TEMPLATE_SLUG
 
@@ -70,8 +88,15 @@ class JobTemplateRunner:
     def host(self, value: str):
         self._host = util.ensure_trailing_slash(value)
         self._set_slugs(value)
+        self.clear_template_cache()
+
+    def clear_template_cache(self) -> None:
+        self._template_cache.clear()
 
     async def close_session(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            self._monitor_task = None
         if self._session and not self._session.closed:
             await self._session.close()
 
@@ -132,9 +157,56 @@ class JobTemplateRunner:
                 return ssl.create_default_context(cafile=self.verify_ssl)
         return False
 
+    async def warm_template_cache(
+        self, templates: Iterable[TemplateKey]
+    ) -> None:
+        """Look up the (name, organization, type) templates in parallel
+        so the first launches find them in the template cache.
+        """
+        templates = list(set(templates))
+        results = await asyncio.gather(
+            *(self._get_template_obj(*key) for key in templates),
+            return_exceptions=True,
+        )
+        for key, result in zip(templates, results):
+            if isinstance(result, Exception) or not result:
+                logger.warning(
+                    "Cannot preload template %s in organization %s: %s",
+                    key[0],
+                    key[1],
+                    result if result else "not found",
+                )
+
     async def _get_template_obj(
         self, name: str, organization: str, unified_type: str
-    ) -> dict:
+    ) -> Optional[dict]:
+        key = (name, organization, unified_type)
+        cached = self._template_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        # Concurrent launches of the same template share a single lookup
+        lookup = self._template_lookups.get(key)
+        if lookup is None:
+            lookup = asyncio.ensure_future(self._lookup_template_obj(key))
+            self._template_lookups[key] = lookup
+            lookup.add_done_callback(
+                lambda _: self._template_lookups.pop(key, None)
+            )
+        return await asyncio.shield(lookup)
+
+    async def _lookup_template_obj(self, key: TemplateKey) -> Optional[dict]:
+        obj = await self._fetch_template_obj(*key)
+        if obj and self.template_cache_ttl > 0:
+            self._template_cache[key] = (
+                time.monotonic() + self.template_cache_ttl,
+                obj,
+            )
+        return obj
+
+    async def _fetch_template_obj(
+        self, name: str, organization: str, unified_type: str
+    ) -> Optional[dict]:
         params = {"name": name}
 
         while True:
@@ -184,7 +256,9 @@ class JobTemplateRunner:
                 )
             )
         url = urljoin(self.host, obj["launch"])
-        job = await self._launch(job_params, url)
+        job = await self._launch(
+            job_params, url, (name, organization, "job_template")
+        )
         return await self._monitor_job(job["url"])
 
     async def run_workflow_job_template(
@@ -209,19 +283,130 @@ class JobTemplateRunner:
                 "Workflow template %s does not accept limit, removing it", name
             )
             job_params.pop("limit")
-        job = await self._launch(job_params, url)
+        job = await self._launch(
+            job_params, url, (name, organization, "workflow_job_template")
+        )
         return await self._monitor_job(job["url"])
 
     async def _monitor_job(self, url) -> dict:
-        while True:
-            # fetch and process job status
-            json_body = await self._get_page(url, {})
-            if json_body["status"] in self.JOB_COMPLETION_STATUSES:
-                return json_body
+        """Wait for the job to complete and return its details.
+
+        The jobs being waited on are polled together by a single monitor
+        task, one list request per job type filtered with id__in.
+        """
+        list_slug, job_id = _split_job_url(url)
+        jobs = self._monitored_jobs.setdefault(list_slug, {})
+        if job_id not in jobs or jobs[job_id].done():
+            jobs[job_id] = asyncio.get_running_loop().create_future()
+        future = jobs[job_id]
 
-            await asyncio.sleep(self.refresh_delay)
+        if self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(
+                self._monitor_jobs(), name="job_monitor"
+            )
+        return await asyncio.shield(future)
+
+    async def _monitor_jobs(self) -> None:
+        delay = min(self.JOB_MONITOR_MIN_DELAY, self.refresh_delay)
+        try:
+            while True:
+                completed = await self._poll_jobs()
+                # No await between the check and the reset, so a job added
+                # afterwards always starts a new monitor task
+                if not self._monitored_jobs:
+                    self._monitor_task = None
+                    return
+
+                if completed:
+                    delay = min(self.JOB_MONITOR_MIN_DELAY, self.refresh_delay)
+                else:
+                    delay = min(delay * 2, self.refresh_delay)
+                await asyncio.sleep(delay)
+        except (Exception, asyncio.CancelledError) as e:
+            # Don't leave the waiting actions hanging
+            self._monitor_task = None
+            for jobs in self._monitored_jobs.values():
+                for future in jobs.values():
+                    if future.done():
+                        continue
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            self._monitored_jobs.clear()
+            self._missing_jobs.clear()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            logger.error("Job monitor failed %s", str(e))
+
+    async def _poll_jobs(self) -> int:
+        completed = 0
+        for list_slug, jobs in list(self._monitored_jobs.items()):
+            job_ids = [job_id for job_id, f in jobs.items() if not f.done()]
+            for i in range(0, len(job_ids), self.JOB_MONITOR_PAGE_SIZE):
+                chunk = job_ids[i : i + self.JOB_MONITOR_PAGE_SIZE]
+                try:
+                    completed += await self._poll_job_chunk(
+                        list_slug, jobs, chunk
+                    )
+                except ControllerApiException as e:
+                    for job_id in chunk:
+                        self._missing_jobs.discard((list_slug, job_id))
+                        future = jobs.pop(job_id, None)
+                        if future and not future.done():
+                            future.set_exception(e)
+
+            for job_id in [job_id for job_id, f in jobs.items() if f.done()]:
+                jobs.pop(job_id)
+            if not jobs:
+                self._monitored_jobs.pop(list_slug, None)
+        return completed
+
+    async def _poll_job_chunk(
+        self, list_slug: str, jobs: Dict[str, asyncio.Future], chunk: list
+    ) -> int:
+        completed = 0
+        json_body = await self._get_page(
+            list_slug,
+            {"id__in": ",".join(chunk), "page_size": len(chunk)},
+        )
+        found = set()
+        for result in json_body["results"]:
+            job_id = _split_job_url(result["url"])[1]
+            found.add(job_id)
+            if result["status"] not in self.JOB_COMPLETION_STATUSES:
+                continue
+            # The list endpoint leaves out fields like artifacts
+            job = await self._get_page(result["url"], {})
+            future = jobs.pop(job_id, None)
+            if future and not future.done():
+                future.set_result(job)
+            completed += 1
 
-    async def _launch(self, job_params: dict, url: str) -> dict:
+        # A job left out of two lists in a row was deleted
+        for job_id in chunk:
+            key = (list_slug, job_id)
+            if job_id in found:
+                self._missing_jobs.discard(key)
+            elif key not in self._missing_jobs:
+                self._missing_jobs.add(key)
+            else:
+                self._missing_jobs.discard(key)
+                future = jobs.pop(job_id, None)
+                if future and not future.done():
+                    future.set_exception(
+                        ControllerApiException(
+                            f"Job {list_slug}{job_id} not found"
+                        )
+                    )
+        return completed
+
+    async def _launch(
+        self,
+        job_params: dict,
+        url: str,
+        template_key: Optional[TemplateKey] = None,
+    ) -> dict:
         body = None
         try:
             async with self._session.post(
@@ -237,7 +422,20 @@ class JobTemplateRunner:
             logger.error("Error connecting to controller %s", str(e))
             if body:
                 logger.error("Error %s", body)
+            if (
+                isinstance(e, aiohttp.ClientResponseError)
+                and e.status == 404
+                and template_key
+            ):
+                # The template was deleted or recreated, look it up again
+                self._template_cache.pop(template_key, None)
             raise ControllerApiException(str(e))
 
 
+def _split_job_url(url: str) -> Tuple[str, str]:
+    """Split a job url like /api/v2/jobs/42/ into its list url and id"""
+    list_slug, _, job_id = url.rstrip("/").rpartition("/")
+    return f"{list_slug}/", job_id
+
+
 job_template_runner = JobTemplateRunner()
@@ -13,7 +13,8 @@
 #  limitations under the License.
 
 """Generate condition AST from Ansible condition."""
-from typing import Dict, List
+import re
+from typing import Dict, List, Optional, Set
 
 import dpath
 
@@ -211,6 +212,62 @@ def create_binary_node(name, parsed_condition, variables):
     }
 
 
+EVENTS_IDENTIFIER = re.compile(r"^events\.(\w+)(.*)$")
+
+
+def referenced_event_paths(ruleset: RuleSet) -> Optional[Set[str]]:
+    """Return the paths of the event attributes referenced by the
+    conditions and the throttles of a ruleset, relative to the event.
+
+    Returns None when a condition references a whole event.
+    """
+    paths: Set[str] = set()
+    for rule in ruleset.rules:
+        identifiers = condition_identifiers(rule.condition.value)
+        if rule.throttle:
+            identifiers.extend(rule.throttle.group_by_attributes)
+        for identifier in identifiers:
+            path = event_path(identifier)
+            if path == "":
+                return None
+            if path is not None:
+                paths.add(path)
+    return paths
+
+
+def event_path(identifier: str) -> Optional[str]:
+    """Return the path of an event identifier relative to the event, or
+    None when the identifier doesn't reference an event.
+    """
+    if identifier == "event":
+        return ""
+    if identifier.startswith("event."):
+        return identifier[6:]
+    if identifier.startswith("event["):
+        return identifier[5:]
+    match = EVENTS_IDENTIFIER.match(identifier)
+    if match:
+        return match.group(2).lstrip(".")
+    return None
+
+
+def condition_identifiers(parsed_condition) -> List[str]:
+    if isinstance(parsed_condition, Identifier):
+        return [parsed_condition.value]
+    if isinstance(parsed_condition, OperatorExpression):
+        if parsed_condition.operator == "<<":
+            # The left side names the event matched by the right side
+            return condition_identifiers(parsed_condition.right)
+        left = condition_identifiers(parsed_condition.left)
+        return left + condition_identifiers(parsed_condition.right)
+    if isinstance(parsed_condition, (list, tuple)):
+        identifiers = []
+        for value in parsed_condition:
+            identifiers.extend(condition_identifiers(value))
+        return identifiers
+    return []
+
+
 def visit_rule(parsed_rule: Rule, variables: Dict):
     data = {
         "name": parsed_rule.name,
@@ -0,0 +1,94 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Partitioning of the events of a sharded ruleset.
+
+A ruleset with shards > 1 runs one rule engine session per shard, each in
+its own process. Every event goes to the shard picked by the hash of its
+partition key, so the rules of the ruleset must only ever correlate
+events with the same partition key.
+"""
+
+import json
+import zlib
+from typing import Any, Dict, List
+
+from ansible_rulebook import rule_types as rt
+from ansible_rulebook.exception import RulesetPartitionException
+
+_MISSING = object()
+
+
+def _key_path(partition_by: str) -> List[str]:
+    path = partition_by.split(".")
+    if path[0] == "event":
+        path = path[1:]
+    return path
+
+
+def partition_key(data: Dict, partition_by: str) -> Any:
+    """The value at the partition_by path of an event, None if missing"""
+    value = _lookup(data, partition_by)
+    return None if value is _MISSING else value
+
+
+def has_partition_key(data: Dict, partition_by: str) -> bool:
+    return _lookup(data, partition_by) is not _MISSING
+
+
+def _lookup(data: Dict, partition_by: str) -> Any:
+    value = data
+    for name in _key_path(partition_by):
+        if not isinstance(value, dict) or name not in value:
+            return _MISSING
+        value = value[name]
+    return value
+
+
+def shard_for(data: Dict, partition_by: str, shards: int) -> int:
+    """The shard of an event, stable across processes and restarts"""
+    key = json.dumps(
+        partition_key(data, partition_by), sort_keys=True, default=str
+    )
+    return zlib.crc32(key.encode()) % shards
+
+
+def validate_partitioning(ruleset: rt.RuleSet) -> None:
+    """Reject a sharded ruleset whose rules correlate events that could
+    be partitioned to different shards.
+    """
+    for rule in ruleset.rules:
+        if rule.condition.when in ("all", "not_all") and (
+            len(rule.condition.value) > 1
+        ):
+            raise RulesetPartitionException(
+                f"Ruleset {ruleset.name} is partitioned by "
+                f"{ruleset.partition_by}, rule {rule.name} can't match "
+                f"multiple events with {rule.condition.when}"
+            )
+        if rule.throttle is None:
+            continue
+        if rule.throttle.once_after:
+            raise RulesetPartitionException(
+                f"Ruleset {ruleset.name} is partitioned by "
+                f"{ruleset.partition_by}, rule {rule.name} can't be "
+                "throttled with once_after"
+            )
+        group_by = [_key_path(a) for a in rule.throttle.group_by_attributes]
+        if _key_path(ruleset.partition_by) not in group_by:
+            raise RulesetPartitionException(
+                f"Ruleset {ruleset.name} is partitioned by "
+                f"{ruleset.partition_by}, the throttle of rule {rule.name} "
+                f"must group by {ruleset.partition_by}"
+            )
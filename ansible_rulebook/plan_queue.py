@@ -0,0 +1,93 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PLAN_QUEUE_HIGH_WATERMARK = 10
+DEFAULT_PLAN_QUEUE_LOW_WATERMARK = 5
+
+
+class PlanQueue(asyncio.Queue):
+    """Queue of the action plans of a ruleset with watermark flow control.
+
+    The rule engine callbacks add to the queue synchronously, so puts
+    never block. Instead the producer of the events awaits
+    wait_for_capacity before posting more events: it is paused once the
+    queue holds more than high_watermark plans and resumed when the
+    actions have drained it down to low_watermark plans.
+    """
+
+    def __init__(
+        self,
+        high_watermark: int = DEFAULT_PLAN_QUEUE_HIGH_WATERMARK,
+        low_watermark: Optional[int] = DEFAULT_PLAN_QUEUE_LOW_WATERMARK,
+    ):
+        if high_watermark < 1:
+            raise ValueError("Plan queue high watermark must be at least 1")
+        if low_watermark is None:
+            low_watermark = high_watermark // 2
+        if not 0 <= low_watermark <= high_watermark:
+            raise ValueError(
+                "Plan queue low watermark must be between 0 and the "
+                "high watermark"
+            )
+        super().__init__()
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.peak_size = 0
+        self.blocked = 0
+        self.blocked_time = 0.0
+        self._capacity = asyncio.Event()
+        self._capacity.set()
+
+    async def wait_for_capacity(self) -> None:
+        """Return once the queue is below its high watermark"""
+        if self._capacity.is_set():
+            return
+        self.blocked += 1
+        start = time.monotonic()
+        try:
+            await self._capacity.wait()
+        finally:
+            self.blocked_time += time.monotonic() - start
+
+    def stats(self) -> Dict:
+        return {
+            "size": self.qsize(),
+            "highWatermark": self.high_watermark,
+            "lowWatermark": self.low_watermark,
+            "peakSize": self.peak_size,
+            "blocked": self.blocked,
+            "blockedMs": round(self.blocked_time * 1000, 3),
+        }
+
+    def _put(self, item: Any) -> None:
+        super()._put(item)
+        size = self.qsize()
+        self.peak_size = max(self.peak_size, size)
+        if size > self.high_watermark and self._capacity.is_set():
+            logger.debug("Plan queue above high watermark, size %d", size)
+            self._capacity.clear()
+
+    def _get(self) -> Any:
+        item = super()._get()
+        if self.qsize() <= self.low_watermark and not self._capacity.is_set():
+            logger.debug("Plan queue down to low watermark")
+            self._capacity.set()
+        return item
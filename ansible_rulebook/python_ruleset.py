@@ -0,0 +1,440 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Rule engine running the stateless rulesets in Python.
+
+A ruleset whose rules each match a single event, without a timeout or a
+throttle, doesn't need the Rete network of drools: an event is matched
+by the first rule whose condition holds on it and is then dropped. A
+fact is matched by every rule whose condition holds on it and is kept
+when it matched a rule.
+
+The conditions of such a ruleset are compiled from the condition AST of
+json_generator into Python predicates. A PythonRuleset is registered
+with the rulesets of drools, so it is called through the same functions
+as a ruleset running on drools, and the JVM is only started when a
+ruleset needs drools.
+"""
+
+import copy
+import json
+import logging
+import operator
+import re
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from drools.exceptions import RuleNotFoundError
+from drools.rule import Rule
+from drools.ruleset import Matches, RulesetCollection
+
+from ansible_rulebook.event_projection import parse_path
+from ansible_rulebook.util import run_at
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+Predicate = Callable[[Any], bool]
+Operand = Callable[[Any], Any]
+
+COMPARISONS = {
+    "GreaterThanExpression": operator.gt,
+    "GreaterThanOrEqualToExpression": operator.ge,
+    "LessThanExpression": operator.lt,
+    "LessThanOrEqualToExpression": operator.le,
+}
+TESTS = (
+    "EqualsExpression",
+    "NotEqualsExpression",
+    *COMPARISONS,
+    "ItemInListExpression",
+    "ItemNotInListExpression",
+    "ListContainsItemExpression",
+    "ListNotContainsItemExpression",
+    "SearchMatchesExpression",
+    "SearchNotMatchesExpression",
+)
+CONSTANTS = ("String", "Integer", "Float", "Boolean", "NullType")
+SEARCH_OPTIONS = {"ignorecase": re.IGNORECASE, "multiline": re.MULTILINE}
+
+
+class UnsupportedCondition(Exception):
+    """A condition only drools can evaluate"""
+
+
+def jvm_features(ruleset_ast: Dict) -> List[str]:
+    """Return the features of a ruleset AST only drools supports, the
+    ruleset can run on a PythonRuleset when there are none.
+    """
+    features = []
+    if ruleset_ast.get("match_multiple_rules"):
+        # The events matching multiple rules are kept until they expire
+        features.append("the ruleset matches multiple rules")
+    for rule in _enabled_rules(ruleset_ast):
+        try:
+            _compile_rule(rule)
+        except UnsupportedCondition as e:
+            features.append(f"rule {rule['name']} {e}")
+    return features
+
+
+def _enabled_rules(ruleset_ast: Dict) -> List[Dict]:
+    rules = (item["Rule"] for item in ruleset_ast["rules"])
+    return [rule for rule in rules if rule.get("enabled", True)]
+
+
+def _compile_rule(rule: Dict) -> List[Tuple[str, Predicate]]:
+    """Return the binding and the predicate of each condition of a rule"""
+    if "throttle" in rule:
+        raise UnsupportedCondition("is throttled")
+    condition = rule["condition"]
+    if "timeout" in condition:
+        raise UnsupportedCondition("has a timeout")
+    if "NotAllCondition" in condition:
+        raise UnsupportedCondition("matches not all of its conditions")
+    if "AllCondition" in condition:
+        values = condition["AllCondition"]
+        if len(values) > 1:
+            raise UnsupportedCondition("matches several events")
+    else:
+        values = condition["AnyCondition"]
+    predicates = []
+    for index, value in enumerate(values):
+        binding = "m" if len(values) == 1 else f"m_{index}"
+        if "AssignmentExpression" in value:
+            # The name of events.<name> or facts.<name>
+            (binding,) = value["AssignmentExpression"]["lhs"].values()
+            value = value["AssignmentExpression"]["rhs"]
+        predicates.append((binding, _compile_condition(value)))
+    return predicates
+
+
+def _compile_condition(node: Dict) -> Predicate:
+    kind, value = next(iter(node.items()))
+    if kind in ("Event", "Fact", "Boolean"):
+        operand = _compile_operand(node)
+        return lambda event: operand(event) is True
+    if kind in ("AndExpression", "OrExpression"):
+        left = _compile_condition(value["lhs"])
+        right = _compile_condition(value["rhs"])
+        if kind == "AndExpression":
+            return lambda event: left(event) and right(event)
+        return lambda event: left(event) or right(event)
+    if kind == "IsDefinedExpression":
+        operand = _compile_operand(value)
+        return lambda event: operand(event) is not MISSING
+    if kind == "NegateExpression":
+        return _compile_negation(value)
+    operands, test = _compile_test(kind, value)
+    return _defined_and(operands, test)
+
+
+def _compile_negation(node: Dict) -> Predicate:
+    """Negate a single test, like drools the negation only holds when the
+    attributes the test references are defined.
+    """
+    kind, value = next(iter(node.items()))
+    if kind in ("Event", "Fact"):
+        operand = _compile_operand(node)
+        return _defined_and([operand], lambda value: value is not True)
+    if kind not in TESTS:
+        raise UnsupportedCondition(f"negates {kind}")
+    operands, test = _compile_test(kind, value)
+    if kind in COMPARISONS:
+        # Like drools, a null is never ordered and values of other types
+        # can't be ordered
+        return _defined_and(
+            operands,
+            lambda lhs, rhs: lhs is None
+            or rhs is None
+            or (_comparable(lhs, rhs) and not test(lhs, rhs)),
+        )
+    return _defined_and(operands, lambda *values: not test(*values))
+
+
+def _defined_and(operands: List[Operand], test: Callable) -> Predicate:
+    if len(operands) == 1:
+        (operand,) = operands
+
+        def predicate(event):
+            value = operand(event)
+            return value is not MISSING and test(value)
+
+        return predicate
+    left, right = operands
+
+    def predicate(event):
+        lhs, rhs = left(event), right(event)
+        return lhs is not MISSING and rhs is not MISSING and test(lhs, rhs)
+
+    return predicate
+
+
+def _compile_test(kind: str, value: Any) -> Tuple[List[Operand], Callable]:
+    """Return the operands of a test and the test of their values"""
+    if kind == "EqualsExpression":
+        return _binary(value), _equal
+    if kind == "NotEqualsExpression":
+        return _binary(value), lambda lhs, rhs: not _equal(lhs, rhs)
+    if kind in COMPARISONS:
+        compare = COMPARISONS[kind]
+        return _binary(value), lambda lhs, rhs: (
+            _comparable(lhs, rhs) and compare(lhs, rhs)
+        )
+    if kind in ("ItemInListExpression", "ItemNotInListExpression"):
+        items = _compile_list(value["rhs"])
+        expected = kind == "ItemInListExpression"
+        return [_compile_operand(value["lhs"])], lambda lhs: (
+            any(_equal(lhs, item) for item in items) == expected
+        )
+    if kind in ("ListContainsItemExpression", "ListNotContainsItemExpression"):
+        expected = kind == "ListContainsItemExpression"
+        return _binary(value), lambda lhs, rhs: (
+            _contains(lhs, rhs) == expected
+        )
+    if kind in ("SearchMatchesExpression", "SearchNotMatchesExpression"):
+        search = _compile_search(value["rhs"])
+        expected = kind == "SearchMatchesExpression"
+        return [_compile_operand(value["lhs"])], lambda lhs: (
+            (isinstance(lhs, str) and search(lhs) is not None) == expected
+        )
+    raise UnsupportedCondition(f"uses {kind}")
+
+
+def _binary(value: Dict) -> List[Operand]:
+    return [_compile_operand(value["lhs"]), _compile_operand(value["rhs"])]
+
+
+def _compile_operand(node: Any) -> Operand:
+    if not isinstance(node, dict) or len(node) != 1:
+        raise UnsupportedCondition(f"uses the value {node}")
+    kind, value = next(iter(node.items()))
+    if kind == "String" and not isinstance(value, str):
+        # A string rendered from a variable holding another type
+        value = str(value)
+    if kind in CONSTANTS:
+        return lambda event: value
+    if kind in ("Event", "Fact"):
+        keys = parse_path(value, indexes=True)
+        if keys is None:
+            raise UnsupportedCondition(f"references the attribute {value}")
+        return lambda event: _lookup(event, keys)
+    if kind in ("Events", "Facts"):
+        raise UnsupportedCondition("references the events of a condition")
+    raise UnsupportedCondition(f"uses {kind}")
+
+
+def _compile_list(node: Any) -> List[Any]:
+    items = node if isinstance(node, list) else [node]
+    operands = [_compile_operand(item) for item in items]
+    if any(next(iter(item)) not in CONSTANTS for item in items):
+        raise UnsupportedCondition("looks up a value in an attribute")
+    return [operand(None) for operand in operands]
+
+
+def _compile_search(node: Dict) -> Callable[[str], Any]:
+    search = node["SearchType"]
+    kind = search["kind"]["String"]
+    flags = 0
+    for option in search.get("options", []):
+        name = option["name"]["String"]
+        if name not in SEARCH_OPTIONS:
+            raise UnsupportedCondition(f"uses the search option {name}")
+        if next(iter(option["value"].values())):
+            flags |= SEARCH_OPTIONS[name]
+    try:
+        pattern = re.compile(search["pattern"]["String"], flags)
+    except re.error:
+        raise UnsupportedCondition(f"uses the pattern {search['pattern']}")
+    return pattern.match if kind == "match" else pattern.search
+
+
+def _lookup(event: Any, keys: List[Union[str, int]]) -> Any:
+    value = event
+    for key in keys:
+        if isinstance(key, int):
+            if not isinstance(value, list) or key >= len(value):
+                return MISSING
+        elif not isinstance(value, dict) or key not in value:
+            return MISSING
+        value = value[key]
+    return value
+
+
+def _equal(lhs: Any, rhs: Any) -> bool:
+    """Like drools a boolean is never equal to a number"""
+    if isinstance(lhs, bool) or isinstance(rhs, bool):
+        return type(lhs) is type(rhs) and lhs == rhs
+    return lhs == rhs
+
+
+def _comparable(lhs: Any, rhs: Any) -> bool:
+    if isinstance(lhs, str) and isinstance(rhs, str):
+        return True
+    return all(
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        for value in (lhs, rhs)
+    )
+
+
+def _contains(container: Any, item: Any) -> bool:
+    if isinstance(container, list):
+        return any(_equal(value, item) for value in container)
+    return _equal(container, item)
+
+
+def _parse(data: Union[str, Dict]) -> Dict:
+    return json.loads(data) if isinstance(data, str) else data
+
+
+class PythonRuleset:
+    """A stateless ruleset evaluated in Python, with the methods of the
+    rulesets of drools. The ruleset AST must have no jvm_features.
+    """
+
+    def __init__(self, name: str, ruleset_ast: Dict):
+        self.name = name
+        self.serialized_ruleset = json.dumps(ruleset_ast)
+        rules = _enabled_rules(ruleset_ast)
+        self._conditions = [
+            (rule["name"], _compile_rule(rule)) for rule in rules
+        ]
+        self._disabled_rules = len(ruleset_ast["rules"]) - len(rules)
+        self._rules: Dict[str, Rule] = {}
+        self._facts: List[Dict] = []
+        # Matched by no response of the async channel of drools
+        self._session_id = None
+        self._stats = {
+            "start": run_at(),
+            "rulesTriggered": 0,
+            "eventsProcessed": 0,
+            "eventsMatched": 0,
+            "eventsSuppressed": 0,
+            "lastRuleFired": "",
+            "lastRuleFiredAt": None,
+            "lastEventReceivedAt": None,
+        }
+        RulesetCollection.add(self)
+
+    def add_rule(self, rule: Rule) -> None:
+        self._rules[rule.name] = rule
+
+    def define(self) -> str:
+        return self.serialized_ruleset
+
+    def end_session(self) -> Dict:
+        stats = self.session_stats()
+        stats["end"] = run_at()
+        return stats
+
+    def get_facts(self) -> List[Dict]:
+        return copy.deepcopy(self._facts)
+
+    def assert_event(self, serialized_event: Union[str, Dict]) -> None:
+        event = _parse(serialized_event)
+        self._stats["eventsProcessed"] += 1
+        self._stats["lastEventReceivedAt"] = run_at()
+        matches = self._match(event, False)
+        if matches:
+            self._stats["eventsMatched"] += 1
+        else:
+            self._stats["eventsSuppressed"] += 1
+        self._dispatch(matches)
+
+    def assert_fact(self, serialized_fact: Union[str, Dict]) -> None:
+        fact = _parse(serialized_fact)
+        matches = self._match(fact, True)
+        # Like drools, a fact no rule matches is not kept
+        if matches:
+            self._facts.append(fact)
+        self._dispatch(matches)
+
+    def retract_fact(self, serialized_fact: Union[str, Dict]) -> None:
+        fact = _parse(serialized_fact)
+        self._facts = [item for item in self._facts if item != fact]
+
+    def retract_matching_facts(
+        self,
+        serialized_fact: Union[str, Dict],
+        partial: bool,
+        exclude_keys: List[str],
+    ) -> None:
+        fact = _parse(serialized_fact)
+        if partial:
+            self._facts = [
+                item
+                for item in self._facts
+                if any(
+                    key not in item or item[key] != value
+                    for key, value in fact.items()
+                )
+            ]
+            return
+        retracted = self._without(fact, exclude_keys)
+        self._facts = [
+            item
+            for item in self._facts
+            if self._without(item, exclude_keys) != retracted
+        ]
+
+    def session_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats.update(
+            numberOfRules=len(self._conditions),
+            numberOfDisabledRules=self._disabled_rules,
+            permanentStorageCount=len(self._facts),
+            permanentStorageSize=sum(
+                len(json.dumps(fact)) for fact in self._facts
+            ),
+            ruleSetName=self.name,
+        )
+        return stats
+
+    def advance_time(self, amount: int, units: str) -> None:
+        """A stateless ruleset has no timers"""
+
+    def get_pending_events(self) -> None:
+        pass
+
+    @staticmethod
+    def _without(fact: Dict, keys: List[str]) -> Dict:
+        return {key: value for key, value in fact.items() if key not in keys}
+
+    def _match(self, data: Dict, all_rules: bool) -> List[Dict]:
+        """Return the results of the rules matching the data, only the
+        first one unless all_rules is set. Like the matches of drools,
+        each result has its own copy of the data.
+        """
+        matches = []
+        for name, predicates in self._conditions:
+            for binding, predicate in predicates:
+                if predicate(data):
+                    matches.append({name: {binding: copy.deepcopy(data)}})
+                    break
+            if matches and not all_rules:
+                break
+        return matches
+
+    def _dispatch(self, matches: List[Dict]) -> None:
+        for rule_match in matches:
+            for name, value in rule_match.items():
+                if name not in self._rules:
+                    raise RuleNotFoundError(
+                        f"Rule {name} does not exist in Ruleset {self.name}"
+                    )
+                self._stats["rulesTriggered"] += 1
+                self._stats["lastRuleFired"] = name
+                self._stats["lastRuleFiredAt"] = run_at()
+                logger.debug("Calling rule %s of ruleset %s", name, self.name)
+                self._rules[name].callback(Matches(data=value))
@@ -0,0 +1,105 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Events received by a source as serialized JSON objects.
+
+A source receiving its events as JSON, from a webhook, a kafka topic or
+a websocket, can put a RawEvent holding the JSON on its queue instead of
+parsing it. The meta of the event is spliced into the JSON, which is
+passed as is to the rule engine. The JSON is only parsed when a source
+filter, the partitioning of a sharded ruleset, or the pre-filter or the
+projection of the events of a ruleset needs the attributes of the event.
+"""
+
+import json
+from typing import Any, Dict, Optional, Union
+
+
+class RawEvent:
+    """An event serialized as a JSON object, parsed on demand.
+
+    The parsed view of the event is shared and must not be changed, the
+    event returned by event() can be changed and is serialized again
+    when the event is posted.
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, str]):
+        if not isinstance(data, str):
+            data = bytes(data).decode()
+        data = data.strip()
+        if not (data.startswith("{") and data.endswith("}")):
+            raise ValueError("A raw event must be a JSON object")
+        self.data = data
+        # The meta spliced into the JSON, set by the insert_meta_info
+        # filter when the JSON has no meta
+        self.meta: Optional[Dict] = None
+        self._view: Optional[Dict] = None
+        self._event: Optional[Dict] = None
+
+    def __repr__(self) -> str:
+        return f"RawEvent({self.to_json()})"
+
+    def __reduce__(self):
+        return (RawEvent, (self.to_json(),))
+
+    def has_meta(self) -> bool:
+        """Whether the event could have a meta, without parsing it"""
+        return (
+            self._event is not None
+            or self.meta is not None
+            or '"meta"' in self.data
+        )
+
+    def view(self) -> Dict:
+        """The parsed event, for reading only"""
+        if self._event is not None:
+            return self._event
+        if self._view is None:
+            self._view = json.loads(self.data)
+            if self.meta is not None:
+                self._view["meta"] = self.meta
+        return self._view
+
+    def event(self) -> Dict:
+        """The parsed event, serialized again when it is posted"""
+        if self._event is None:
+            self._event = self.view()
+            self._view = None
+        return self._event
+
+    def to_json(self) -> str:
+        if self._event is not None:
+            return json.dumps(self._event)
+        if self.meta is None:
+            return self.data
+        body = self.data[:-1].rstrip()
+        separator = "" if body.endswith("{") else ","
+        return f'{body}{separator}"meta":{json.dumps(self.meta)}}}'
+
+
+def event_view(data: Any) -> Any:
+    """The parsed event of a RawEvent for reading only, other data as is"""
+    return data.view() if isinstance(data, RawEvent) else data
+
+
+def parse_event(data: Any) -> Any:
+    """The parsed event of a RawEvent, other data as is"""
+    return data.event() if isinstance(data, RawEvent) else data
+
+
+def serialize_event(data: Any) -> Any:
+    """The JSON of a RawEvent, as posted to the rule engine, other data as
+    is
+    """
+    return data.to_json() if isinstance(data, RawEvent) else data
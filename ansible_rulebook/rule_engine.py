@@ -0,0 +1,60 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""The rule engine calls of the rulesets.
+
+A ruleset runs on drools or, when it is stateless, on a PythonRuleset.
+Both are registered with the rulesets of drools and are called through
+the functions of drools.ruleset, except for posting an event: drools
+collects the garbage of the JVM every so many posts, and the JVM isn't
+started when every ruleset runs in Python.
+"""
+
+from typing import Any
+
+from drools.ruleset import (
+    RulesetCollection,
+    advance_time,
+    assert_event,
+    assert_fact,
+    end_session,
+    get_facts,
+    get_pending_events,
+    post as drools_post,
+    retract_fact,
+    retract_matching_facts,
+    session_stats,
+)
+
+from ansible_rulebook.python_ruleset import PythonRuleset
+
+__all__ = [
+    "advance_time",
+    "assert_event",
+    "assert_fact",
+    "end_session",
+    "get_facts",
+    "get_pending_events",
+    "post",
+    "retract_fact",
+    "retract_matching_facts",
+    "session_stats",
+]
+
+
+def post(ruleset_name: str, serialized_event: Any):
+    ruleset = RulesetCollection.get(ruleset_name)
+    if isinstance(ruleset, PythonRuleset):
+        return ruleset.assert_event(serialized_event)
+    return drools_post(ruleset_name, serialized_event)
@@ -12,15 +12,21 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import asyncio
 import json
 import logging
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Union
 
 from drools.rule import Rule as DroolsRule
 from drools.ruleset import Ruleset as DroolsRuleset
 
+from ansible_rulebook.conf import settings
+from ansible_rulebook.engine_executor import (
+    EngineExecutor,
+    create_engine_executor,
+)
 from ansible_rulebook.json_generator import visit_ruleset
+from ansible_rulebook.plan_queue import PlanQueue
+from ansible_rulebook.python_ruleset import PythonRuleset, jvm_features
 from ansible_rulebook.rule_types import (
     Action,
     ActionContext,
@@ -67,10 +73,14 @@ def make_fn(
     inventory: str,
     hosts: List,
     plan: Plan,
+    executor: EngineExecutor,
 ) -> Callable:
     def fn(rule_engine_results):
         logger.debug("callback calling %s", ansible_rule.name)
-        add_to_plan(
+        # Called on the engine thread of the ruleset when the match comes
+        # from a post, the plan queue belongs to the event loop
+        executor.call_in_loop(
+            add_to_plan,
             ruleset,
             ruleset_uuid,
             ansible_rule.name,
@@ -86,6 +96,22 @@ def make_fn(
     return fn
 
 
+def create_engine_ruleset(
+    ruleset_ast: Dict,
+) -> Union[DroolsRuleset, PythonRuleset]:
+    """Create the rule engine session of a ruleset, in Python when the
+    rule engine is auto and the ruleset is stateless, on drools otherwise.
+    """
+    name = ruleset_ast["name"]
+    if settings.rule_engine == "auto":
+        features = jvm_features(ruleset_ast)
+        if not features:
+            logger.info("Ruleset %s runs on the Python rule engine", name)
+            return PythonRuleset(name=name, ruleset_ast=ruleset_ast)
+        logger.info("Ruleset %s runs on drools: %s", name, ", ".join(features))
+    return DroolsRuleset(name=name, serialized_ruleset=json.dumps(ruleset_ast))
+
+
 def generate_rulesets(
     ruleset_queues: List[RuleSetQueue],
     variables: Dict,
@@ -96,11 +122,14 @@ def generate_rulesets(
 
     for ansible_ruleset, source_queue in ruleset_queues:
         ruleset_ast = visit_ruleset(ansible_ruleset, variables)
-        drools_ruleset = DroolsRuleset(
-            name=ansible_ruleset.name,
-            serialized_ruleset=json.dumps(ruleset_ast["RuleSet"]),
+        engine_ruleset = create_engine_ruleset(ruleset_ast["RuleSet"])
+        plan = Plan(
+            queue=PlanQueue(
+                settings.plan_queue_high_watermark,
+                settings.plan_queue_low_watermark,
+            )
         )
-        plan = Plan(queue=asyncio.Queue())
+        executor = create_engine_executor(ansible_ruleset.name)
         for ansible_rule in ansible_ruleset.rules:
             if ansible_rule.enabled:
                 fn = make_fn(
@@ -111,12 +140,13 @@ def generate_rulesets(
                     inventory,
                     ansible_ruleset.hosts,
                     plan,
+                    executor,
                 )
-                drools_ruleset.add_rule(
+                engine_ruleset.add_rule(
                     DroolsRule(name=ansible_rule.name, callback=fn)
                 )
 
         rulesets.append(
-            EngineRuleSetQueuePlan(drools_ruleset, source_queue, plan)
+            EngineRuleSetQueuePlan(engine_ruleset, source_queue, plan)
         )
     return rulesets
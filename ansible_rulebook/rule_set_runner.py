@@ -13,23 +13,26 @@
 #  limitations under the License.
 
 import asyncio
+import concurrent.futures
 import gc
 import logging
+import os
+import time
 import uuid
+from collections import ChainMap
 from pprint import pformat
 from types import MappingProxyType
-from typing import Dict, List, Optional, Union, cast
+from typing import Dict, FrozenSet, List, Optional, Union, cast
+from urllib.parse import quote
 
 import dpath
 import jinja2.exceptions as jinja2_exceptions
-from drools import ruleset as lang
 from drools.exceptions import (
     MessageNotHandledException,
     MessageObservedException,
 )
-from drools.ruleset import session_stats
 
-from ansible_rulebook import terminal
+from ansible_rulebook import rule_engine as lang, terminal
 from ansible_rulebook.action.control import Control
 from ansible_rulebook.action.debug import Debug
 from ansible_rulebook.action.metadata import Metadata
@@ -45,11 +48,28 @@ from ansible_rulebook.action.run_workflow_template import RunWorkflowTemplate
 from ansible_rulebook.action.set_fact import SetFact
 from ansible_rulebook.action.shutdown import Shutdown as ShutdownAction
 from ansible_rulebook.conf import settings
+from ansible_rulebook.engine_executor import (
+    remove_engine_executor,
+    run_in_engine,
+)
+from ansible_rulebook.event_journal import EventJournal, parse_events_ttl
+from ansible_rulebook.event_prefilter import compile_prefilter
+from ansible_rulebook.event_projection import (
+    EventProjection,
+    compile_projection,
+)
 from ansible_rulebook.exception import (
     ShutdownException,
     UnsupportedActionException,
 )
+from ansible_rulebook.fact_checkpoint import (
+    FactCheckpoint,
+    fact_checkpoint_dir,
+)
+from ansible_rulebook.json_generator import referenced_event_paths
 from ansible_rulebook.messages import Shutdown
+from ansible_rulebook.raw_event import event_view, serialize_event
+from ansible_rulebook.rule_engine import session_stats
 from ansible_rulebook.rule_types import (
     Action,
     ActionContext,
@@ -57,7 +77,9 @@ from ansible_rulebook.rule_types import (
     ExecutionStrategy,
 )
 from ansible_rulebook.rules_parser import parse_hosts
+from ansible_rulebook.source_queue import FairSourceQueue, SourceQueue
 from ansible_rulebook.util import (
+    copy_value,
     mask_sensitive_variable_values,
     run_at,
     send_session_stats,
@@ -66,6 +88,10 @@ from ansible_rulebook.util import (
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SHUTDOWN_DELAY = 60.0
+# How often stop() checks whether the pending rules have run
+STOP_POLL_INTERVAL = 0.1
+
 ACTION_CLASSES = {
     "debug": Debug,
     "print_event": PrintEvent,
@@ -82,6 +108,39 @@ ACTION_CLASSES = {
 }
 
 
+class PostBatchStats:
+    """Collects the size and latency of the event batches a ruleset
+    posts to the rule engine, reported with the session stats.
+    """
+
+    def __init__(self):
+        self.batches = 0
+        self.events = 0
+        self.last_batch_size = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def record(self, size: int, latency: float) -> None:
+        self.batches += 1
+        self.events += size
+        self.last_batch_size = size
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+
+    def to_dict(self) -> Dict:
+        avg_latency = self.total_latency / self.batches if self.batches else 0
+        return {
+            "batches": self.batches,
+            "events": self.events,
+            "lastBatchSize": self.last_batch_size,
+            "lastLatencyMs": round(self.last_latency * 1000, 3),
+            "avgLatencyMs": round(avg_latency * 1000, 3),
+            "maxLatencyMs": round(self.max_latency * 1000, 3),
+        }
+
+
 class RuleSetRunner:
     def __init__(
         self,
@@ -95,6 +154,10 @@ class RuleSetRunner:
         broadcast_method=None,
     ):
         self.action_loop_task = None
+        self.source_loop_task = None
+        # Set when the ruleset is stopped for a hot reload
+        self.stopping = False
+        self._waiting_for_event = False
         self.event_log = event_log
         self.ruleset_queue_plan = ruleset_queue_plan
         self.name = ruleset_queue_plan.ruleset.name
@@ -108,11 +171,54 @@ class RuleSetRunner:
         self.broadcast_method = broadcast_method
         self.event_counter = 0
         self.display = terminal.Display()
+        self.post_batch_size = settings.post_batch_size
+        self.post_batch_window = settings.post_batch_window_ms / 1000.0
+        self.post_batch_stats = PostBatchStats()
+        self.journal = None
+        if settings.event_journal_dir:
+            self.journal = EventJournal(
+                os.path.join(
+                    settings.event_journal_dir, quote(self.name, safe="")
+                ),
+                parse_events_ttl(rule_set.default_events_ttl),
+                settings.event_journal_sync_ms / 1000.0,
+            )
+        self.prefilter = compile_prefilter(rule_set)
+        if self.prefilter:
+            logger.debug(
+                "Events of ruleset %s no rule can match are skipped",
+                self.name,
+            )
+        self.event_projection = None
+        if settings.event_projection:
+            projection = compile_projection(referenced_event_paths(rule_set))
+            if projection:
+                self.event_projection = EventProjection(
+                    projection, parse_events_ttl(rule_set.default_events_ttl)
+                )
+            else:
+                logger.info(
+                    "Events of ruleset %s are not projected, a condition "
+                    "references whole events",
+                    self.name,
+                )
+        self.fact_checkpoint = None
+        self.fact_checkpoint_task = None
+        if fact_checkpoint_dir(self.name):
+            self.fact_checkpoint = FactCheckpoint(
+                fact_checkpoint_dir(self.name)
+            )
+            # Checkpoints are written behind, on their own thread
+            self.checkpoint_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"checkpoint-{self.name}"
+            )
 
     async def run_ruleset(self):
         tasks = []
         try:
-            prime_facts(self.name, self.hosts_facts)
+            await self._prime_facts()
+            if self.journal:
+                await self._replay_journal()
             task_name = (
                 f"action_plan_task:: {self.ruleset_queue_plan.ruleset.name}"
             )
@@ -127,6 +233,12 @@ class RuleSetRunner:
                 self._drain_source_queue(), name=task_name
             )
             tasks.append(self.source_loop_task)
+            if self.fact_checkpoint:
+                task_name = f"fact_checkpoint_task:: {self.name}"
+                self.fact_checkpoint_task = asyncio.create_task(
+                    self._checkpoint_facts(), name=task_name
+                )
+                tasks.append(self.fact_checkpoint_task)
             await asyncio.wait([self.action_loop_task])
         except asyncio.CancelledError:
             logger.debug("Cancelled error caught in run_ruleset")
@@ -134,12 +246,48 @@ class RuleSetRunner:
                 if not task.done():
                     logger.debug("Cancelling (2) task %s", task.get_name())
                     task.cancel()
+        finally:
+            if self.action_loop_task is None:
+                # Stopped while the session was primed, _cleanup doesn't
+                # run
+                await self._end_session()
 
         try:
             await asyncio.gather(*tasks, return_exceptions=True)
         except asyncio.CancelledError:
             raise
 
+    async def stop(self) -> None:
+        """Stop the ruleset for a hot reload without losing events.
+
+        The events taken from the source queue are posted and the others
+        stay in the queue for the next session. The rules matched by the
+        posted events run, their actions are waited for at most the
+        shutdown delay, and then the session ends.
+        """
+        self.stopping = True
+        if self.source_loop_task is None:
+            return
+        if self._waiting_for_event:
+            self.source_loop_task.cancel()
+        await asyncio.wait([self.source_loop_task])
+
+        delay = (
+            self.parsed_args.shutdown_delay
+            if self.parsed_args
+            else DEFAULT_SHUTDOWN_DELAY
+        )
+        plan_queue = self.ruleset_queue_plan.plan.queue
+        deadline = time.monotonic() + delay
+        while (
+            (not plan_queue.empty() or self.active_actions)
+            and not self.action_loop_task.done()
+            and time.monotonic() < deadline
+        ):
+            await asyncio.sleep(STOP_POLL_INTERVAL)
+        self.action_loop_task.cancel()
+        await asyncio.wait([self.action_loop_task])
+
     async def _cleanup(self):
         logger.debug("Cleaning up ruleset %s", self.name)
         if not self.source_loop_task.done():
@@ -176,7 +324,20 @@ class RuleSetRunner:
                     kind=self.shutdown.kind,
                 )
             )
-        stats = lang.end_session(self.name)
+        await self._end_session()
+
+    async def _end_session(self) -> None:
+        if self.journal:
+            await run_in_engine(self.name, self.journal.close)
+        if self.fact_checkpoint:
+            if self.fact_checkpoint_task:
+                self.fact_checkpoint_task.cancel()
+            await self._save_facts()
+            self.checkpoint_executor.shutdown(wait=False)
+        stats = self._extend_stats(
+            await run_in_engine(self.name, lang.end_session, self.name)
+        )
+        remove_engine_executor(self.name)
         if self.parsed_args and self.parsed_args.heartbeat > 0:
             await send_session_stats(self.event_log, stats)
         logger.info(pformat(stats))
@@ -213,47 +374,31 @@ class RuleSetRunner:
     async def _drain_source_queue(self):
         logger.info("Waiting for events, ruleset: %s", self.name)
         try:
-            while True:
-                data = await self.ruleset_queue_plan.source_queue.get()
-                # Default to output events at debug level.
-                level = logging.DEBUG
-
-                # If we are printing events adjust the level to the display's
-                # current level to guarantee output.
-                if settings.print_events:
-                    level = self.display.level
-
-                self.display.banner("received event", level=level)
-                self.display.output(f"Ruleset: {self.name}", level=level)
-                self.display.output("Event:", level=level)
-                self.display.output(data, pretty=True, level=level)
-                self.display.banner(level=level)
-
-                if isinstance(data, Shutdown):
-                    self.shutdown = data
-                    return await self._handle_shutdown()
-
-                if not data:
-                    # TODO: is it really necessary to add such event
-                    # to event_log?
-                    await self.event_log.put(dict(type="EmptyEvent"))
-                    continue
-
-                try:
-                    logger.debug(
-                        "Posting data to ruleset %s => %s",
-                        self.name,
-                        str(data),
+            while not self.stopping:
+                batch = await self._get_event_batch()
+                events = []
+                shutdown = None
+                for data in batch:
+                    self._display_event(data)
+
+                    if isinstance(data, Shutdown):
+                        shutdown = data
+                        break
+
+                    if not data:
+                        # TODO: is it really necessary to add such event
+                        # to event_log?
+                        await self.event_log.put(dict(type="EmptyEvent"))
+                        continue
+
+                    events.append(data)
+
+                if events:
+                    start = time.monotonic()
+                    await run_in_engine(self.name, self._post_events, events)
+                    self.post_batch_stats.record(
+                        len(events), time.monotonic() - start
                     )
-                    lang.post(self.name, data)
-                except MessageObservedException:
-                    logger.debug("MessageObservedException: %s", data)
-                except MessageNotHandledException:
-                    logger.debug("MessageNotHandledException: %s", data)
-                except BaseException as e:
-                    logger.error(e)
-                finally:
-                    logger.debug(lang.get_pending_events(self.name))
                     if (
                         settings.gc_after
                         and self.event_counter > settings.gc_after
@@ -261,13 +406,218 @@ class RuleSetRunner:
                         self.event_counter = 0
                         gc.collect()
                     else:
-                        self.event_counter += 1
-                    while self.ruleset_queue_plan.plan.queue.qsize() > 10:
-                        await asyncio.sleep(0)
+                        self.event_counter += len(events)
+
+                if shutdown:
+                    self.shutdown = shutdown
+                    return await self._handle_shutdown()
+
+                if events:
+                    plan_queue = self.ruleset_queue_plan.plan.queue
+                    await plan_queue.wait_for_capacity()
         except asyncio.CancelledError:
             logger.debug("Source Task Cancelled for ruleset %s", self.name)
             raise
 
+    async def _get_event_batch(self) -> List:
+        """Wait for the next event and gather up to post_batch_size events
+
+        A batch is closed when it is full, when the post batch window
+        has elapsed or when a Shutdown is received, so that shutdowns are
+        always handled after the events queued before them.
+        """
+        source_queue = self.ruleset_queue_plan.source_queue
+        # Only cancelled by stop() while no event is taken
+        self._waiting_for_event = True
+        try:
+            batch = [await source_queue.get()]
+        finally:
+            self._waiting_for_event = False
+        if self.post_batch_size <= 1 or isinstance(batch[0], Shutdown):
+            return batch
+
+        deadline = time.monotonic() + self.post_batch_window
+        while len(batch) < self.post_batch_size:
+            try:
+                data = source_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                getter = asyncio.ensure_future(source_queue.get())
+                try:
+                    done, _ = await asyncio.wait([getter], timeout=timeout)
+                    if not done:
+                        getter.cancel()
+                        await asyncio.wait([getter])
+                except asyncio.CancelledError:
+                    getter.cancel()
+                    raise
+                if getter.cancelled():
+                    break
+                data = getter.result()
+
+            batch.append(data)
+            if isinstance(data, Shutdown):
+                break
+        return batch
+
+    def _display_event(self, data) -> None:
+        # Default to output events at debug level.
+        level = logging.DEBUG
+
+        # If we are printing events adjust the level to the display's
+        # current level to guarantee output.
+        if settings.print_events:
+            level = self.display.level
+
+        if level < self.display.level:
+            return
+
+        self.display.banner("received event", level=level)
+        self.display.output(f"Ruleset: {self.name}", level=level)
+        self.display.output("Event:", level=level)
+        self.display.output(event_view(data), pretty=True, level=level)
+        self.display.banner(level=level)
+
+    async def _prime_facts(self) -> None:
+        """Assert the checkpointed facts of the session, or the facts of
+        the hosts when the ruleset has no checkpoint.
+
+        The rules matched by the checkpointed facts are not run again,
+        their actions ran before the restart.
+        """
+        facts = None
+        if self.fact_checkpoint:
+            facts = await asyncio.get_running_loop().run_in_executor(
+                self.checkpoint_executor, self.fact_checkpoint.load
+            )
+        if facts is None:
+            await run_in_engine(
+                self.name, prime_facts, self.name, self.hosts_facts
+            )
+            return
+
+        logger.info(
+            "Restoring %d checkpointed facts, ruleset: %s",
+            len(facts),
+            self.name,
+        )
+        queued = self.ruleset_queue_plan.plan.queue.qsize()
+        await run_in_engine(self.name, prime_facts, self.name, facts)
+        self._skip_plans(queued, "the checkpointed facts")
+
+    async def _checkpoint_facts(self) -> None:
+        while True:
+            await asyncio.sleep(settings.fact_checkpoint_interval)
+            await self._save_facts()
+
+    async def _save_facts(self) -> None:
+        try:
+            facts = await run_in_engine(self.name, lang.get_facts, self.name)
+            await asyncio.get_running_loop().run_in_executor(
+                self.checkpoint_executor, self.fact_checkpoint.save, facts
+            )
+        except Exception as e:
+            logger.error(
+                "Checkpoint of the facts of ruleset %s failed: %s",
+                self.name,
+                e,
+            )
+
+    async def _replay_journal(self) -> None:
+        """Post the events journaled before the ruleset was restarted.
+
+        The rules matched by the replayed events are not run again, their
+        actions ran before the restart. The rules matched by the primed
+        facts, queued before them, still run.
+        """
+        events = await run_in_engine(self.name, list, self.journal.replay())
+        if not events:
+            return
+        logger.info(
+            "Replaying %d journaled events, ruleset: %s",
+            len(events),
+            self.name,
+        )
+        queued = self.ruleset_queue_plan.plan.queue.qsize()
+        await run_in_engine(self.name, self._post_events, events, False)
+        self._skip_plans(queued, "the replayed events")
+
+    def _skip_plans(self, queued: int, cause: str) -> None:
+        """Drop the plans added to the plan queue behind the first queued
+        ones, the matches are added before the engine call returns.
+        """
+        plan_queue = self.ruleset_queue_plan.plan.queue
+        plans = [plan_queue.get_nowait() for _ in range(plan_queue.qsize())]
+        for plan in plans[:queued]:
+            plan_queue.put_nowait(plan)
+        dropped = len(plans) - queued
+        if dropped:
+            logger.info(
+                "Skipped %d rules matched by %s, ruleset: %s",
+                dropped,
+                cause,
+                self.name,
+            )
+
+    def _post_events(self, events: List, journal: bool = True) -> None:
+        """Post a batch of events, runs on the engine thread"""
+        if self.prefilter:
+            events = [
+                event for event in events if self.prefilter(event_view(event))
+            ]
+            if not events:
+                return
+        if journal and self.journal:
+            self.journal.append(events)
+        for data in events:
+            self._post_event(data)
+        logger.debug(lang.get_pending_events(self.name))
+
+    def _post_event(self, data) -> None:
+        if self.event_projection:
+            data = self.event_projection.project(event_view(data))
+        try:
+            logger.debug("Posting data to ruleset %s => %s", self.name, data)
+            lang.post(self.name, serialize_event(data))
+        except MessageObservedException:
+            logger.debug("MessageObservedException: %s", data)
+        except MessageNotHandledException:
+            logger.debug("MessageNotHandledException: %s", data)
+        except BaseException as e:
+            logger.error(e)
+
+    async def session_stats(self) -> Dict:
+        """Return the rule engine session stats for this ruleset, extended
+        with the stats collected on the Python side of the ruleset.
+        """
+        return self._extend_stats(
+            await run_in_engine(self.name, session_stats, self.name)
+        )
+
+    def _extend_stats(self, stats: Dict) -> Dict:
+        source_queue = self.ruleset_queue_plan.source_queue
+        if isinstance(source_queue, (SourceQueue, FairSourceQueue)):
+            stats["sourceQueue"] = source_queue.stats()
+        stats["planQueue"] = self.ruleset_queue_plan.plan.queue.stats()
+        if self.post_batch_size > 1:
+            stats["postBatch"] = self.post_batch_stats.to_dict()
+        if self.journal:
+            stats["eventJournal"] = self.journal.stats()
+        if self.prefilter:
+            # The skipped events are processed and matched by no rule, as
+            # if they were posted
+            for key in ("eventsProcessed", "eventsSuppressed"):
+                if key in stats:
+                    stats[key] += self.prefilter.skipped
+            stats["eventPrefilter"] = self.prefilter.stats()
+        if self.event_projection:
+            stats["eventProjection"] = self.event_projection.stats()
+        if self.fact_checkpoint:
+            stats["factCheckpoint"] = self.fact_checkpoint.stats()
+        return stats
+
     def _handle_action_completion(self, task):
         self.active_actions.discard(task)
         logger.debug(
@@ -291,14 +641,18 @@ class RuleSetRunner:
                 queue_item = await self.ruleset_queue_plan.plan.queue.get()
                 rule_run_at = run_at()
                 action_item = cast(ActionContext, queue_item)
+                if self.event_projection:
+                    self.event_projection.restore(
+                        action_item.rule_engine_results.data,
+                        consume=not self.rule_set.match_multiple_rules,
+                    )
                 if (
                     self.parsed_args
                     and self.parsed_args.heartbeat > 0
                     and not settings.skip_audit_events
                 ):
                     await send_session_stats(
-                        self.event_log,
-                        session_stats(self.ruleset_queue_plan.ruleset.name),
+                        self.event_log, await self.session_stats()
                     )
                 if len(action_item.actions) > 1:
                     task = asyncio.create_task(
@@ -359,6 +713,7 @@ class RuleSetRunner:
                 action_item.inventory,
                 action_item.hosts,
                 action_item.rule_engine_results,
+                action.templated_args,
             ),
             name=task_name,
         )
@@ -375,6 +730,7 @@ class RuleSetRunner:
         inventory: str,
         hosts: List,
         rules_engine_result,
+        templated_args: Optional[FrozenSet[str]] = None,
     ) -> None:
         logger.debug("call_action %s", action)
         action_args = immutable_action_args.copy()
@@ -408,11 +764,12 @@ class RuleSetRunner:
                     single_match = rules_engine_result.data[keys[0]]
                 else:
                     multi_match = rules_engine_result.data
-                variables_copy = variables.copy()
                 if action == "debug":
-                    variables_copy = mask_sensitive_variable_values(
-                        variables_copy
-                    )
+                    variables_copy = mask_sensitive_variable_values(variables)
+                else:
+                    # The event data goes in a per firing layer over the
+                    # shared variables, which are never copied or written
+                    variables_copy = ChainMap({}, variables)
                 if single_match is not None:
                     variables_copy["event"] = single_match
                     event = single_match
@@ -436,7 +793,11 @@ class RuleSetRunner:
                     _update_variables(variables_copy, var_root)
 
                 action_args = {
-                    k: substitute_variables(v, variables_copy)
+                    k: (
+                        substitute_variables(v, variables_copy)
+                        if templated_args is None or k in templated_args
+                        else copy_value(v)
+                    )
                     for k, v in action_args.items()
                 }
 
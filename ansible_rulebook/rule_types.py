@@ -17,11 +17,13 @@ from __future__ import annotations
 import asyncio
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List, NamedTuple, Optional, Union
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Union
 
 from drools.ruleset import Ruleset as EngineRuleSet
 
 import ansible_rulebook.condition_types as ct
+from ansible_rulebook.plan_queue import PlanQueue
+from ansible_rulebook.python_ruleset import PythonRuleset
 
 
 class ExecutionStrategy(Enum):
@@ -40,12 +42,17 @@ class EventSource(NamedTuple):
     source_name: str
     source_args: dict
     source_filters: List[EventSourceFilter]
+    weight: int = 1
+    isolation: str = "none"
 
 
 class Action(NamedTuple):
     action: str
     action_args: dict
     uuid: Optional[str] = None
+    # Names of the action args holding templates or vaulted strings,
+    # None when unknown and every arg has to be rendered
+    templated_args: Optional[FrozenSet[str]] = None
 
 
 class Condition(NamedTuple):
@@ -79,6 +86,10 @@ class RuleSet(NamedTuple):
     uuid: Optional[str] = None
     default_events_ttl: Optional[str] = None
     match_multiple_rules: bool = False
+    source_queue_size: int = 1
+    source_queue_overflow: str = "block"
+    partition_by: Optional[str] = None
+    shards: int = 1
 
 
 class ActionContext(NamedTuple):
@@ -98,12 +109,19 @@ class RuleSetQueue(NamedTuple):
     source_queue: asyncio.Queue
 
 
+class RuleSetChanges(NamedTuple):
+    # Names of the running rulesets to stop
+    stopped: List[str]
+    # Rulesets to start once the stopped ones have ended
+    started: List[RuleSetQueue]
+
+
 @dataclass
 class Plan:
-    queue: asyncio.Queue
+    queue: PlanQueue
 
 
 class EngineRuleSetQueuePlan(NamedTuple):
-    ruleset: EngineRuleSet
+    ruleset: Union[EngineRuleSet, PythonRuleset]
     source_queue: asyncio.Queue
     plan: Plan
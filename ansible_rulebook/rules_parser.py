@@ -20,13 +20,20 @@ from ansible_rulebook.condition_parser import (
     parse_condition as parse_condition_value,
 )
 from ansible_rulebook.conf import settings
-from ansible_rulebook.util import substitute_variables
+from ansible_rulebook.partition import validate_partitioning
+from ansible_rulebook.source_process import ISOLATION_NONE
+from ansible_rulebook.source_queue import (
+    DEFAULT_SOURCE_QUEUE_SIZE,
+    OVERFLOW_BLOCK,
+)
+from ansible_rulebook.util import needs_rendering, substitute_variables
 
 from .exception import (
     RulenameDuplicateException,
     RulenameEmptyException,
     RulesetNameDuplicateException,
     RulesetNameEmptyException,
+    RulesetPartitionException,
 )
 
 
@@ -73,21 +80,36 @@ def parse_rule_sets(
         elif strategy == "parallel":
             execution_strategy = rt.ExecutionStrategy.PARALLEL
 
-        rule_set_list.append(
-            rt.RuleSet(
-                name=name,
-                hosts=parse_hosts(rule_set["hosts"]),
-                sources=parse_event_sources(rule_set["sources"]),
-                rules=parse_rules(rule_set.get("rules", {}), variables),
-                execution_strategy=execution_strategy,
-                gather_facts=rule_set.get("gather_facts", False),
-                uuid=str(uuid.uuid4()),
-                default_events_ttl=rule_set.get("default_events_ttl", None),
-                match_multiple_rules=rule_set.get(
-                    "match_multiple_rules", False
-                ),
+        shards = rule_set.get("shards", 1)
+        partition_by = rule_set.get("partition_by")
+        if shards > 1 and not partition_by:
+            raise RulesetPartitionException(
+                f"Ruleset {name} has {shards} shards, it needs a "
+                "partition_by attribute"
             )
+
+        ruleset = rt.RuleSet(
+            name=name,
+            hosts=parse_hosts(rule_set["hosts"]),
+            sources=parse_event_sources(rule_set["sources"]),
+            rules=parse_rules(rule_set.get("rules", {}), variables),
+            execution_strategy=execution_strategy,
+            gather_facts=rule_set.get("gather_facts", False),
+            uuid=str(uuid.uuid4()),
+            default_events_ttl=rule_set.get("default_events_ttl", None),
+            match_multiple_rules=rule_set.get("match_multiple_rules", False),
+            source_queue_size=rule_set.get(
+                "source_queue_size", DEFAULT_SOURCE_QUEUE_SIZE
+            ),
+            source_queue_overflow=rule_set.get(
+                "source_queue_overflow", OVERFLOW_BLOCK
+            ),
+            partition_by=partition_by,
+            shards=shards,
         )
+        if ruleset.shards > 1:
+            validate_partitioning(ruleset)
+        rule_set_list.append(ruleset)
     return rule_set_list
 
 
@@ -95,6 +117,8 @@ def parse_event_sources(sources: Dict) -> List[rt.EventSource]:
     source_list = []
     for source in sources:
         name = source.pop("name", "")
+        weight = source.pop("weight", 1)
+        isolation = source.pop("isolation", ISOLATION_NONE)
         source_filters = []
         for source_filter in source.pop("filters", []):
             source_filters.append(parse_source_filter(source_filter))
@@ -109,6 +133,8 @@ def parse_event_sources(sources: Dict) -> List[rt.EventSource]:
                 source_name=source_name,
                 source_args=source_args,
                 source_filters=source_filters,
+                weight=weight,
+                isolation=isolation,
             )
         )
 
@@ -183,7 +209,13 @@ def parse_action(action: Dict) -> rt.Action:
         action_args = {k: v for k, v in action[action_name].items()}
     else:
         action_args = {}
-    return rt.Action(action=action_name, action_args=action_args)
+    return rt.Action(
+        action=action_name,
+        action_args=action_args,
+        templated_args=frozenset(
+            k for k, v in action_args.items() if needs_rendering(v)
+        ),
+    )
 
 
 def parse_condition(condition: Any) -> rt.Condition:
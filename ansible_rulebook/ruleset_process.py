@@ -0,0 +1,576 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Run each ruleset of a rulebook in its own process.
+
+Every child process runs the sources, the rule engine session and the
+actions of one ruleset. The parent process relays over a pipe per child:
+
+  event_log: the audit and event log items of a child, put on the event
+             log of the parent which sends them to the websocket
+  engine_call: post_event, set_fact and retract_fact calls for a ruleset
+               that runs in another child
+  shutdown: shutdowns broadcast by a child to all the rulesets
+
+A sharded ruleset runs a child process per shard. Its sources run in the
+parent process, which sends every event to one shard with an event
+message, picked by the partition key of the event. A shard takes at most
+EVENT_CREDITS events ahead of its source queue: it returns a credit
+message once it has queued the events, the parent waits for credits
+before sending more.
+
+The messages are sent by a thread per pipe, so a full pipe never blocks
+the event loop of either process and two processes sending to each
+other can't deadlock.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from asyncio.exceptions import CancelledError
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import ForkingPickler
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ansible_rulebook import engine, rule_engine as lang
+from ansible_rulebook.common import StartupArgs
+from ansible_rulebook.conf import settings
+from ansible_rulebook.engine_executor import (
+    get_engine_executor,
+    run_in_engine,
+    set_executor_listener,
+    set_remote_engine,
+)
+from ansible_rulebook.exception import (
+    HotReloadException,
+    RemoteEngineCallException,
+)
+from ansible_rulebook.job_template_runner import job_template_runner
+from ansible_rulebook.messages import Shutdown
+from ansible_rulebook.partition import has_partition_key, shard_for
+from ansible_rulebook.raw_event import event_view
+from ansible_rulebook.rule_types import RuleSet, RuleSetQueue
+from ansible_rulebook.source_queue import SourceQueue
+
+logger = logging.getLogger(__name__)
+
+MSG_EVENT_LOG = "event_log"
+MSG_ENGINE_CALL = "engine_call"
+MSG_SHUTDOWN = "shutdown"
+MSG_EVENT = "event"
+MSG_CREDIT = "credit"
+
+# Events sent to a shard and not yet queued by it
+EVENT_CREDITS = 256
+# Credits a shard returns in one message, unless it has nothing left
+# to queue
+CREDIT_BATCH_SIZE = 32
+
+
+class PipeSender:
+    """Sends the messages of a pipe from a thread.
+
+    The messages are pickled by the caller, so they can't change before
+    they are sent.
+    """
+
+    def __init__(self, conn: Connection, name: str):
+        self.conn = conn
+        self._messages: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._run, name=f"pipe-sender-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def send(self, message: Tuple) -> None:
+        self._messages.put(bytes(ForkingPickler.dumps(message)))
+
+    def close(self) -> None:
+        """Send the pending messages and stop the thread"""
+        self._messages.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            payload = self._messages.get()
+            if payload is None:
+                return
+            try:
+                self.conn.send_bytes(payload)
+            except OSError:
+                logger.debug("Pipe %s is closed", self._thread.name)
+                return
+
+
+class RulesetProcess:
+    """A ruleset running in a child process, seen from the parent"""
+
+    def __init__(
+        self,
+        name: str,
+        process: multiprocessing.Process,
+        conn: Connection,
+    ):
+        self.name = name
+        self.process = process
+        self.conn = conn
+        self.sender = PipeSender(conn, name)
+        self.closed = asyncio.get_running_loop().create_future()
+        self.credits = EVENT_CREDITS
+        self._credited = asyncio.Event()
+
+    def send(self, message: Tuple) -> None:
+        if self.closed.done():
+            logger.debug("Ruleset process %s is gone", self.name)
+            return
+        self.sender.send(message)
+
+    async def send_event(self, data: Any) -> None:
+        """Send an event to a shard, waiting for a credit"""
+        while self.credits <= 0 and not self.closed.done():
+            self._credited.clear()
+            await self._credited.wait()
+        self.credits -= 1
+        self.send((MSG_EVENT, data))
+
+    def add_credits(self, count: int) -> None:
+        self.credits += count
+        self._credited.set()
+
+    def set_closed(self) -> None:
+        if not self.closed.done():
+            self.closed.set_result(None)
+        self._credited.set()
+
+
+class ForwardingQueue:
+    """Event log of a child process, the items go to the parent"""
+
+    def __init__(self, sender: PipeSender):
+        self._sender = sender
+
+    async def put(self, item: Any) -> None:
+        self.put_nowait(item)
+
+    def put_nowait(self, item: Any) -> None:
+        self._sender.send((MSG_EVENT_LOG, item))
+
+    def qsize(self) -> int:
+        return 0
+
+
+def _add_reader(conn: Connection, handler: Callable, on_close: Callable):
+    loop = asyncio.get_running_loop()
+
+    def readable():
+        try:
+            while conn.poll():
+                handler(conn.recv())
+        except (EOFError, OSError):
+            loop.remove_reader(conn.fileno())
+            on_close()
+
+    loop.add_reader(conn.fileno(), readable)
+
+
+FACT_CALLS = ("assert_fact", "retract_fact", "retract_matching_facts")
+# The rule engine calls that can go to a ruleset in another process, the
+# actions don't use their results and their errors are logged by the
+# process of the ruleset
+REMOTE_ENGINE_CALLS = ("post", *FACT_CALLS)
+
+
+def remote_engine(sender: PipeSender) -> Callable:
+    """Return the dispatch of the rule engine calls for the rulesets that
+    run in other processes, sent to them through the parent.
+    """
+
+    def dispatch(ruleset_name: str, fn: Callable, args: Tuple) -> None:
+        if getattr(lang, fn.__name__, None) is not fn:
+            return fn(*args)
+        if fn.__name__ not in REMOTE_ENGINE_CALLS:
+            raise RemoteEngineCallException(
+                f"{fn.__name__} can't be called on ruleset {ruleset_name}, "
+                "it runs in another process"
+            )
+        sender.send((MSG_ENGINE_CALL, ruleset_name, fn.__name__, args))
+
+    return dispatch
+
+
+def _shard_targets(
+    ruleset: RuleSet, shards: List[RulesetProcess], fn_name: str, args: Tuple
+) -> List[RulesetProcess]:
+    """The shards an event or a fact posted to a sharded ruleset goes to,
+    facts without the partition key are asserted in all of them.
+    """
+    data = args[1]
+    if fn_name in FACT_CALLS and not has_partition_key(
+        data, ruleset.partition_by
+    ):
+        return shards
+    return [shards[shard_for(data, ruleset.partition_by, len(shards))]]
+
+
+async def _route_events(
+    ruleset: RuleSet, queue: asyncio.Queue, shards: List[RulesetProcess]
+) -> None:
+    """Send the events of the sources of a sharded ruleset to its shards"""
+    warned = False
+    while True:
+        data = await queue.get()
+        if isinstance(data, Shutdown):
+            for shard in shards:
+                shard.send((MSG_SHUTDOWN, data))
+        else:
+            event = event_view(data)
+            if not warned and not has_partition_key(
+                event, ruleset.partition_by
+            ):
+                logger.warning(
+                    "Ruleset %s got an event without %s, the events "
+                    "without it all go to the same shard",
+                    ruleset.name,
+                    ruleset.partition_by,
+                )
+                warned = True
+            index = shard_for(event, ruleset.partition_by, len(shards))
+            await shards[index].send_event(data)
+
+
+async def run_rulesets_in_processes(
+    event_log: asyncio.Queue,
+    startup_args: StartupArgs,
+    parsed_args: argparse.Namespace,
+    forward_event_log: bool,
+    file_monitor: Optional[str] = None,
+) -> Tuple[bool, bool]:
+    """Start a child process per ruleset, or per shard of a sharded
+    ruleset, and relay their messages until all of them exit. Returns
+    whether a hot reload was requested and whether a ruleset process or
+    a source of a sharded ruleset failed.
+    """
+    # Imported here, the app module imports this one
+    from ansible_rulebook import app
+
+    context = multiprocessing.get_context("spawn")
+    children: Dict[str, List[RulesetProcess]] = {}
+    rulesets = {ruleset.name: ruleset for ruleset in startup_args.rulesets}
+
+    def all_children() -> List[RulesetProcess]:
+        return [child for group in children.values() for child in group]
+
+    def route(sender: RulesetProcess, message: Tuple) -> None:
+        kind = message[0]
+        if kind == MSG_EVENT_LOG:
+            event_log.put_nowait(message[1])
+        elif kind == MSG_ENGINE_CALL:
+            _, ruleset_name, fn_name, args = message
+            targets = children.get(ruleset_name)
+            if not targets:
+                logger.error(
+                    "Ruleset %s not found for %s from ruleset %s",
+                    ruleset_name,
+                    fn_name,
+                    sender.name,
+                )
+                return
+            if len(targets) > 1:
+                targets = _shard_targets(
+                    rulesets[ruleset_name], targets, fn_name, args
+                )
+            for target in targets:
+                target.send(message)
+        elif kind == MSG_SHUTDOWN:
+            for child in all_children():
+                if child is not sender:
+                    child.send(message)
+        elif kind == MSG_CREDIT:
+            sender.add_credits(message[1])
+
+    def start(ruleset: RuleSet, shard: Optional[Tuple[int, int]]):
+        parent_conn, child_conn = context.Pipe()
+        name = ruleset.name if shard is None else f"{ruleset.name}#{shard[0]}"
+        process = context.Process(
+            target=ruleset_process_main,
+            args=(
+                child_conn,
+                dataclasses.replace(startup_args, rulesets=[ruleset]),
+                parsed_args,
+                vars(settings).copy(),
+                forward_event_log,
+                shard,
+            ),
+            name=f"ruleset-{name}",
+        )
+        process.start()
+        child_conn.close()
+        logger.info("Started ruleset %s in process %d", name, process.pid)
+        child = RulesetProcess(name, process, parent_conn)
+        _add_reader(
+            parent_conn,
+            lambda message: route(child, message),
+            child.set_closed,
+        )
+        return child
+
+    tasks = []
+    for ruleset in startup_args.rulesets:
+        if ruleset.shards > 1:
+            shards = [
+                start(ruleset, (index, ruleset.shards))
+                for index in range(ruleset.shards)
+            ]
+            children[ruleset.name] = shards
+            # The sources of a sharded ruleset run here, the events are
+            # partitioned to the shards
+            source_tasks, ruleset_queues = app.spawn_sources(
+                [ruleset],
+                startup_args.variables,
+                [parsed_args.source_dir],
+                parsed_args.shutdown_delay,
+            )
+            tasks.extend(source_tasks)
+            tasks.append(
+                asyncio.create_task(
+                    _route_events(ruleset, ruleset_queues[0][1], shards)
+                )
+            )
+        else:
+            children[ruleset.name] = [start(ruleset, None)]
+
+    def forward_shutdown(shutdown: Shutdown) -> None:
+        # The shutdowns broadcast here, when a source of a sharded ruleset
+        # ends, reach the shards through the source queues
+        for group in children.values():
+            if len(group) == 1:
+                group[0].send((MSG_SHUTDOWN, shutdown))
+
+    engine.set_shutdown_forwarder(forward_shutdown)
+
+    monitor_task = None
+    if file_monitor:
+        monitor_task = asyncio.create_task(
+            engine.monitor_rulebook(file_monitor)
+        )
+
+    should_reload = False
+    pending = {child.closed for child in all_children()}
+    if monitor_task:
+        pending.add(monitor_task)
+    try:
+        while any(not child.closed.done() for child in all_children()):
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            if monitor_task in done and isinstance(
+                monitor_task.exception(), HotReloadException
+            ):
+                should_reload = True
+                for child in all_children():
+                    child.send((MSG_SHUTDOWN, Shutdown(kind="now")))
+    finally:
+        engine.set_shutdown_forwarder(None)
+        if monitor_task and not monitor_task.done():
+            monitor_task.cancel()
+
+    error_found = False
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception) and not isinstance(
+            result, CancelledError
+        ):
+            app.log_exception_without_data(
+                type(result), result, result.__traceback__
+            )
+            error_found = True
+
+    loop = asyncio.get_running_loop()
+    for child in all_children():
+        await loop.run_in_executor(None, child.process.join)
+        await loop.run_in_executor(None, child.sender.close)
+        child.conn.close()
+        if child.process.exitcode != 0:
+            logger.error(
+                "Ruleset process %s exited with %s",
+                child.name,
+                child.process.exitcode,
+            )
+            error_found = True
+    return should_reload, error_found
+
+
+def ruleset_process_main(
+    conn: Connection,
+    startup_args: StartupArgs,
+    parsed_args: argparse.Namespace,
+    settings_state: Dict,
+    forward_event_log: bool,
+    shard: Optional[Tuple[int, int]] = None,
+) -> None:
+    """Entry point of a ruleset process, shard is the index and the count
+    of the shards of a sharded ruleset.
+    """
+    # Imported here, the app module imports this one
+    from ansible_rulebook.cli import setup_logging_and_display
+
+    vars(settings).update(settings_state)
+    if shard is not None:
+        # Every shard keeps the events and the facts of its own partitions
+        shard_dir = f"shard-{shard[0]}-of-{shard[1]}"
+        if settings.event_journal_dir:
+            settings.event_journal_dir = os.path.join(
+                settings.event_journal_dir, shard_dir
+            )
+        if settings.fact_checkpoint_dir:
+            settings.fact_checkpoint_dir = os.path.join(
+                settings.fact_checkpoint_dir, shard_dir
+            )
+    setup_logging_and_display(parsed_args)
+    sender = PipeSender(conn, "parent")
+    try:
+        ok = asyncio.run(
+            _run_ruleset_process(
+                conn,
+                sender,
+                startup_args,
+                parsed_args,
+                forward_event_log,
+                shard,
+            )
+        )
+    except KeyboardInterrupt:
+        ok = True
+    finally:
+        sender.close()
+        conn.close()
+    if not ok:
+        sys.exit(1)
+
+
+async def _run_ruleset_process(
+    conn: Connection,
+    sender: PipeSender,
+    startup_args: StartupArgs,
+    parsed_args: argparse.Namespace,
+    forward_event_log: bool,
+    shard: Optional[Tuple[int, int]],
+) -> bool:
+    from ansible_rulebook import app
+
+    app.configure_controller(startup_args)
+    if forward_event_log:
+        event_log = ForwardingQueue(sender)
+    else:
+        event_log = app.NullQueue()
+
+    # The calls and shutdowns from the other rulesets are handled in order
+    # once the session of this ruleset has started. The parent sends at
+    # most EVENT_CREDITS events ahead of the source queue of a shard, the
+    # other messages are few.
+    ruleset_name = startup_args.rulesets[0].name
+    session_started = asyncio.Event()
+    incoming = asyncio.Queue()
+
+    def executor_created(name: str) -> None:
+        if name == ruleset_name:
+            session_started.set()
+
+    async def handle_incoming() -> None:
+        await session_started.wait()
+        credits = 0
+        while True:
+            kind, *payload = await incoming.get()
+            if kind == MSG_ENGINE_CALL:
+                await engine_call(*payload)
+            elif kind == MSG_SHUTDOWN:
+                await engine.broadcast_local(*payload)
+            elif kind == MSG_EVENT:
+                await ruleset_queues[0].source_queue.put(*payload)
+                credits += 1
+            if credits and (credits >= CREDIT_BATCH_SIZE or incoming.empty()):
+                sender.send((MSG_CREDIT, credits))
+                credits = 0
+
+    async def engine_call(ruleset_name: str, fn_name: str, args: Tuple):
+        if get_engine_executor(ruleset_name) is None:
+            logger.warning(
+                "Ruleset %s has ended, dropping %s", ruleset_name, fn_name
+            )
+            return
+        try:
+            await run_in_engine(ruleset_name, getattr(lang, fn_name), *args)
+        except Exception as e:
+            logger.error(
+                "%s on ruleset %s failed: %s", fn_name, ruleset_name, e
+            )
+
+    set_remote_engine(remote_engine(sender))
+    set_executor_listener(executor_created)
+    engine.set_shutdown_forwarder(
+        lambda shutdown: sender.send((MSG_SHUTDOWN, shutdown))
+    )
+    _add_reader(conn, incoming.put_nowait, lambda: None)
+    incoming_task = asyncio.create_task(handle_incoming())
+
+    if shard is None:
+        tasks, ruleset_queues = app.spawn_sources(
+            startup_args.rulesets,
+            startup_args.variables,
+            [parsed_args.source_dir],
+            parsed_args.shutdown_delay,
+        )
+    else:
+        # The events of a shard come from the sources in the parent
+        logger.info("Running shard %d of %d", shard[0] + 1, shard[1])
+        tasks = []
+        ruleset = startup_args.rulesets[0]
+        source_queue = SourceQueue(
+            ruleset.source_queue_size, ruleset.source_queue_overflow
+        )
+        engine.all_source_queues.append(source_queue)
+        ruleset_queues = [RuleSetQueue(ruleset, source_queue)]
+    rulesets_task = asyncio.create_task(
+        engine.run_rulesets(
+            event_log,
+            ruleset_queues,
+            startup_args.variables,
+            startup_args.inventory,
+            parsed_args,
+            startup_args.project_data_file,
+        )
+    )
+    await rulesets_task
+    incoming_task.cancel()
+
+    for task in tasks:
+        task.cancel()
+    ok = True
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception) and not isinstance(
+            result, CancelledError
+        ):
+            app.log_exception_without_data(
+                type(result), result, result.__traceback__
+            )
+            ok = False
+    await job_template_runner.close_session()
+    return ok
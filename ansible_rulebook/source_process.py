@@ -0,0 +1,414 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Run a source plugin in a child process.
+
+A source with isolation: process runs the main of its plugin in a child
+process, so a source spending its time parsing or decoding runs on
+another core instead of the event loop of the rule engine. The child
+writes the events of the source as length prefixed frames to a ring
+buffer in shared memory, the parent reads them and puts them on the
+queue of the source, where they go through the source filters.
+
+The ring buffer has a single writer, the child, and a single reader,
+the parent. Its header holds the total number of bytes written and
+read, a frame is only visible to the reader once the count of written
+bytes includes it. A reader with nothing left to read raises a flag in
+the header and sleeps, the writer rings a pipe when it sees the flag.
+The pipe also tells the parent when the child exits.
+
+A dict event that JSON represents exactly is sent as JSON and received as
+a RawEvent, the filters and the rule engine parse it only if they need
+to. Other events, like dicts with int keys or tuples, are pickled.
+When the plugin fails, the child sends its exception in an error frame,
+it is raised in the parent and the source is restarted like any other
+failed source. A child killed or exiting without an error frame raises
+SourceProcessCrashedException.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import struct
+import sys
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Tuple
+
+from ansible_rulebook.exception import (
+    SourceProcessCrashedException,
+    SourceProcessException,
+)
+from ansible_rulebook.raw_event import RawEvent
+
+logger = logging.getLogger(__name__)
+
+ISOLATION_NONE = "none"
+ISOLATION_PROCESS = "process"
+
+RING_BUFFER_SIZE = 4 * 1024 * 1024
+# Frames read before the parent yields to the event loop
+READ_BATCH_SIZE = 256
+# Longest sleep of the reader when a wakeup is missed, and of the writer
+# waiting for room in the ring buffer
+MAX_WAIT = 0.05
+PARENT_CHECK_INTERVAL = 1.0
+STOP_TIMEOUT = 5.0
+
+FRAME_JSON = 1
+FRAME_PICKLE = 2
+FRAME_ERROR = 3
+
+# Bytes written, bytes read, reader waiting
+HEADER = struct.Struct("<QQQ")
+WRITTEN_OFFSET = 0
+READ_OFFSET = 8
+WAITING_OFFSET = 16
+COUNTER = struct.Struct("<Q")
+# Payload length and frame kind
+FRAME_HEADER = struct.Struct("<IB")
+
+
+class RingBuffer:
+    """A single writer, single reader ring buffer of frames in shared
+    memory.
+    """
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        self.data = shm.buf[HEADER.size :]
+        self.capacity = len(self.data)
+
+    @classmethod
+    def create(cls, size: int = RING_BUFFER_SIZE) -> "RingBuffer":
+        shm = SharedMemory(create=True, size=HEADER.size + size)
+        HEADER.pack_into(shm.buf, 0, 0, 0, 0)
+        return cls(shm, True)
+
+    @classmethod
+    def attach(cls, name: str) -> "RingBuffer":
+        return cls(SharedMemory(name=name), False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _get(self, offset: int) -> int:
+        return COUNTER.unpack_from(self.buf, offset)[0]
+
+    def _set(self, offset: int, value: int) -> None:
+        COUNTER.pack_into(self.buf, offset, value)
+
+    @property
+    def reader_waiting(self) -> bool:
+        return bool(self._get(WAITING_OFFSET))
+
+    @reader_waiting.setter
+    def reader_waiting(self, value: bool) -> None:
+        self._set(WAITING_OFFSET, int(value))
+
+    def readable(self) -> bool:
+        return self._get(WRITTEN_OFFSET) != self._get(READ_OFFSET)
+
+    def write(self, kind: int, payload: bytes) -> bool:
+        """Append a frame, returns False when the ring buffer is too full
+        to hold it.
+        """
+        size = FRAME_HEADER.size + len(payload)
+        if size > self.capacity:
+            raise ValueError(
+                f"A frame of {size} bytes doesn't fit in a ring buffer of "
+                f"{self.capacity} bytes"
+            )
+        written = self._get(WRITTEN_OFFSET)
+        if size > self.capacity - (written - self._get(READ_OFFSET)):
+            return False
+        self._copy_in(written, FRAME_HEADER.pack(len(payload), kind))
+        self._copy_in(written + FRAME_HEADER.size, payload)
+        self._set(WRITTEN_OFFSET, written + size)
+        return True
+
+    def read(self, limit: int = READ_BATCH_SIZE) -> List[Tuple[int, bytes]]:
+        """Remove and return up to limit frames as (kind, payload)"""
+        frames = []
+        position = self._get(READ_OFFSET)
+        written = self._get(WRITTEN_OFFSET)
+        while position < written and len(frames) < limit:
+            length, kind = FRAME_HEADER.unpack(
+                self._copy_out(position, FRAME_HEADER.size)
+            )
+            payload = self._copy_out(position + FRAME_HEADER.size, length)
+            frames.append((kind, payload))
+            position += FRAME_HEADER.size + length
+        if frames:
+            self._set(READ_OFFSET, position)
+        return frames
+
+    def _copy_in(self, position: int, data: bytes) -> None:
+        start = position % self.capacity
+        head = min(len(data), self.capacity - start)
+        self.data[start : start + head] = data[:head]
+        if head < len(data):
+            self.data[: len(data) - head] = data[head:]
+
+    def _copy_out(self, position: int, length: int) -> bytes:
+        start = position % self.capacity
+        head = min(length, self.capacity - start)
+        data = bytes(self.data[start : start + head])
+        if head < length:
+            data += bytes(self.data[: length - head])
+        return data
+
+    def close(self) -> None:
+        self.data.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def encode_event(event: Any) -> Tuple[int, bytes]:
+    """Encode a dict event as JSON when it comes back unchanged, with
+    the same keys, lists and numbers, other events are pickled.
+    """
+    if isinstance(event, RawEvent):
+        return FRAME_JSON, event.to_json().encode()
+    if isinstance(event, dict):
+        try:
+            data = json.dumps(event, allow_nan=False)
+        except (TypeError, ValueError):
+            pass
+        else:
+            if json.loads(data) == event:
+                return FRAME_JSON, data.encode()
+    return FRAME_PICKLE, pickle.dumps(event)
+
+
+def decode_event(kind: int, payload: bytes) -> Any:
+    if kind == FRAME_JSON:
+        return RawEvent(payload)
+    return pickle.loads(payload)
+
+
+def encode_error(error: BaseException) -> bytes:
+    """Pickle an exception, or its type and message when it can't be
+    unpickled.
+    """
+    try:
+        payload = pickle.dumps(error)
+        pickle.loads(payload)
+        return payload
+    except Exception:
+        return pickle.dumps(
+            SourceProcessException(f"{type(error).__name__}: {error}")
+        )
+
+
+def decode_error(payload: bytes) -> BaseException:
+    try:
+        return pickle.loads(payload)
+    except Exception as e:
+        return SourceProcessException(
+            f"The error of the source could not be unpickled: {e}"
+        )
+
+
+class RingBufferQueue:
+    """The queue of a source plugin running in a child process"""
+
+    def __init__(
+        self, ring: RingBuffer, doorbell: Connection, parent_pid: int
+    ):
+        self.ring = ring
+        self.doorbell = doorbell
+        self.parent_pid = parent_pid
+
+    def _write(self, kind: int, payload: bytes) -> bool:
+        if not self.ring.write(kind, payload):
+            return False
+        if self.ring.reader_waiting:
+            self.ring.reader_waiting = False
+            self.doorbell.send_bytes(b"")
+        return True
+
+    async def put(self, event: Any) -> None:
+        kind, payload = encode_event(event)
+        delay = 0.001
+        while not self._write(kind, payload):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_WAIT)
+
+    def put_nowait(self, event: Any) -> None:
+        if not self._write(*encode_event(event)):
+            raise asyncio.QueueFull()
+
+    def put_error(self, error: BaseException) -> None:
+        payload = encode_error(error)
+        while not self._write(FRAME_ERROR, payload):
+            if os.getppid() != self.parent_pid:
+                return
+            time.sleep(MAX_WAIT)
+
+
+async def run_source_process(
+    name: str,
+    path: str,
+    queue: Any,
+    args: Dict[str, Any],
+) -> None:
+    """Run the main of the source plugin at path in a child process and
+    put its events on the queue until the child exits.
+
+    Raises the exception of the plugin when it fails, and
+    SourceProcessCrashedException when the child dies without one.
+    """
+    loop = asyncio.get_running_loop()
+    context = multiprocessing.get_context("spawn")
+    ring = RingBuffer.create()
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = None
+    wakeup = asyncio.Event()
+    closed = False
+
+    def on_doorbell():
+        nonlocal closed
+        try:
+            parent_conn.recv_bytes()
+        except (EOFError, OSError):
+            closed = True
+            loop.remove_reader(parent_conn.fileno())
+        wakeup.set()
+
+    try:
+        process = context.Process(
+            target=source_process_main,
+            args=(
+                name,
+                os.path.realpath(path),
+                args,
+                ring.name,
+                child_conn,
+                os.getpid(),
+                logging.getLogger().getEffectiveLevel(),
+            ),
+            name=f"source-{name}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        logger.info("Started source %s in process %d", name, process.pid)
+        loop.add_reader(parent_conn.fileno(), on_doorbell)
+
+        error = None
+        while True:
+            frames = ring.read()
+            if frames:
+                events = []
+                for kind, payload in frames:
+                    if kind == FRAME_ERROR:
+                        error = decode_error(payload)
+                    else:
+                        events.append(decode_event(kind, payload))
+                await queue.put_many(events)
+                await asyncio.sleep(0)
+                continue
+            if closed:
+                break
+            wakeup.clear()
+            ring.reader_waiting = True
+            if not ring.readable():
+                try:
+                    await asyncio.wait_for(wakeup.wait(), MAX_WAIT)
+                except asyncio.TimeoutError:
+                    pass
+            ring.reader_waiting = False
+
+        await loop.run_in_executor(None, process.join)
+        if error is not None:
+            raise error
+        if process.exitcode:
+            raise SourceProcessCrashedException(
+                f"Source process {name} exited with {process.exitcode}"
+            )
+    finally:
+        if not closed:
+            loop.remove_reader(parent_conn.fileno())
+        parent_conn.close()
+        try:
+            if process is not None and process.pid is not None:
+                await loop.run_in_executor(None, _stop_process, process)
+        finally:
+            ring.close()
+
+
+def _stop_process(process: multiprocessing.Process) -> None:
+    if process.is_alive():
+        process.terminate()
+        process.join(STOP_TIMEOUT)
+        if process.is_alive():
+            process.kill()
+    process.join()
+
+
+def source_process_main(
+    name: str,
+    path: str,
+    args: Dict[str, Any],
+    ring_name: str,
+    doorbell: Connection,
+    parent_pid: int,
+    log_level: int,
+) -> None:
+    """Entry point of a source process"""
+    # The parent stops the child, an interrupt only reaches the parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=log_level)
+    ring = RingBuffer.attach(ring_name)
+    queue = RingBufferQueue(ring, doorbell, parent_pid)
+    exitcode = 0
+    try:
+        asyncio.run(_run_source(name, path, queue, args))
+    except Exception as e:
+        logger.debug("Source %s failed", name, exc_info=True)
+        queue.put_error(e)
+        exitcode = 1
+    finally:
+        ring.close()
+        doorbell.close()
+    sys.exit(exitcode)
+
+
+async def _run_source(
+    name: str,
+    path: str,
+    queue: RingBufferQueue,
+    args: Dict[str, Any],
+) -> None:
+    # Imported here, the engine module imports this one
+    from ansible_rulebook.engine import load_plugin
+
+    task = asyncio.create_task(load_plugin(path)["main"](queue, args))
+    while not task.done():
+        await asyncio.wait([task], timeout=PARENT_CHECK_INTERVAL)
+        if os.getppid() != queue.parent_pid:
+            logger.error("Source %s stopped, its parent exited", name)
+            task.cancel()
+            os._exit(1)
+    task.result()
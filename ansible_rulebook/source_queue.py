@@ -0,0 +1,350 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import logging
+import pickle
+import tempfile
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List
+
+from ansible_rulebook.messages import Shutdown
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_SPILL_TO_DISK = "spill_to_disk"
+
+OVERFLOW_POLICIES = (
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_SPILL_TO_DISK,
+)
+
+DEFAULT_SOURCE_QUEUE_SIZE = 1
+
+
+class SourceQueue(asyncio.Queue):
+    """Bounded queue shared by the sources of a ruleset.
+
+    The events are kept in a ring buffer of at most maxsize items, what
+    happens when the buffer is full is decided by the overflow policy:
+
+      block: put waits for a free slot, same as asyncio.Queue
+      drop_oldest: the oldest buffered event is discarded
+      drop_newest: the incoming event is discarded
+      spill_to_disk: the incoming event is appended to a temporary
+                     file and read back, in order, as the buffer drains
+
+    Shutdown messages are never dropped, so a full queue can't swallow a
+    shutdown request. They are only spilled behind the events already
+    spilled, to be read after them.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_SOURCE_QUEUE_SIZE,
+        overflow: str = OVERFLOW_BLOCK,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy {overflow}")
+        if maxsize < 1:
+            raise ValueError("Source queue size must be at least 1")
+        super().__init__(maxsize)
+        self.overflow = overflow
+        self.high_water_mark = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.restarts = 0
+        self._spill_file = None
+        self._spill_count = 0
+        self._spill_read_offset = 0
+
+    def full(self) -> bool:
+        # Only the block policy makes a producer wait, the others
+        # always accept the event and deal with the overflow in _put
+        if self.overflow != OVERFLOW_BLOCK:
+            return False
+        return super().full()
+
+    def qsize(self) -> int:
+        return len(self._queue) + self._spill_count
+
+    def stats(self) -> Dict:
+        return {
+            "size": self.qsize(),
+            "capacity": self.maxsize,
+            "overflow": self.overflow,
+            "highWaterMark": self.high_water_mark,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "restarts": self.restarts,
+        }
+
+    def record_restart(self) -> None:
+        self.restarts += 1
+
+    def close(self) -> None:
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+        self._spill_count = 0
+
+    def _put(self, item: Any) -> None:
+        buffer_full = len(self._queue) >= self.maxsize
+        if isinstance(item, Shutdown) and not self._spill_count:
+            self._queue.append(item)
+        elif self.overflow == OVERFLOW_SPILL_TO_DISK and (
+            buffer_full or self._spill_count
+        ):
+            self._spill(item)
+        elif buffer_full and self.overflow == OVERFLOW_DROP_OLDEST:
+            if isinstance(self._queue[0], Shutdown):
+                self._drop(item)
+                return
+            self._drop(self._queue.popleft())
+            self._queue.append(item)
+        elif buffer_full and self.overflow == OVERFLOW_DROP_NEWEST:
+            self._drop(item)
+            return
+        else:
+            self._queue.append(item)
+
+        self.high_water_mark = max(self.high_water_mark, self.qsize())
+
+    def _get(self) -> Any:
+        if self._queue:
+            item = self._queue.popleft()
+        else:
+            item = self._unspill()
+
+        while self._spill_count and len(self._queue) < self.maxsize:
+            self._queue.append(self._unspill())
+        return item
+
+    def _drop(self, item: Any) -> None:
+        self.dropped += 1
+        logger.debug("Source queue full, dropping event %s", item)
+
+    def _spill(self, item: Any) -> None:
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="eda_spill_")
+        self._spill_file.seek(0, 2)
+        pickle.dump(item, self._spill_file, pickle.HIGHEST_PROTOCOL)
+        self._spill_count += 1
+        self.spilled += 1
+
+    def _unspill(self) -> Any:
+        self._spill_file.seek(self._spill_read_offset)
+        item = pickle.load(self._spill_file)
+        self._spill_count -= 1
+        if self._spill_count:
+            self._spill_read_offset = self._spill_file.tell()
+        else:
+            # Everything was read back, reclaim the disk space
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+            self._spill_read_offset = 0
+        return item
+
+
+class FanOutQueue:
+    """Queue of a source shared by several rulesets.
+
+    Every event put by the source is put, as the same object, on the
+    source queue of each subscribed ruleset, in the order they
+    subscribed. Each source queue applies its own size and overflow
+    policy, so the source only waits for the rulesets whose queue blocks.
+    """
+
+    def __init__(self, queues: Iterable[asyncio.Queue] = ()):
+        self.queues: List[asyncio.Queue] = list(queues)
+
+    def subscribe(self, queue: asyncio.Queue) -> None:
+        self.queues.append(queue)
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        # Rebind the list, a put in progress iterates over the old one
+        self.queues = [q for q in self.queues if q is not queue]
+
+    async def put(self, item: Any) -> None:
+        for queue in self.queues:
+            await queue.put(item)
+
+    def put_nowait(self, item: Any) -> None:
+        for queue in self.queues:
+            queue.put_nowait(item)
+
+    def qsize(self) -> int:
+        return max((queue.qsize() for queue in self.queues), default=0)
+
+    def record_restart(self) -> None:
+        for queue in self.queues:
+            record_restart = getattr(queue, "record_restart", None)
+            if record_restart:
+                record_restart()
+
+
+class SourceLane(SourceQueue):
+    """Queue of one source in a FairSourceQueue"""
+
+    def __init__(
+        self,
+        name: str,
+        weight: int,
+        on_put: Callable[[], None],
+        maxsize: int = DEFAULT_SOURCE_QUEUE_SIZE,
+        overflow: str = OVERFLOW_BLOCK,
+    ):
+        if weight < 1:
+            raise ValueError("Source weight must be at least 1")
+        super().__init__(maxsize, overflow)
+        self.name = name
+        self.weight = weight
+        self.credit = 0
+        self.dequeued = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._on_put = on_put
+        self._put_times = deque()
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats.update(
+            weight=self.weight,
+            dequeued=self.dequeued,
+            lagMs=round(self.lag * 1000, 3),
+            maxLagMs=round(self.max_lag * 1000, 3),
+        )
+        return stats
+
+    def _put(self, item: Any) -> None:
+        size = self.qsize()
+        super()._put(item)
+        if self.qsize() > size:
+            self._put_times.append(time.monotonic())
+        elif self._queue and self._queue[-1] is item:
+            # The oldest event was dropped to make room for this one
+            self._put_times.popleft()
+            self._put_times.append(time.monotonic())
+        else:
+            return
+        self._on_put()
+
+    def _get(self) -> Any:
+        item = super()._get()
+        self.dequeued += 1
+        self.lag = time.monotonic() - self._put_times.popleft()
+        self.max_lag = max(self.max_lag, self.lag)
+        return item
+
+
+class FairSourceQueue:
+    """Source queue of a ruleset with several sources.
+
+    Every source puts its events on its own SourceLane, with the size and
+    overflow policy of the ruleset, and the ruleset takes the events from
+    the lanes with weighted round robin: a lane with events gives up to
+    weight events in a row before the next lane with events gets its
+    turn. A source flooding the ruleset only fills its own lane, an event
+    from another source waits for at most the sum of the weights of the
+    other lanes.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_SOURCE_QUEUE_SIZE,
+        overflow: str = OVERFLOW_BLOCK,
+    ):
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.lanes: List[SourceLane] = []
+        self._current = 0
+        self._readable = asyncio.Event()
+
+    def add_source(self, name: str, weight: int = 1) -> SourceLane:
+        names = {lane.name for lane in self.lanes}
+        lane_name = name
+        index = 1
+        while lane_name in names:
+            index += 1
+            lane_name = f"{name}_{index}"
+        lane = SourceLane(
+            lane_name,
+            weight,
+            self._readable.set,
+            self.maxsize,
+            self.overflow,
+        )
+        self.lanes.append(lane)
+        return lane
+
+    def qsize(self) -> int:
+        return sum(lane.qsize() for lane in self.lanes)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def get_nowait(self) -> Any:
+        for _ in range(len(self.lanes)):
+            lane = self.lanes[self._current]
+            if lane.qsize() == 0:
+                lane.credit = 0
+                self._next_lane()
+                continue
+            if lane.credit == 0:
+                lane.credit = lane.weight
+            lane.credit -= 1
+            item = lane.get_nowait()
+            if lane.credit == 0 or lane.qsize() == 0:
+                lane.credit = 0
+                self._next_lane()
+            return item
+        raise asyncio.QueueEmpty
+
+    async def get(self) -> Any:
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                self._readable.clear()
+                await self._readable.wait()
+
+    def stats(self) -> Dict:
+        lanes = [lane.stats() for lane in self.lanes]
+        return {
+            "size": self.qsize(),
+            "capacity": self.maxsize * len(self.lanes),
+            "overflow": self.overflow,
+            "highWaterMark": max(
+                (lane["highWaterMark"] for lane in lanes), default=0
+            ),
+            "dropped": sum(lane["dropped"] for lane in lanes),
+            "spilled": sum(lane["spilled"] for lane in lanes),
+            "restarts": sum(lane["restarts"] for lane in lanes),
+            "sources": {
+                lane.name: stats for lane, stats in zip(self.lanes, lanes)
+            },
+        }
+
+    def close(self) -> None:
+        for lane in self.lanes:
+            lane.close()
+
+    def _next_lane(self) -> None:
+        self._current = (self._current + 1) % len(self.lanes)
@@ -26,23 +26,28 @@ import subprocess
 import sys
 import tempfile
 import typing
+from collections import ChainMap
+from collections.abc import Mapping
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import ansible_runner
 import jinja2
-from jinja2.nativetypes import NativeTemplate
+from jinja2.nativetypes import NativeEnvironment
 from packaging import version
 from packaging.version import InvalidVersion
 
 from ansible_rulebook import terminal
+from ansible_rulebook.collection import format_installed_collections
 from ansible_rulebook.conf import settings
 from ansible_rulebook.exception import (
     InvalidFilterNameException,
     InventoryNotFound,
     VaultDecryptException,
 )
+from ansible_rulebook.vault import Vault
 
 logger = logging.getLogger(__name__)
 
@@ -81,25 +86,63 @@ def decryptable(obj: Union[Dict, List, str, bool, int]) -> None:
                 raise
 
 
-def render_string(value: str, context: Dict) -> str:
-    if "{{" in value and "}}" in value:
-        value = NativeTemplate(value, undefined=jinja2.StrictUndefined).render(
-            context
-        )
+TEMPLATE_CACHE_SIZE = 1024
+
+template_environment = NativeEnvironment(undefined=jinja2.StrictUndefined)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(value: str) -> jinja2.Template:
+    return template_environment.from_string(value)
+
+
+def has_template(value: str) -> bool:
+    return "{{" in value and "}}" in value
+
+
+def needs_rendering(value: Any) -> bool:
+    """Check whether substitute_variables can change the value, i.e. it
+    contains a jinja template or a vaulted string.
+    """
+    if isinstance(value, str):
+        return has_template(value) or Vault.is_encrypted(value)
+    elif isinstance(value, list):
+        return any(needs_rendering(item) for item in value)
+    elif isinstance(value, dict):
+        return any(needs_rendering(item) for item in value.values())
+    return False
+
+
+def render_template(template: jinja2.Template, context: Mapping) -> Any:
+    """Render a native template reading the variables straight from the
+    context mapping, Template.render would copy them into a new dict.
+    """
+    ctx = template.new_context(
+        ChainMap(context, template.globals), shared=True
+    )
+    try:
+        return template.environment.concat(template.root_render_func(ctx))
+    except Exception:
+        return template.environment.handle_exception()
+
+
+def render_string(value: str, context: Mapping) -> str:
+    if has_template(value):
+        value = render_template(compile_template(value), context)
 
     if isinstance(value, str) and settings.vault.is_encrypted(value):
         value = settings.vault.decrypt(value)
     return value
 
 
-def render_string_or_return_value(value: Any, context: Dict) -> Any:
+def render_string_or_return_value(value: Any, context: Mapping) -> Any:
     if isinstance(value, str):
         return render_string(value, context)
     return value
 
 
 def substitute_variables(
-    value: Union[str, int, Dict, List], context: Dict
+    value: Union[str, int, Dict, List], context: Mapping
 ) -> Union[str, int, Dict, List]:
     if isinstance(value, str):
         return render_string_or_return_value(value, context)
@@ -117,6 +160,19 @@ def substitute_variables(
         return value
 
 
+def copy_value(
+    value: Union[str, int, Dict, List]
+) -> Union[str, int, Dict, List]:
+    """Copy the lists and dicts of a value the way substitute_variables
+    does, for values known to hold no templates.
+    """
+    if isinstance(value, list):
+        return [copy_value(item) for item in value]
+    elif isinstance(value, dict):
+        return {key: copy_value(subvalue) for key, subvalue in value.items()}
+    return value
+
+
 def collect_ansible_facts(inventory: str) -> List[Dict]:
     hosts_facts = []
     with tempfile.TemporaryDirectory(
@@ -274,19 +330,11 @@ def get_version() -> str:
 
 
 def get_installed_collections() -> Optional[str]:
-    if not settings.ansible_galaxy_path:
-        return None
     try:
-        result = subprocess.run(
-            [settings.ansible_galaxy_path, "collection", "list"],
-            check=True,
-            text=True,
-            capture_output=True,
-        )
-    except subprocess.CalledProcessError as e:
+        return format_installed_collections()
+    except OSError as e:
         logger.error("Cannot list installed collections %s", e)
         return None
-    return result.stdout
 
 
 def startup_logging(logger: logging.Logger):
@@ -411,10 +459,10 @@ def mask_sensitive_variable_values(
     Takes in a dictionary, list, or primitive of variables
     and masks the sensitive variable values if necessary
     """
-    if isinstance(obj, dict):
+    if isinstance(obj, Mapping):
         new_dict = {}
         for key, val in obj.items():
-            if isinstance(val, (dict, list)):
+            if isinstance(val, (Mapping, list)):
                 new_dict[key] = mask_sensitive_variable_values(val)
             elif isinstance(val, str):
                 new_dict[key] = _mask_sensitive_variable(key, val)
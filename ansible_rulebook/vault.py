@@ -13,11 +13,30 @@
 #  limitations under the License.
 
 import getpass
+import hmac
+import os
 import shutil
 import tempfile
+from binascii import Error as BinasciiError, unhexlify
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 import pexpect
 
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, padding
+    from cryptography.hazmat.primitives.ciphers import (
+        Cipher,
+        algorithms,
+        modes,
+    )
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
 from ansible_rulebook.exception import (
     AnsibleVaultNotFound,
     VaultDecryptException,
@@ -25,10 +44,18 @@ from ansible_rulebook.exception import (
 
 VAULT_HEADER = "$ANSIBLE_VAULT"
 b_VAULT_HEADER = b"$ANSIBLE_VAULT"
+DEFAULT_VAULT_ID = "default"
+DECRYPT_CACHE_SIZE = 256
 
 
 class Vault:
-    """Vault class allows for decryption."""
+    """Vault class allows for decryption.
+
+    AES256 vault texts are decrypted in process when the cryptography
+    package is available and every secret is a plain password. Secrets
+    that need ansible itself, like executable password files or prompt
+    vault ids, fall back to the ansible-vault command line.
+    """
 
     def __init__(
         self,
@@ -37,18 +64,25 @@ class Vault:
         vault_ids: list[str] = None,
         ask_pass: bool = False,
     ):
+        secrets = []
         cli_args = ""
         if ask_pass:
             self.secret = getpass.getpass(prompt="Vault password: ")
+            secrets.append((DEFAULT_VAULT_ID, self.secret.encode()))
             cli_args = " --ask-vault-pass"
         else:
             self.secret = None
 
         if password_file:
+            secrets.append(_file_secret(DEFAULT_VAULT_ID, password_file))
             cli_args += f" --vault-password-file {password_file}"
 
         if not vault_ids:
             vault_ids = []
+        for vid in vault_ids:
+            label, _, source = vid.rpartition("@")
+            secrets.append(_file_secret(label or DEFAULT_VAULT_ID, source))
+
         self.tempfiles = []
         for item in passwords or []:
             if item["type"] == "VaultPassword":
@@ -57,21 +91,53 @@ class Vault:
                 tmpf.flush()
                 self.tempfiles.append(tmpf)
                 vault_ids.append(f"{item['label']}@{tmpf.name}")
+                secrets.append(
+                    (item["label"], item["password"].strip().encode())
+                )
 
         for vid in vault_ids:
             cli_args += f" --vault-id {vid}"
 
+        if not HAS_CRYPTOGRAPHY or None in secrets:
+            self.secrets = None
+        else:
+            self.secrets = secrets
+
         if cli_args:
-            if not shutil.which("ansible-vault"):
+            if self.secrets is None and not shutil.which("ansible-vault"):
                 raise AnsibleVaultNotFound
             self.cli = f"ansible-vault decrypt {cli_args}"
         else:
             self.cli = None
 
+        self._decrypt = lru_cache(maxsize=DECRYPT_CACHE_SIZE)(
+            self._decrypt_uncached
+        )
+
+    def __getstate__(self) -> dict:
+        # Ruleset processes get a copy of the vault, the temporary password
+        # files stay owned by the process that created them
+        state = self.__dict__.copy()
+        state["tempfiles"] = []
+        del state["_decrypt"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._decrypt = lru_cache(maxsize=DECRYPT_CACHE_SIZE)(
+            self._decrypt_uncached
+        )
+
     def decrypt(self, vault_text: str) -> str:
         """Decrypt a vault text."""
         if not self.cli:
             raise VaultDecryptException("No vault secrets were provided")
+        return self._decrypt(vault_text)
+
+    def _decrypt_uncached(self, vault_text: str) -> str:
+        if self.secrets is not None:
+            return decrypt_aes256(vault_text, self.secrets)
+
         child = pexpect.spawn(self.cli)
         if self.secret:
             child.expect("Vault password: ")
@@ -96,8 +162,71 @@ class Vault:
     def close(self) -> None:
         for file in self.tempfiles:
             file.close()
+        self._decrypt.cache_clear()
 
 
 def has_vaulted_str(data: bytes) -> bool:
     """Check whether the data may contain ansible vault encrypted string"""
     return data.count(b_VAULT_HEADER) > 0
+
+
+def _file_secret(label: str, source: str) -> Optional[Tuple[str, bytes]]:
+    """Read a vault password file, None if only ansible can resolve it"""
+    if source == "prompt" or os.access(source, os.X_OK):
+        return None
+    try:
+        with open(source, "rb") as f:
+            return label, f.read().strip()
+    except OSError:
+        return None
+
+
+def decrypt_aes256(vault_text: str, secrets: List[Tuple[str, bytes]]) -> str:
+    """Decrypt an ansible vault 1.1/1.2 AES256 text with the first of
+    the secrets that matches its HMAC, secrets with the vault id of the
+    text are tried first.
+    """
+    lines = [line.strip() for line in vault_text.strip().splitlines()]
+    header = lines[0].split(";")
+    if (
+        len(header) < 3
+        or header[0] != VAULT_HEADER
+        or header[2].strip() != "AES256"
+    ):
+        raise VaultDecryptException("Unsupported vault format")
+    vault_id = header[3] if len(header) > 3 else None
+
+    try:
+        salt, expected_hmac, ciphertext = (
+            unhexlify(part)
+            for part in unhexlify("".join(lines[1:])).split(b"\n", 2)
+        )
+    except (BinasciiError, ValueError) as e:
+        raise VaultDecryptException(f"Malformed vault text: {e}")
+
+    candidates = sorted(secrets, key=lambda secret: secret[0] != vault_id)
+    for _, password in candidates:
+        derived = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=80,
+            salt=salt,
+            iterations=10000,
+            backend=default_backend(),
+        ).derive(password)
+        cipher_key, hmac_key, iv = derived[:32], derived[32:64], derived[64:]
+
+        digest = hmac.new(hmac_key, ciphertext, "sha256").digest()
+        if not hmac.compare_digest(digest, expected_hmac):
+            continue
+
+        decryptor = Cipher(
+            algorithms.AES(cipher_key), modes.CTR(iv), default_backend()
+        ).decryptor()
+        unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+        padded = decryptor.update(ciphertext) + decryptor.finalize()
+        plaintext = unpadder.update(padded) + unpadder.finalize()
+        return plaintext.decode()
+
+    raise VaultDecryptException(
+        "Decryption failed, no vault secrets could decrypt the text"
+    )
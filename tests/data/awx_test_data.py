@@ -77,3 +77,17 @@ JOB_1_SUCCESSFUL = dict(
     status=JOB_STATUS_SUCCESSFUL,
     artifacts=JOB_ARTIFACTS,
 )
+
+JOB_1_LIST_SLUG = f"api/v2/jobs/?id__in={JOB_ID_1}&page_size=1"
+JOB_1_LIST_RUNNING = dict(
+    count=1,
+    next=None,
+    previous=None,
+    results=[JOB_1_RUNNING],
+)
+JOB_1_LIST_SUCCESSFUL = dict(
+    count=1,
+    next=None,
+    previous=None,
+    results=[dict(job=JOB_ID_1, url=JOB_1_SLUG, status=JOB_STATUS_SUCCESSFUL)],
+)
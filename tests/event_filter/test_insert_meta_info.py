@@ -1,9 +1,11 @@
+import json
 from unittest.mock import patch
 
 import pytest
 from freezegun import freeze_time
 
 from ansible_rulebook.event_filter.insert_meta_info import main as sources_main
+from ansible_rulebook.raw_event import RawEvent
 
 DUMMY_UUID = "eb7de03f-6f8f-4943-b69e-3c90db346edf"
 DEFAULT_RECEIVED_AT = "2023-03-23T11:11:11Z"
@@ -44,3 +46,16 @@ def test_sources_main(data, args, expected):
     with patch("uuid.uuid4", return_value=DUMMY_UUID):
         data = sources_main(data, **args)
         assert data == expected
+
+
+@freeze_time("2023-03-23 11:11:11")
+@pytest.mark.parametrize("data, args, expected", EVENT_DATA_1)
+def test_sources_main_raw_event(data, args, expected):
+    event = RawEvent(json.dumps(data))
+    with patch("uuid.uuid4", return_value=DUMMY_UUID):
+        event = sources_main(event, **args)
+        if "meta" in data:
+            assert event == expected
+        else:
+            assert isinstance(event, RawEvent)
+            assert json.loads(event.to_json()) == expected
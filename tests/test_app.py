@@ -1,3 +1,4 @@
+import asyncio
 import os
 from contextlib import nullcontext as does_not_raise
 from unittest import mock
@@ -6,6 +7,8 @@ from unittest.mock import patch
 import pytest
 
 from ansible_rulebook.app import (
+    RulebookReloader,
+    RunningSources,
     load_rulebook,
     load_vars,
     run,
@@ -119,6 +122,28 @@ async def test_spawn_sources(create_ruleset):
         assert mock_start_source.call_count == 1
 
 
+@pytest.mark.asyncio
+async def test_spawn_sources_shared(create_ruleset, create_event_source):
+    rulesets = [
+        create_ruleset(name="ruleset1"),
+        create_ruleset(name="ruleset2"),
+        create_ruleset(
+            name="ruleset3",
+            event_sources=[create_event_source(source_args=dict(arg1=2))],
+        ),
+    ]
+    with mock.patch("ansible_rulebook.app.start_source") as mock_start_source:
+        tasks, ruleset_queues = spawn_sources(rulesets, dict(), ["."], 0.0)
+        for task in tasks:
+            task.cancel()
+        assert mock_start_source.call_count == 2
+        shared_queue = mock_start_source.call_args_list[0].args[3]
+        assert shared_queue.queues == [
+            ruleset_queues[0].source_queue,
+            ruleset_queues[1].source_queue,
+        ]
+
+
 @pytest.mark.asyncio
 async def test_run(create_ruleset):
     os.chdir(HERE)
@@ -185,3 +210,123 @@ async def test_failed_run_with_websocket(create_ruleset):
         with pytest.raises(WebSocketExchangeException):
             await run(cmdline_args)
         assert mock_request_workload.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_spawn_sources_fair_queue(create_ruleset, create_event_source):
+    ruleset = create_ruleset(
+        event_sources=[
+            create_event_source(name="es1"),
+            create_event_source(name="es2")._replace(weight=3),
+        ]
+    )
+    with mock.patch("ansible_rulebook.app.start_source") as mock_start_source:
+        tasks, ruleset_queues = spawn_sources([ruleset], dict(), ["."], 0.0)
+        for task in tasks:
+            task.cancel()
+    lanes = ruleset_queues[0].source_queue.lanes
+    assert [(lane.name, lane.weight) for lane in lanes] == [
+        ("es1", 1),
+        ("es2", 3),
+    ]
+    assert [
+        call.args[3].queues for call in mock_start_source.call_args_list
+    ] == [[lanes[0]], [lanes[1]]]
+
+
+@pytest.mark.asyncio
+async def test_running_sources_release(create_ruleset, create_event_source):
+    rulesets = [
+        create_ruleset(name="ruleset1"),
+        create_ruleset(name="ruleset2"),
+        create_ruleset(
+            name="ruleset3",
+            event_sources=[create_event_source(source_args=dict(arg1=2))],
+        ),
+    ]
+    with mock.patch("ansible_rulebook.app.start_source"):
+        sources = RunningSources(dict(), ["."], 0.0)
+        ruleset_queues = [sources.add_ruleset(r) for r in rulesets]
+        shared, other = sources.tasks.values()
+
+        sources.release(ruleset_queues[0].source_queue)
+        assert not shared.cancelled()
+        sources.release(ruleset_queues[2].source_queue)
+        await asyncio.sleep(0)
+        assert other.cancelled()
+        assert list(sources.tasks.values()) == [shared]
+        for task in sources.stop():
+            task.cancel()
+
+
+RELOAD_RULEBOOK = """
+---
+- name: ruleset1
+  hosts: all
+  sources:
+    - range:
+        limit: 5
+  rules:
+    - name: r1
+      condition: event.i == 1
+      action:
+        debug:
+- name: ruleset2
+  hosts: all
+  sources:
+    - range:
+        limit: {limit}
+  rules:
+    - name: r1
+      condition: event.i == {value}
+      action:
+        debug:
+"""
+
+
+@pytest.mark.asyncio
+async def test_rulebook_reloader(tmp_path):
+    rulebook = tmp_path / "rulebook.yml"
+    rulebook.write_text(RELOAD_RULEBOOK.format(limit=5, value=1))
+    parsed_args = get_parser().parse_args(["-r", str(rulebook)])
+    startup_args = StartupArgs()
+    startup_args.rulesets = load_rulebook(parsed_args, startup_args)
+
+    with mock.patch("ansible_rulebook.app.start_source") as mock_start_source:
+        sources = RunningSources(dict(), ["."], 0.0)
+        ruleset_queues = [
+            sources.add_ruleset(ruleset) for ruleset in startup_args.rulesets
+        ]
+        reloader = RulebookReloader(
+            parsed_args, startup_args, sources, ruleset_queues
+        )
+        assert await reloader.prepare() is None
+
+        # A changed rule keeps the source queue of the ruleset
+        rulebook.write_text(RELOAD_RULEBOOK.format(limit=5, value=2))
+        changes = await reloader.prepare()
+        assert changes.stopped == ["ruleset2"]
+        assert [rq.ruleset.name for rq in changes.started] == ["ruleset2"]
+        assert changes.started[0].source_queue is (
+            ruleset_queues[1].source_queue
+        )
+        reloader.commit()
+        assert mock_start_source.call_count == 1
+
+        # A changed source starts a new one for the ruleset only
+        rulebook.write_text(RELOAD_RULEBOOK.format(limit=6, value=2))
+        changes = await reloader.prepare()
+        assert changes.stopped == ["ruleset2"]
+        assert changes.started[0].source_queue is not (
+            ruleset_queues[1].source_queue
+        )
+        assert mock_start_source.call_count == 2
+        reloader.commit()
+        assert len(sources.tasks) == 2
+
+        # An invalid rulebook keeps the running rulesets
+        rulebook.write_text("- name: ruleset1")
+        assert await reloader.prepare() is None
+
+        for task in sources.stop():
+            task.cancel()
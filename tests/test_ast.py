@@ -27,6 +27,7 @@ from ansible_rulebook.exception import (
 )
 from ansible_rulebook.json_generator import (
     generate_dict_rulesets,
+    referenced_event_paths,
     visit_condition,
 )
 from ansible_rulebook.rules_parser import parse_rule_sets
@@ -682,3 +683,68 @@ def test_invalid_conditions(invalid_condition):
             parse_condition(invalid_condition),
             {},
         )
+
+
+def _ruleset(*rules):
+    return parse_rule_sets(
+        [
+            dict(
+                name="Test projection",
+                hosts="all",
+                sources=[dict(range=dict(limit=5))],
+                rules=list(rules),
+            )
+        ]
+    )[0]
+
+
+def test_referenced_event_paths():
+    ruleset = _ruleset(
+        dict(
+            name="r1",
+            condition="event.alert.status == 'firing' and event.i > vars.x",
+            action=dict(debug=None),
+        ),
+        dict(
+            name="r2",
+            condition=dict(
+                all=[
+                    "events.first << event['host-name'] is defined",
+                    "events.second << event.j == events.first.payload[0].k",
+                ]
+            ),
+            throttle=dict(
+                once_within="5 minutes", group_by_attributes=["event.job"]
+            ),
+            action=dict(debug=None),
+        ),
+        dict(
+            name="r3",
+            condition="fact.i == 1",
+            action=dict(debug=None),
+        ),
+    )
+    assert referenced_event_paths(ruleset) == {
+        "alert.status",
+        "i",
+        "['host-name']",
+        "j",
+        "payload[0].k",
+        "job",
+    }
+
+
+def test_referenced_event_paths_whole_event():
+    ruleset = _ruleset(
+        dict(
+            name="r1",
+            condition=dict(
+                all=[
+                    "events.first << event.i == 1",
+                    "events.second << event.j == events.first",
+                ]
+            ),
+            action=dict(debug=None),
+        ),
+    )
+    assert referenced_event_paths(ruleset) is None
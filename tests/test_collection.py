@@ -12,12 +12,20 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import json
+import os
+
 import pytest
 
 from ansible_rulebook.collection import (
+    COLLECTION_INDEX_FILE,
+    collection_index,
+    collection_roots,
     find_collection,
     find_playbook,
     find_source,
+    format_installed_collections,
+    has_object,
     has_playbook,
     has_rulebook,
     load_rulebook,
@@ -80,3 +88,126 @@ def test_has_playbook_missing():
 
 def test_has_playbook_missing_collection():
     assert not has_playbook(*split_collection_name("missing.eda.missing"))
+
+
+@pytest.fixture
+def collections_path(tmp_path, monkeypatch):
+    root = tmp_path / "collections" / "ansible_collections"
+    source_dir = (
+        root / "my_ns" / "my_coll" / "extensions/eda/plugins/event_source"
+    )
+    source_dir.mkdir(parents=True)
+    (source_dir / "my_source.py").write_text("")
+    (root / "my_ns" / "my_coll" / "MANIFEST.json").write_text(
+        json.dumps({"collection_info": {"version": "1.2.3"}})
+    )
+    monkeypatch.setenv(
+        "ANSIBLE_COLLECTIONS_PATH", str(tmp_path / "collections")
+    )
+    monkeypatch.setenv("ANSIBLE_COLLECTIONS_SCAN_SYS_PATH", "false")
+    monkeypatch.setenv("EDA_CACHE_DIR", str(tmp_path / "cache"))
+    collection_index.cache_clear()
+    yield root
+    collection_index.cache_clear()
+
+
+def test_collection_index(collections_path):
+    assert collection_roots() == [str(collections_path)]
+    index = collection_index()
+    collection = index["collections"]["my_ns.my_coll"]
+    assert collection["version"] == "1.2.3"
+    assert collection["sources"] == [
+        "extensions/eda/plugins/event_source/my_source.py"
+    ]
+    assert find_collection("my_ns.my_coll") == str(
+        collections_path / "my_ns" / "my_coll"
+    )
+    assert find_source("my_ns.my_coll", "my_source") is not None
+    assert "my_ns.my_coll 1.2.3" in format_installed_collections()
+
+    index_file = os.path.join(
+        os.environ["EDA_CACHE_DIR"], COLLECTION_INDEX_FILE
+    )
+    with open(index_file) as f:
+        assert json.load(f) == index
+
+
+def test_collection_index_reused(collections_path):
+    index = collection_index()
+    collection_index.cache_clear()
+
+    index_file = os.path.join(
+        os.environ["EDA_CACHE_DIR"], COLLECTION_INDEX_FILE
+    )
+    index["collections"]["my_ns.my_coll"]["version"] = "cached"
+    with open(index_file, "w") as f:
+        json.dump(index, f)
+
+    assert collection_index()["collections"]["my_ns.my_coll"]["version"] == (
+        "cached"
+    )
+
+
+def test_collection_index_invalidated(collections_path):
+    collection_index()
+    collection_index.cache_clear()
+
+    (collections_path / "my_ns" / "other_coll").mkdir()
+    os.utime(collections_path / "my_ns", ns=(0, 0))
+
+    assert "my_ns.other_coll" in collection_index()["collections"]
+
+
+def test_collection_index_collection_changed(collections_path):
+    collection_index()
+    collection_index.cache_clear()
+
+    # An upgrade in place only changes the files of the collection
+    collection = collections_path / "my_ns" / "my_coll"
+    (collection / "MANIFEST.json").write_text(
+        json.dumps({"collection_info": {"version": "1.2.4"}})
+    )
+    os.utime(collection / "MANIFEST.json", ns=(0, 0))
+    source_dir = collection / "extensions/eda/plugins/event_source"
+    (source_dir / "new_source.py").write_text("")
+    os.utime(source_dir, ns=(0, 0))
+
+    collection = collection_index()["collections"]["my_ns.my_coll"]
+    assert collection["version"] == "1.2.4"
+    assert "extensions/eda/plugins/event_source/new_source.py" in (
+        collection["sources"]
+    )
+
+
+def test_collection_index_unwritable_cache(collections_path, monkeypatch):
+    cache_file = collections_path.parent.parent / "not_a_dir"
+    cache_file.write_text("")
+    monkeypatch.setenv("EDA_CACHE_DIR", str(cache_file))
+    assert find_collection("my_ns.my_coll") is not None
+
+
+def test_collection_index_lookups(collections_path):
+    source_dir = (
+        collections_path
+        / "my_ns"
+        / "my_coll"
+        / "extensions/eda/plugins/event_source"
+    )
+    assert find_source("my_ns.my_coll", "my_source") == str(
+        source_dir / "my_source.py"
+    )
+
+    # The objects are looked up in the index, not on disk
+    stat = source_dir.stat()
+    (source_dir / "unindexed.py").write_text("")
+    os.utime(source_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert not has_object("my_ns.my_coll", "unindexed", "sources", ".py")
+
+    # The index is rebuilt on a miss when the collection changed
+    (source_dir / "new_source.py").write_text("")
+    os.utime(source_dir, ns=(0, 0))
+    assert has_object("my_ns.my_coll", "new_source", "sources", ".py")
+
+    (source_dir / "my_source.py").unlink()
+    assert not has_object("my_ns.my_coll", "my_source", "sources", ".py")
+    assert not has_object("my_ns.missing", "my_source", "sources", ".py")
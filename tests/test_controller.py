@@ -11,6 +11,7 @@
 #  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
+import asyncio
 import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -25,7 +26,9 @@ from ansible_rulebook.exception import (
 )
 
 from .data.awx_test_data import (
-    JOB_1_RUNNING,
+    JOB_1_LIST_RUNNING,
+    JOB_1_LIST_SLUG,
+    JOB_1_LIST_SUCCESSFUL,
     JOB_1_SLUG,
     JOB_1_SUCCESSFUL,
     JOB_TEMPLATE_1_LAUNCH_SLUG,
@@ -118,9 +121,14 @@ async def test_run_job_template(new_job_template_runner):
             body=json.dumps(JOB_TEMPLATE_POST_RESPONSE),
         )
         mocked.get(
-            f"{new_job_template_runner.host}{JOB_1_SLUG}",
+            f"{new_job_template_runner.host}{JOB_1_LIST_SLUG}",
+            status=200,
+            body=json.dumps(JOB_1_LIST_RUNNING),
+        )
+        mocked.get(
+            f"{new_job_template_runner.host}{JOB_1_LIST_SLUG}",
             status=200,
-            body=json.dumps(JOB_1_RUNNING),
+            body=json.dumps(JOB_1_LIST_SUCCESSFUL),
         )
         mocked.get(
             f"{new_job_template_runner.host}{JOB_1_SLUG}",
@@ -155,9 +163,14 @@ async def test_run_workflow_template(new_job_template_runner):
             body=json.dumps(JOB_TEMPLATE_POST_RESPONSE),
         )
         mocked.get(
-            f"{new_job_template_runner.host}{JOB_1_SLUG}",
+            f"{new_job_template_runner.host}{JOB_1_LIST_SLUG}",
             status=200,
-            body=json.dumps(JOB_1_RUNNING),
+            body=json.dumps(JOB_1_LIST_RUNNING),
+        )
+        mocked.get(
+            f"{new_job_template_runner.host}{JOB_1_LIST_SLUG}",
+            status=200,
+            body=json.dumps(JOB_1_LIST_SUCCESSFUL),
         )
         mocked.get(
             f"{new_job_template_runner.host}{JOB_1_SLUG}",
@@ -272,3 +285,180 @@ async def test_session_get_called_with_expected_url(
         calls = mocked_session.get.mock_calls[0]
         args = calls[1]
         assert args[0] == expected
+
+
+def _mock_template_pages(mocked, host):
+    mocked.get(
+        f"{host}{UNIFIED_JOB_TEMPLATE_PAGE1_SLUG}",
+        status=200,
+        body=json.dumps(UNIFIED_JOB_TEMPLATE_PAGE1_RESPONSE),
+    )
+    mocked.get(
+        f"{host}{UNIFIED_JOB_TEMPLATE_PAGE2_SLUG}",
+        status=200,
+        body=json.dumps(UNIFIED_JOB_TEMPLATE_PAGE2_RESPONSE),
+    )
+
+
+def _mock_job_launch(mocked, host):
+    mocked.post(
+        f"{host}{JOB_TEMPLATE_1_LAUNCH_SLUG}",
+        status=200,
+        body=json.dumps(JOB_TEMPLATE_POST_RESPONSE),
+    )
+    mocked.get(
+        f"{host}{JOB_1_LIST_SLUG}",
+        status=200,
+        body=json.dumps(JOB_1_LIST_SUCCESSFUL),
+    )
+    mocked.get(
+        f"{host}{JOB_1_SLUG}",
+        status=200,
+        body=json.dumps(JOB_1_SUCCESSFUL),
+    )
+
+
+@pytest.mark.asyncio
+async def test_run_job_template_cached(new_job_template_runner):
+    host = new_job_template_runner.host
+    with aioresponses() as mocked:
+        # The template pages are only served once
+        _mock_template_pages(mocked, host)
+        _mock_job_launch(mocked, host)
+        _mock_job_launch(mocked, host)
+
+        for _ in range(2):
+            data = await new_job_template_runner.run_job_template(
+                JOB_TEMPLATE_NAME_1, ORGANIZATION_NAME, {"a": 1}
+            )
+            assert data["status"] == "successful"
+
+
+@pytest.mark.asyncio
+async def test_template_cache_concurrent_lookups(new_job_template_runner):
+    with aioresponses() as mocked:
+        _mock_template_pages(mocked, new_job_template_runner.host)
+        await new_job_template_runner.warm_template_cache(
+            [(JOB_TEMPLATE_NAME_1, ORGANIZATION_NAME, "job_template")]
+        )
+        results = await asyncio.gather(
+            *(
+                new_job_template_runner._get_template_obj(
+                    JOB_TEMPLATE_NAME_1, ORGANIZATION_NAME, "job_template"
+                )
+                for _ in range(3)
+            )
+        )
+    assert results[0]["launch"] == JOB_TEMPLATE_1_LAUNCH_SLUG
+    assert all(result == results[0] for result in results)
+
+
+@pytest.mark.asyncio
+async def test_template_cache_expired(new_job_template_runner):
+    new_job_template_runner.template_cache_ttl = 0
+    with aioresponses() as mocked:
+        _mock_template_pages(mocked, new_job_template_runner.host)
+        await new_job_template_runner._get_template_obj(
+            JOB_TEMPLATE_NAME_1, ORGANIZATION_NAME, "job_template"
+        )
+        with pytest.raises(ControllerApiException):
+            await new_job_template_runner._get_template_obj(
+                JOB_TEMPLATE_NAME_1, ORGANIZATION_NAME, "job_template"
+            )
+
+
+@pytest.mark.asyncio
+async def test_template_cache_invalidated_on_404(new_job_template_runner):
+    host = new_job_template_runner.host
+    with aioresponses() as mocked:
+        _mock_template_pages(mocked, host)
+        mocked.post(
+            f"{host}{JOB_TEMPLATE_1_LAUNCH_SLUG}",
+            status=404,
+            body=json.dumps({"detail": "Not found."}),
+        )
+        with pytest.raises(ControllerApiException):
+            await new_job_template_runner.run_job_template(
+                JOB_TEMPLATE_NAME_1, ORGANIZATION_NAME, {"a": 1}
+            )
+
+        _mock_template_pages(mocked, host)
+        _mock_job_launch(mocked, host)
+        data = await new_job_template_runner.run_job_template(
+            JOB_TEMPLATE_NAME_1, ORGANIZATION_NAME, {"a": 1}
+        )
+        assert data["status"] == "successful"
+
+
+@pytest.mark.asyncio
+async def test_monitor_jobs_in_bulk(new_job_template_runner):
+    host = new_job_template_runner.host
+    new_job_template_runner.refresh_delay = 0.01
+    jobs = [
+        dict(url=f"api/v2/jobs/{job_id}/", status="running")
+        for job_id in (1, 2)
+    ]
+    with aioresponses() as mocked:
+        mocked.get(
+            f"{host}api/v2/jobs/?id__in=1,2&page_size=2",
+            status=200,
+            body=json.dumps(dict(results=[jobs[0], jobs[1]])),
+        )
+        mocked.get(
+            f"{host}api/v2/jobs/?id__in=1,2&page_size=2",
+            status=200,
+            body=json.dumps(
+                dict(results=[dict(jobs[0], status="failed"), jobs[1]])
+            ),
+        )
+        mocked.get(
+            f"{host}api/v2/jobs/?id__in=2&page_size=1",
+            status=200,
+            body=json.dumps(dict(results=[dict(jobs[1], status="canceled")])),
+        )
+        for job_id, status in ((1, "failed"), (2, "canceled")):
+            mocked.get(
+                f"{host}api/v2/jobs/{job_id}/",
+                status=200,
+                body=json.dumps(dict(id=job_id, status=status)),
+            )
+
+        results = await asyncio.gather(
+            new_job_template_runner._monitor_job(jobs[0]["url"]),
+            new_job_template_runner._monitor_job(jobs[1]["url"]),
+        )
+    assert results == [
+        dict(id=1, status="failed"),
+        dict(id=2, status="canceled"),
+    ]
+    assert new_job_template_runner._monitor_task is None
+
+
+@pytest.mark.asyncio
+async def test_monitor_job_error(new_job_template_runner):
+    with aioresponses() as mocked:
+        mocked.get(
+            f"{new_job_template_runner.host}{JOB_1_LIST_SLUG}",
+            exception=ClientError,
+        )
+        with pytest.raises(ControllerApiException):
+            await new_job_template_runner._monitor_job(JOB_1_SLUG)
+    assert new_job_template_runner._monitored_jobs == {}
+
+
+@pytest.mark.asyncio
+async def test_monitor_job_missing(new_job_template_runner):
+    new_job_template_runner.refresh_delay = 0.01
+    with aioresponses() as mocked:
+        mocked.get(
+            f"{new_job_template_runner.host}{JOB_1_LIST_SLUG}",
+            status=200,
+            body=json.dumps(dict(results=[])),
+            repeat=True,
+        )
+        with pytest.raises(ControllerApiException):
+            await asyncio.wait_for(
+                new_job_template_runner._monitor_job(JOB_1_SLUG), 1
+            )
+    assert new_job_template_runner._monitored_jobs == {}
+    assert new_job_template_runner._missing_jobs == set()
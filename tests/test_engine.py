@@ -13,27 +13,52 @@
 #  limitations under the License.
 
 import asyncio
+import multiprocessing
 import os
 import tempfile
 from pprint import pprint
 from unittest.mock import patch
+from urllib.parse import quote
 
 import pytest
 import yaml
 from freezegun import freeze_time
 from jsonschema.exceptions import ValidationError
 
-from ansible_rulebook.engine import run_rulesets, start_source
+from ansible_rulebook import engine, rule_generator
+from ansible_rulebook.conf import settings
+from ansible_rulebook.engine import (
+    FilteredQueue,
+    compile_filter_chain,
+    load_plugin,
+    monitor_rulebook,
+    rulebook_mtime,
+    run_rulesets,
+    start_source,
+    supervise_source,
+)
+from ansible_rulebook.engine_executor import get_engine_executor
+from ansible_rulebook.event_journal import EventJournal
 from ansible_rulebook.exception import (
+    HotReloadException,
     RulenameDuplicateException,
     SourceFilterNotFoundException,
     SourcePluginMainMissingException,
     SourcePluginNotAsyncioCompatibleException,
     SourcePluginNotFoundException,
+    SourceProcessCrashedException,
+)
+from ansible_rulebook.fact_checkpoint import (
+    FactCheckpoint,
+    fact_checkpoint_dir,
 )
 from ansible_rulebook.messages import Shutdown
+from ansible_rulebook.raw_event import RawEvent, event_view
+from ansible_rulebook.rule_set_runner import RuleSetRunner
 from ansible_rulebook.rule_types import EventSource, EventSourceFilter
 from ansible_rulebook.rules_parser import parse_rule_sets
+from ansible_rulebook.source_queue import SourceQueue
+from ansible_rulebook.util import find_builtin_filter
 from ansible_rulebook.validators import Validate
 
 
@@ -232,6 +257,219 @@ async def test_start_source_with_args(
     )
 
 
+@pytest.mark.asyncio
+async def test_start_source_restart(monkeypatch):
+    os.chdir(HERE)
+    monkeypatch.setattr(settings, "source_restart_limit", 2)
+    monkeypatch.setattr(settings, "source_restart_delay", 0)
+
+    queue = SourceQueue(10)
+    args = dict(limit=2, after=0)
+    with pytest.raises(AttributeError):
+        await start_source(
+            EventSource("fail_after", "fail_after", args, []),
+            ["sources"],
+            args,
+            queue,
+        )
+    assert queue.stats()["restarts"] == 2
+    events = [queue.get_nowait() for _ in range(3)]
+    assert [event["i"] for event in events] == [0, 0, 0]
+
+
+@pytest.mark.asyncio
+async def test_supervise_source_recovers(monkeypatch):
+    monkeypatch.setattr(settings, "source_restart_limit", 1)
+    monkeypatch.setattr(settings, "source_restart_delay", 0)
+    calls = []
+
+    async def main(queue, args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        await queue.put(dict(i=len(calls)))
+
+    queue = SourceQueue()
+    await supervise_source(
+        "flaky", main, FilteredQueue([], queue), dict(host="localhost")
+    )
+    assert calls == [dict(host="localhost")] * 2
+    assert queue.get_nowait() == dict(i=2)
+    assert queue.restarts == 1
+
+
+@pytest.mark.asyncio
+async def test_start_source_in_process(monkeypatch):
+    os.chdir(HERE)
+    queue = SourceQueue(10)
+    await start_source(
+        EventSource("range", "range", dict(limit=3), [], isolation="process"),
+        ["sources"],
+        {},
+        queue,
+    )
+    events = [event_view(queue.get_nowait()) for _ in range(3)]
+    assert [event["i"] for event in events] == [0, 1, 2]
+    assert events[0]["meta"]["source"] == dict(name="range", type="range")
+    assert isinstance(await queue.get(), Shutdown)
+
+    monkeypatch.setattr(settings, "source_restart_limit", 1)
+    monkeypatch.setattr(settings, "source_restart_delay", 0)
+    queue = SourceQueue(10)
+    args = dict(limit=2, after=0)
+    with pytest.raises(AttributeError):
+        await start_source(
+            EventSource("fail_after", "fail_after", args, [], "process"),
+            ["sources"],
+            args,
+            queue,
+        )
+    assert queue.stats()["restarts"] == 1
+    events = [event_view(queue.get_nowait()) for _ in range(2)]
+    assert [event["i"] for event in events] == [0, 0]
+
+
+@pytest.mark.asyncio
+async def test_start_source_in_process_crash(tmp_path):
+    (tmp_path / "crash.py").write_text(
+        "import os\n"
+        "async def main(queue, args):\n"
+        "    await queue.put(dict(i=0))\n"
+        "    os.kill(os.getpid(), 9)\n"
+    )
+    queue = SourceQueue(10)
+    with pytest.raises(SourceProcessCrashedException, match="exited with -9"):
+        await start_source(
+            EventSource("crash", "crash", {}, [], isolation="process"),
+            [str(tmp_path)],
+            {},
+            queue,
+        )
+    assert event_view(queue.get_nowait())["i"] == 0
+
+
+@pytest.mark.asyncio
+async def test_start_source_in_process_cancelled():
+    os.chdir(HERE)
+    queue = SourceQueue(1)
+    task = asyncio.create_task(
+        start_source(
+            EventSource("infrange", "infrange", {}, [], isolation="process"),
+            ["sources"],
+            {},
+            queue,
+        )
+    )
+    assert event_view(await queue.get())["i"] == 0
+    children = multiprocessing.active_children()
+    assert [child.name for child in children] == ["source-infrange"]
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert not children[0].is_alive()
+    assert queue not in engine.all_source_queues
+
+
+@pytest.mark.asyncio
+async def test_monitor_rulebook_changed_while_loading(tmp_path):
+    rulebook = tmp_path / "rulebook.yml"
+    rulebook.write_text("---\n")
+    loaded_mtime = rulebook_mtime(str(rulebook))
+    os.utime(rulebook, ns=(loaded_mtime + 10**9, loaded_mtime + 10**9))
+
+    with pytest.raises(HotReloadException):
+        await asyncio.wait_for(
+            monitor_rulebook(str(rulebook), loaded_mtime), 5
+        )
+
+
+def test_load_plugin(tmp_path):
+    plugin = tmp_path / "counter.py"
+    plugin.write_text(
+        "LOADS = []\nLOADS.append(1)\n\ndef main(event):\n    return 1\n"
+    )
+
+    first = load_plugin(str(plugin))
+    second = load_plugin(str(plugin))
+    assert first is second
+    assert first["main"] is second["main"]
+    assert first["LOADS"] == [1]
+    assert first["main"].__module__ == first["__name__"]
+
+    plugin.write_text("def main(event):\n    return 2\n")
+    stat = os.stat(plugin)
+    os.utime(plugin, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    reloaded = load_plugin(str(plugin))
+    assert reloaded is not first
+    assert reloaded["main"](None) == 2
+
+
+def _add(event, key, value=1):
+    event[key] = event.get(key, 0) + value
+    return event
+
+
+def test_compile_filter_chain():
+    assert compile_filter_chain([])(dict(i=0)) == dict(i=0)
+
+    chain = compile_filter_chain([(_add, dict(key="a", value=2))])
+    assert chain(dict(i=0)) == dict(i=0, a=2)
+
+    chain = compile_filter_chain(
+        [
+            (_add, dict(key="a")),
+            (_add, dict(key="b")),
+            (_add, dict(key="a")),
+        ]
+    )
+    assert chain(dict(i=0)) == dict(i=0, a=2, b=1)
+
+
+def _sequential(filters, data):
+    for f, kwargs in filters:
+        data = f(data, **(kwargs or {}))
+    return data
+
+
+@freeze_time("2025-01-01")
+def test_compile_filter_chain_fused():
+    insert_meta_info = load_plugin(
+        find_builtin_filter("eda.builtin.insert_meta_info")
+    )["main"]
+    filters = [
+        (_add, dict(key="a")),
+        (dict, None),
+        (_add, {"key": "b", "value": 3}),
+        (lambda event, **kwargs: dict(event, **kwargs), {"not-a-name": 1}),
+        (insert_meta_info, dict(source_name="s", source_type="range")),
+    ]
+    chain = compile_filter_chain(filters)
+    assert chain.__name__ == "apply_filters"
+    for event in (dict(i=0), dict(i=1, meta=dict(uuid="1"))):
+        fused = chain(dict(event, meta=dict(uuid="2")))
+        assert fused == _sequential(filters, dict(event, meta=dict(uuid="2")))
+        assert fused["meta"] == dict(
+            uuid="2",
+            source=dict(name="s", type="range"),
+            received_at="2025-01-01T00:00:00Z",
+        )
+
+
+@pytest.mark.asyncio
+async def test_filtered_queue_put_many():
+    queue = asyncio.Queue(2)
+    fqueue = FilteredQueue([(_add, dict(key="a"))], queue)
+
+    task = asyncio.create_task(fqueue.put_many([dict(i=i) for i in range(3)]))
+    await asyncio.sleep(0)
+    assert queue.qsize() == 2
+    assert not task.done()
+
+    assert queue.get_nowait() == dict(i=0, a=1)
+    await task
+    assert queue.get_nowait() == dict(i=1, a=1)
+    assert queue.get_nowait() == dict(i=2, a=1)
+
+
 @pytest.mark.asyncio
 async def test_run_rulesets():
 
@@ -286,6 +524,98 @@ async def test_run_rules_with_assignment():
     assert event_log.empty()
 
 
+async def _start_runner(rules_file, hosts_facts=()):
+    ruleset_queues, event_log = load_rulebook(rules_file)
+    (plan,) = rule_generator.generate_rulesets(ruleset_queues, dict(), dict())
+    runner = RuleSetRunner(
+        event_log=event_log,
+        ruleset_queue_plan=plan,
+        hosts_facts=list(hosts_facts),
+        variables=dict(),
+        rule_set=ruleset_queues[0][0],
+    )
+    task = asyncio.create_task(runner.run_ruleset())
+    return runner, task, ruleset_queues[0][1], event_log
+
+
+@pytest.mark.asyncio
+async def test_ruleset_runner_stop():
+    runner, task, queue, event_log = await _start_runner(
+        "rules/rules_with_assignment.yml"
+    )
+    queue.put_nowait(dict(i=0))
+    while runner.source_loop_task is None:
+        await asyncio.sleep(0)
+    await runner.stop()
+    await asyncio.wait_for(task, 5)
+
+    # The event is either posted and its rule run, or left in the queue
+    # for the next session
+    actions = []
+    while not event_log.empty():
+        event = event_log.get_nowait()
+        if event["type"] == "Action":
+            actions.append(event)
+    assert len(actions) + queue.qsize() == 1
+    assert get_engine_executor(runner.name) is None
+
+
+@pytest.mark.asyncio
+async def test_ruleset_runner_stop_while_priming():
+    runner, task, _, _ = await _start_runner("rules/rules_with_assignment.yml")
+    await asyncio.sleep(0)
+    await runner.stop()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert runner.action_loop_task is None
+    assert get_engine_executor(runner.name) is None
+
+
+@pytest.mark.asyncio
+async def test_ruleset_runner_restore_facts(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "fact_checkpoint_dir", str(tmp_path))
+    FactCheckpoint(fact_checkpoint_dir("Test journal replay")).save(
+        [dict(host="h1")]
+    )
+
+    runner, task, queue, event_log = await _start_runner(
+        "rules/test_journal_replay.yml"
+    )
+    while runner.action_loop_task is None:
+        await asyncio.sleep(0)
+    # The rule matched by the restored fact ran before the restart
+    assert runner.ruleset_queue_plan.plan.queue.empty()
+
+    queue.put_nowait(Shutdown())
+    await asyncio.wait_for(task, 5)
+    while not event_log.empty():
+        assert event_log.get_nowait()["type"] != "Action"
+
+
+@pytest.mark.asyncio
+async def test_ruleset_runner_replay_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "event_journal_dir", str(tmp_path))
+    journal = EventJournal(
+        os.path.join(str(tmp_path), quote("Test journal replay", safe=""))
+    )
+    journal.append([dict(i=1)])
+    journal.close()
+
+    runner, task, queue, event_log = await _start_runner(
+        "rules/test_journal_replay.yml", hosts_facts=[dict(host="h1")]
+    )
+    queue.put_nowait(Shutdown())
+    await asyncio.wait_for(task, 5)
+
+    # Only the rule matched by the replayed event is skipped
+    actions = []
+    while not event_log.empty():
+        event = event_log.get_nowait()
+        if event["type"] == "Action":
+            actions.append(event["rule"])
+    assert actions == ["fact rule"]
+
+
 @pytest.mark.asyncio
 async def test_run_rules_with_assignment2():
     ruleset_queues, event_log = load_rulebook(
@@ -341,6 +671,56 @@ async def test_run_rules_simple():
     assert event_log.empty()
 
 
+@pytest.mark.asyncio
+async def test_run_rules_simple_batched():
+    ruleset_queues, event_log = load_rulebook("rules/test_simple.yml")
+
+    queue = ruleset_queues[0][1]
+    queue.put_nowait(dict(i=0))
+    queue.put_nowait(dict(i=1))
+    queue.put_nowait(dict(i=2))
+    queue.put_nowait(Shutdown())
+
+    with patch.object(settings, "post_batch_size", 2), patch.object(
+        settings, "post_batch_window_ms", 10
+    ):
+        await run_rulesets(
+            event_log, ruleset_queues, dict(), "playbooks/inventory.yml"
+        )
+
+    assert event_log.get_nowait()["type"] == "Action", "0"
+    assert event_log.get_nowait()["type"] == "Action", "0.2"
+    assert event_log.get_nowait()["type"] == "Job", "1.0"
+    for i in range(9):
+        assert event_log.get_nowait()["type"] == "AnsibleEvent", f"1.{i}"
+    assert event_log.get_nowait()["type"] == "Action", "2.0"
+    assert event_log.get_nowait()["type"] == "Action", "2.1"
+    assert event_log.get_nowait()["type"] == "Shutdown", "3"
+    assert event_log.empty()
+
+
+@pytest.mark.asyncio
+async def test_run_rules_simple_raw_events():
+    ruleset_queues, event_log = load_rulebook("rules/test_simple.yml")
+
+    queue = ruleset_queues[0][1]
+    queue.put_nowait(RawEvent(b'{"i": 0}'))
+    queue.put_nowait(RawEvent(b'{"i": 1}'))
+    queue.put_nowait(RawEvent(b'{"i": 2}'))
+    queue.put_nowait(Shutdown())
+
+    await run_rulesets(
+        event_log, ruleset_queues, dict(), "playbooks/inventory.yml"
+    )
+
+    types = []
+    while not event_log.empty():
+        event = event_log.get_nowait()
+        if event["type"] != "AnsibleEvent":
+            types.append(event["type"])
+    assert types == ["Action", "Action", "Job", "Action", "Action", "Shutdown"]
+
+
 @pytest.mark.asyncio
 async def test_run_multiple_hosts():
     ruleset_queues, event_log = load_rulebook(
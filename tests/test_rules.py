@@ -26,6 +26,7 @@ from ansible_rulebook.exception import (
     RulenameEmptyException,
     RulesetNameDuplicateException,
     RulesetNameEmptyException,
+    RulesetPartitionException,
 )
 from ansible_rulebook.rule_generator import generate_rulesets
 from ansible_rulebook.rules_parser import parse_rule_sets
@@ -237,3 +238,55 @@ async def test_rule_name_substitution():
     event = durable_rulesets[0].plan.queue.get_nowait()
     assert event.rule == "fred"
     assert event.actions[0].action == "debug"
+
+
+@pytest.mark.asyncio
+async def test_partition_multiple_events():
+    os.chdir(HERE)
+    with open("rules/test_partition_multiple_events.yml") as f:
+        data = yaml.safe_load(f.read())
+
+    with pytest.raises(RulesetPartitionException) as exc_info:
+        parse_rule_sets(data)
+
+    assert str(exc_info.value) == (
+        "Ruleset sharded is partitioned by event.host, rule correlate "
+        "can't match multiple events with all"
+    )
+
+
+@pytest.mark.asyncio
+async def test_partition_throttle():
+    os.chdir(HERE)
+    with open("rules/test_partition_throttle.yml") as f:
+        data = yaml.safe_load(f.read())
+
+    with pytest.raises(RulesetPartitionException) as exc_info:
+        parse_rule_sets(data)
+
+    assert str(exc_info.value) == (
+        "Ruleset sharded is partitioned by event.meta.hosts, the throttle "
+        "of rule throttled must group by event.meta.hosts"
+    )
+
+
+def test_partition_by_required():
+    data = [
+        dict(
+            name="sharded",
+            hosts="all",
+            shards=2,
+            sources=[dict(range=dict(limit=5))],
+            rules=[
+                dict(
+                    name="r1", condition="event.i == 1", action=dict(debug={})
+                )
+            ],
+        )
+    ]
+    with pytest.raises(RulesetPartitionException) as exc_info:
+        parse_rule_sets(data)
+
+    assert str(exc_info.value) == (
+        "Ruleset sharded has 2 shards, it needs a partition_by attribute"
+    )
@@ -0,0 +1,182 @@
+#  Copyright 2025 Red Hat, Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import multiprocessing
+import os
+
+import pytest
+
+from ansible_rulebook import rule_engine as lang
+from ansible_rulebook.cli import get_parser
+from ansible_rulebook.common import StartupArgs
+from ansible_rulebook.engine_executor import run_in_engine, set_remote_engine
+from ansible_rulebook.exception import RemoteEngineCallException
+from ansible_rulebook.ruleset_process import (
+    EVENT_CREDITS,
+    MSG_ENGINE_CALL,
+    MSG_EVENT,
+    MSG_EVENT_LOG,
+    ForwardingQueue,
+    PipeSender,
+    RulesetProcess,
+    remote_engine,
+    run_rulesets_in_processes,
+)
+
+from .test_engine import load_rulebook
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_forwarding_queue():
+    parent_conn, child_conn = multiprocessing.Pipe()
+    sender = PipeSender(child_conn, "test")
+    queue = ForwardingQueue(sender)
+    asyncio.run(queue.put(dict(type="Action")))
+    queue.put_nowait(dict(type="Shutdown"))
+
+    assert parent_conn.recv() == (MSG_EVENT_LOG, dict(type="Action"))
+    assert parent_conn.recv() == (MSG_EVENT_LOG, dict(type="Shutdown"))
+    assert queue.qsize() == 0
+    sender.close()
+
+
+def test_pipe_sender_doesnt_block():
+    parent_conn, child_conn = multiprocessing.Pipe()
+    sender = PipeSender(child_conn, "test")
+    # Far more than the pipe holds, nobody reads yet
+    data = "x" * 10000
+    for i in range(100):
+        sender.send((MSG_EVENT_LOG, i, data))
+    assert [parent_conn.recv()[1] for _ in range(100)] == list(range(100))
+    sender.close()
+
+
+@pytest.mark.asyncio
+async def test_shard_credits():
+    parent_conn, child_conn = multiprocessing.Pipe()
+    shard = RulesetProcess("shard", None, parent_conn)
+    for i in range(EVENT_CREDITS):
+        await shard.send_event(dict(i=i))
+    blocked = asyncio.create_task(shard.send_event(dict(i=EVENT_CREDITS)))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    shard.add_credits(1)
+    await asyncio.wait_for(blocked, 1)
+    received = [child_conn.recv() for _ in range(EVENT_CREDITS + 1)]
+    assert received[-1] == (MSG_EVENT, dict(i=EVENT_CREDITS))
+
+    # A shard that is gone doesn't hold up the events of the others
+    shard.set_closed()
+    await asyncio.wait_for(shard.send_event(dict(i=0)), 1)
+    shard.sender.close()
+
+
+@pytest.mark.asyncio
+async def test_run_in_engine_remote():
+    calls = []
+    set_remote_engine(lambda *args: calls.append(args))
+    try:
+        await run_in_engine("remote", len, "abc")
+    finally:
+        set_remote_engine(None)
+    assert calls == [("remote", len, ("abc",))]
+
+
+class FakeSender:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append(message)
+
+
+@pytest.mark.asyncio
+async def test_run_in_engine_remote_calls():
+    sender = FakeSender()
+    set_remote_engine(remote_engine(sender))
+    try:
+        assert await run_in_engine("remote", len, "abc") == 3
+        assert (
+            await run_in_engine("remote", lang.post, "remote", {"i": 1})
+            is None
+        )
+        with pytest.raises(RemoteEngineCallException):
+            await run_in_engine("remote", lang.get_facts, "remote")
+    finally:
+        set_remote_engine(None)
+    assert sender.messages == [
+        (MSG_ENGINE_CALL, "remote", "post", ("remote", {"i": 1}))
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_rulesets_in_processes():
+    ruleset_queues, _ = load_rulebook("examples/92_ruleset_processes.yml")
+    startup_args = StartupArgs()
+    startup_args.rulesets = [ruleset for ruleset, _ in ruleset_queues]
+    parsed_args = get_parser().parse_args(
+        [
+            "-r",
+            "examples/92_ruleset_processes.yml",
+            "-S",
+            os.path.join(HERE, "sources"),
+        ]
+    )
+    event_log = asyncio.Queue()
+
+    should_reload, error_found = await run_rulesets_in_processes(
+        event_log, startup_args, parsed_args, True
+    )
+
+    assert not should_reload
+    assert not error_found
+    fired = []
+    while not event_log.empty():
+        event = event_log.get_nowait()
+        if event["type"] == "Action":
+            fired.append((event["ruleset"], event["rule"]))
+    assert ("92 ruleset processes 2", "r1") in fired
+    assert ("92 ruleset processes 1", "r2") in fired
+
+
+@pytest.mark.asyncio
+async def test_run_sharded_ruleset():
+    ruleset_queues, _ = load_rulebook("examples/93_sharded_ruleset.yml")
+    startup_args = StartupArgs()
+    startup_args.rulesets = [ruleset for ruleset, _ in ruleset_queues]
+    parsed_args = get_parser().parse_args(
+        [
+            "-r",
+            "examples/93_sharded_ruleset.yml",
+            "-S",
+            os.path.join(HERE, "sources"),
+        ]
+    )
+    event_log = asyncio.Queue()
+
+    should_reload, error_found = await run_rulesets_in_processes(
+        event_log, startup_args, parsed_args, True
+    )
+
+    assert not should_reload
+    assert not error_found
+    matched = []
+    while not event_log.empty():
+        event = event_log.get_nowait()
+        if event["type"] == "Action":
+            assert event["rule"] == "r1"
+            matched.append(event["matching_events"]["m"]["i"])
+    assert sorted(matched) == list(range(10))
@@ -13,6 +13,8 @@
 #  limitations under the License.
 
 import os
+import pickle
+from unittest.mock import patch
 
 import pytest
 
@@ -89,3 +91,38 @@ def test_decrypt_error(encrypt_world):
             myvault.decrypt(encrypt_world)
         finally:
             myvault.close()
+
+
+def test_decrypt_cached(encrypt_hello):
+    pytest.importorskip("cryptography")
+    os.chdir(HERE)
+    myvault = Vault(password_file="./pass1.txt")
+    try:
+        assert myvault.secrets is not None
+        assert myvault.decrypt(encrypt_hello) == "hello"
+        assert myvault.decrypt(encrypt_hello) == "hello"
+        cache_info = myvault._decrypt.cache_info()
+        assert (cache_info.hits, cache_info.misses) == (1, 1)
+    finally:
+        myvault.close()
+
+
+def test_decrypt_executable_password_file(tmp_path, encrypt_hello):
+    script = tmp_path / "pass.sh"
+    script.write_text("#!/bin/sh\necho pass1\n")
+    script.chmod(0o755)
+    with patch("shutil.which", return_value="/usr/bin/ansible-vault"):
+        myvault = Vault(password_file=str(script))
+    assert myvault.secrets is None
+    assert myvault.cli.startswith("ansible-vault decrypt")
+
+
+def test_vault_pickle(encrypt_hello):
+    os.chdir(HERE)
+    myvault = Vault(password_file="./pass1.txt")
+    try:
+        copy = pickle.loads(pickle.dumps(myvault))
+        assert copy.tempfiles == []
+        assert copy.decrypt(encrypt_hello) == "hello"
+    finally:
+        myvault.close()
@@ -115,6 +115,14 @@ def test_main_raise_exception(mock, ex, expected_rc, args, called):
 test_data = [
     (["-r", "helloworld.yml", "-w"]),
     (["-vv", "--id", "10"]),
+    (["-r", "helloworld.yml", "--post-batch-size", "0"]),
+    (["-r", "helloworld.yml", "--post-batch-window-ms", "-1"]),
+    (["-r", "helloworld.yml", "--plan-queue-high-watermark", "0"]),
+    (["-r", "helloworld.yml", "--plan-queue-low-watermark", "11"]),
+    (["-r", "helloworld.yml", "--source-restart-limit", "-1"]),
+    (["-r", "helloworld.yml", "--source-restart-delay", "-1"]),
+    (["-r", "helloworld.yml", "--event-journal-sync-ms", "-1"]),
+    (["-r", "helloworld.yml", "--fact-checkpoint-interval", "0"]),
 ]
 
 
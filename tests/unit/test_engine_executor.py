@@ -0,0 +1,64 @@
+import asyncio
+import threading
+
+import pytest
+
+from ansible_rulebook.engine_executor import (
+    create_engine_executor,
+    get_engine_executor,
+    remove_engine_executor,
+    run_in_engine,
+    set_executor_listener,
+)
+
+
+@pytest.mark.asyncio
+async def test_engine_executor_runs_on_own_thread():
+    loop_thread = threading.get_ident()
+    executor = create_engine_executor("test_ruleset")
+    try:
+        assert get_engine_executor("test_ruleset") is executor
+        thread = await run_in_engine("test_ruleset", threading.get_ident)
+        assert thread != loop_thread
+    finally:
+        remove_engine_executor("test_ruleset")
+    assert get_engine_executor("test_ruleset") is None
+
+
+@pytest.mark.asyncio
+async def test_engine_executor_callbacks_on_loop():
+    executor = create_engine_executor("test_ruleset")
+    delivered = asyncio.Event()
+    threads = []
+
+    def callback():
+        threads.append(threading.get_ident())
+        delivered.set()
+
+    try:
+        await executor.submit(executor.call_in_loop, callback)
+        await asyncio.wait_for(delivered.wait(), 1)
+        assert threads == [threading.get_ident()]
+
+        executor.call_in_loop(callback)
+        assert len(threads) == 2
+    finally:
+        remove_engine_executor("test_ruleset")
+
+
+@pytest.mark.asyncio
+async def test_run_in_engine_without_executor():
+    assert await run_in_engine("missing", threading.get_ident) == (
+        threading.get_ident()
+    )
+
+
+def test_executor_listener():
+    created = []
+    set_executor_listener(created.append)
+    try:
+        create_engine_executor("test_ruleset")
+    finally:
+        set_executor_listener(None)
+        remove_engine_executor("test_ruleset")
+    assert created == ["test_ruleset"]
@@ -0,0 +1,109 @@
+import os
+import time
+
+import pytest
+
+from ansible_rulebook.event_journal import (
+    DEFAULT_EVENTS_TTL,
+    EventJournal,
+    parse_events_ttl,
+)
+from ansible_rulebook.raw_event import RawEvent
+
+
+@pytest.mark.parametrize(
+    "ttl,seconds",
+    [
+        (None, DEFAULT_EVENTS_TTL),
+        ("1 second", 1),
+        ("5 minutes", 300),
+        ("2 hours", 7200),
+        ("1 day", 86400),
+    ],
+)
+def test_parse_events_ttl(ttl, seconds):
+    assert parse_events_ttl(ttl) == seconds
+
+
+def test_event_journal_replay(tmp_path):
+    journal = EventJournal(str(tmp_path))
+    journal.append([dict(i=0), dict(i=1)])
+    journal.append([dict(i=2)])
+    journal.close()
+
+    journal = EventJournal(str(tmp_path))
+    assert list(journal.replay()) == [dict(i=0), dict(i=1), dict(i=2)]
+    assert journal.stats()["replayed"] == 3
+
+
+def test_event_journal_raw_events(tmp_path):
+    event = RawEvent('{"i": 0}')
+    event.meta = dict(uuid="1", received_at="x")
+    journal = EventJournal(str(tmp_path))
+    journal.append([event])
+    journal.close()
+
+    assert list(journal.replay()) == [
+        dict(i=0, meta=dict(uuid="1", received_at="x"))
+    ]
+
+
+def test_event_journal_received_at(tmp_path):
+    journal = EventJournal(str(tmp_path))
+    journal.append(
+        [
+            dict(i=0, meta=dict(uuid="1")),
+            dict(i=1, meta=dict(received_at="x")),
+        ],
+        now=0,
+    )
+    journal.close()
+
+    assert list(journal.replay(now=1)) == [
+        dict(i=0, meta=dict(uuid="1", received_at="1970-01-01T00:00:00Z")),
+        dict(i=1, meta=dict(received_at="x")),
+    ]
+
+
+def test_event_journal_replay_ttl(tmp_path):
+    journal = EventJournal(str(tmp_path), ttl=60)
+    now = time.time()
+    journal.append([dict(i=0)], now=now - 120)
+    journal.append([dict(i=1)], now=now - 30)
+    journal.close()
+
+    assert list(journal.replay(now)) == [dict(i=1)]
+
+
+def test_event_journal_segments(tmp_path):
+    journal = EventJournal(str(tmp_path), ttl=60, segment_size=1)
+    for i in range(3):
+        journal.append([dict(i=i)])
+    assert len(journal.segments()) == 3
+
+    # Segments last written before the TTL are removed on the next one
+    expired = journal.segments()[0]
+    os.utime(expired, (time.time() - 120, time.time() - 120))
+    journal.append([dict(i=3)])
+    journal.close()
+    assert expired not in journal.segments()
+    assert [event["i"] for event in journal.replay()] == [1, 2, 3]
+
+
+def test_event_journal_torn_record(tmp_path):
+    journal = EventJournal(str(tmp_path))
+    journal.append([dict(i=0), dict(i=1)])
+    journal.close()
+    segment = journal.segments()[0]
+    os.truncate(segment, os.path.getsize(segment) - 2)
+
+    assert list(journal.replay()) == [dict(i=0)]
+
+
+def test_event_journal_sync_interval(tmp_path):
+    journal = EventJournal(str(tmp_path), sync_interval=60)
+    journal.append([dict(i=0)])
+    journal.append([dict(i=1)])
+    assert journal.syncs == 0
+    journal.close()
+    assert journal.stats() == dict(appended=2, replayed=0, syncs=1, segments=1)
@@ -0,0 +1,85 @@
+import pytest
+
+from ansible_rulebook.event_prefilter import compile_prefilter
+from ansible_rulebook.rules_parser import parse_rule_sets
+
+
+def _ruleset(*conditions):
+    return parse_rule_sets(
+        [
+            dict(
+                name="Test prefilter",
+                hosts="all",
+                sources=[dict(range=dict(limit=5))],
+                rules=[
+                    dict(
+                        name=f"r{i}", condition=condition, action=dict(noop={})
+                    )
+                    for i, condition in enumerate(conditions)
+                ],
+            )
+        ]
+    )[0]
+
+
+def test_prefilter_equality():
+    prefilter = compile_prefilter(
+        _ruleset(
+            "event.alert.status == 'firing'",
+            "event.alert.status == 'resolved' and event.severity == 2",
+            "events.m << event['host-name'] == 'h1' and event.i > 1",
+            "event.tags[0] == 'db'",
+        )
+    )
+    assert prefilter(dict(alert=dict(status="firing")))
+    assert not prefilter(dict(alert=dict(status="pending")))
+    assert prefilter(dict(alert=dict(status="resolved"), severity=2.0))
+    assert not prefilter(dict(alert=dict(status="resolved"), severity=3))
+    # The other parts of a condition are left to the rule engine
+    assert prefilter({"host-name": "h1", "i": 0})
+    assert prefilter(dict(tags=["db", "web"]))
+    assert not prefilter(dict(tags=["web"]))
+    assert not prefilter(dict(alert="firing"))
+    assert prefilter.stats() == dict(passed=4, skipped=4)
+
+
+def test_prefilter_types():
+    prefilter = compile_prefilter(_ruleset("event.i == 1"))
+    assert prefilter(dict(i=1))
+    assert not prefilter(dict(i=2))
+    # Values of another type are left to the rule engine
+    assert prefilter(dict(i="1"))
+    assert prefilter(dict(i=None))
+    assert not prefilter(dict(j=1))
+
+
+def test_prefilter_defined():
+    prefilter = compile_prefilter(
+        _ruleset(
+            dict(any=["event.a is defined or event.b == true", "event.c == 1"])
+        )
+    )
+    assert prefilter(dict(a=None))
+    assert prefilter(dict(b=True))
+    assert not prefilter(dict(b=False))
+    assert prefilter(dict(c=1))
+    assert not prefilter(dict(d=1))
+
+
+@pytest.mark.parametrize(
+    "condition",
+    [
+        dict(all=["event.i == 1", "event.j == 2"]),
+        dict(not_all=["event.i == 1"]),
+        dict(all=["event.i == 1"], timeout="10 seconds"),
+        "event.i == 1 and fact.j == 2",
+        "event.i == events.m.i",
+        "event.i != 1",
+        "not (event.i == 1)",
+        "event.i == 1 or event.j > 2",
+        "event.i == vars.i",
+        "event.s == '{{ s }}'",
+    ],
+)
+def test_prefilter_excluded(condition):
+    assert compile_prefilter(_ruleset("event.a == 1", condition)) is None
@@ -0,0 +1,78 @@
+import pytest
+
+from ansible_rulebook.event_projection import (
+    EventProjection,
+    compile_projection,
+    parse_path,
+)
+
+
+@pytest.mark.parametrize(
+    "path,keys",
+    [
+        ("i", ["i"]),
+        ("alert.status", ["alert", "status"]),
+        ("['host-name'].ip", ["host-name", "ip"]),
+        ('["a.b"]', ["a.b"]),
+        ("payload[0].k", ["payload"]),
+        ("[0]", None),
+        ("a..b", None),
+    ],
+)
+def test_parse_path(path, keys):
+    assert parse_path(path) == keys
+
+
+def test_compile_projection():
+    projection = compile_projection(["alert.status", "i", "alert", "tags[1]"])
+    event = dict(
+        i=1,
+        j=2,
+        alert=dict(status="firing", labels=dict(a=1)),
+        tags=["a", "b"],
+        meta=dict(uuid="1"),
+    )
+    assert projection(event) == dict(
+        i=1,
+        alert=dict(status="firing", labels=dict(a=1)),
+        tags=["a", "b"],
+        meta=dict(uuid="1"),
+    )
+    assert projection(dict(alert="firing")) == dict(alert="firing")
+
+    assert compile_projection(None) is None
+    assert compile_projection(["a..b"]) is None
+
+
+def test_event_projection_restore():
+    projection = EventProjection(compile_projection(["i"]), ttl=60)
+    first = dict(i=1, payload="x", meta=dict(uuid="1"))
+    second = dict(i=2, payload="y", meta=dict(uuid="2"))
+    data = dict(m_0=projection.project(first), m_1=projection.project(second))
+    assert data["m_0"] == dict(i=1, meta=dict(uuid="1"))
+
+    projection.restore(data)
+    assert data == dict(m_0=first, m_1=second)
+    assert projection.stats() == dict(
+        projected=2, stored=0, restored=2, missing=0
+    )
+
+    # The matched events are kept when a ruleset matches multiple rules
+    data = dict(m=projection.project(first))
+    projection.restore(data, consume=False)
+    projection.restore(data, consume=False)
+    assert data == dict(m=first)
+    assert projection.stats()["stored"] == 1
+
+
+def test_event_projection_ttl():
+    projection = EventProjection(compile_projection(["i"]), ttl=60)
+    data = dict(m=projection.project(dict(i=1, meta=dict(uuid="1")), now=0))
+    projection.project(dict(i=2, meta=dict(uuid="2")), now=120)
+    projection.restore(data)
+    assert data == dict(m=dict(i=1, meta=dict(uuid="1")))
+    assert projection.stats()["missing"] == 1
+
+    # Events without a uuid are posted unchanged
+    event = dict(i=3, j=4)
+    assert projection.project(event) is event
@@ -0,0 +1,76 @@
+import os
+
+from ansible_rulebook.conf import settings
+from ansible_rulebook.fact_checkpoint import (
+    MIN_COMPACTION_CHANGES,
+    FactCheckpoint,
+    has_fact_checkpoint,
+)
+
+
+def test_fact_checkpoint_restore(tmp_path):
+    checkpoint = FactCheckpoint(str(tmp_path))
+    assert checkpoint.load() is None
+
+    checkpoint.save([dict(host="h1"), dict(host="h2")])
+    checkpoint.save([dict(host="h1"), dict(host="h3"), dict(host="h3")])
+    assert checkpoint.stats() == dict(
+        facts=3, saves=2, compactions=1, loggedChanges=3
+    )
+
+    facts = FactCheckpoint(str(tmp_path)).load()
+    assert sorted(fact["host"] for fact in facts) == ["h1", "h3", "h3"]
+
+
+def test_fact_checkpoint_incremental(tmp_path):
+    checkpoint = FactCheckpoint(str(tmp_path))
+    facts = [dict(i=i) for i in range(10)]
+    checkpoint.save(facts)
+    snapshot = os.path.getmtime(checkpoint.snapshot_path)
+
+    # Unchanged facts write nothing
+    checkpoint.save(facts)
+    assert not os.path.exists(checkpoint.log_path)
+
+    checkpoint.save(facts + [dict(i=10)])
+    with open(checkpoint.log_path) as f:
+        assert f.read() == '["+",{"i":10}]\n'
+    assert os.path.getmtime(checkpoint.snapshot_path) == snapshot
+
+
+def test_fact_checkpoint_compaction(tmp_path):
+    checkpoint = FactCheckpoint(str(tmp_path))
+    checkpoint.save([])
+    log_path = checkpoint.log_path
+    facts = [dict(i=i) for i in range(MIN_COMPACTION_CHANGES)]
+    checkpoint.save(facts)
+    assert checkpoint.stats()["loggedChanges"] == MIN_COMPACTION_CHANGES
+
+    # The log holds more changes than the snapshot would hold facts
+    checkpoint.save(facts[:1])
+    assert checkpoint.stats()["compactions"] == 2
+    assert not os.path.exists(log_path)
+    assert FactCheckpoint(str(tmp_path)).load() == facts[:1]
+
+
+def test_fact_checkpoint_torn_log(tmp_path):
+    checkpoint = FactCheckpoint(str(tmp_path))
+    checkpoint.save([dict(i=0)])
+    checkpoint.save([dict(i=0), dict(i=1)])
+    with open(checkpoint.log_path, "a") as f:
+        f.write('["+",{"i"')
+
+    checkpoint = FactCheckpoint(str(tmp_path))
+    assert checkpoint.load() == [dict(i=0), dict(i=1)]
+    checkpoint.save([dict(i=1)])
+    assert FactCheckpoint(str(tmp_path)).load() == [dict(i=1)]
+
+
+def test_has_fact_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "fact_checkpoint_dir", None)
+    assert not has_fact_checkpoint("ruleset 1")
+
+    monkeypatch.setattr(settings, "fact_checkpoint_dir", str(tmp_path))
+    assert not has_fact_checkpoint("ruleset 1")
+    FactCheckpoint(str(tmp_path / "ruleset%201")).save([])
+    assert has_fact_checkpoint("ruleset 1")
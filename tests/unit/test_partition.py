@@ -0,0 +1,35 @@
+import pytest
+
+from ansible_rulebook.partition import (
+    has_partition_key,
+    partition_key,
+    shard_for,
+)
+
+
+def test_partition_key():
+    event = {"meta": {"hosts": ["h1", "h2"]}, "i": 0}
+    assert partition_key(event, "event.meta.hosts") == ["h1", "h2"]
+    assert partition_key(event, "event.i") == 0
+    assert partition_key(event, "event.meta.missing") is None
+    assert has_partition_key(event, "event.i")
+    assert not has_partition_key(event, "event.i.j")
+
+
+@pytest.mark.parametrize("shards", [2, 3, 8])
+def test_shard_for(shards):
+    events = [{"meta": {"hosts": f"host{i}"}} for i in range(100)]
+    used = {shard_for(e, "event.meta.hosts", shards) for e in events}
+    assert used == set(range(shards))
+    for event in events:
+        assert shard_for(event, "event.meta.hosts", shards) == shard_for(
+            dict(event), "event.meta.hosts", shards
+        )
+
+
+def test_shard_for_stable():
+    # The shard of a key must not depend on the process hash seed
+    assert shard_for({"host": "web1"}, "event.host", 4) == 0
+    assert shard_for({}, "event.host", 4) == shard_for(
+        {"host": None}, "event.host", 4
+    )
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from ansible_rulebook.plan_queue import PlanQueue
+
+
+@pytest.mark.asyncio
+async def test_plan_queue_watermarks():
+    queue = PlanQueue(3, 1)
+    for i in range(4):
+        queue.put_nowait(i)
+
+    waiter = asyncio.create_task(queue.wait_for_capacity())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    queue.get_nowait()
+    queue.get_nowait()
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    queue.get_nowait()
+    await asyncio.wait_for(waiter, 1)
+
+    stats = queue.stats()
+    assert stats["size"] == 1
+    assert stats["peakSize"] == 4
+    assert stats["blocked"] == 1
+    assert stats["blockedMs"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_plan_queue_below_high_watermark():
+    queue = PlanQueue(2, 0)
+    queue.put_nowait(0)
+    queue.put_nowait(1)
+    await asyncio.wait_for(queue.wait_for_capacity(), 1)
+    assert queue.stats()["blocked"] == 0
+
+
+def test_plan_queue_invalid_args():
+    with pytest.raises(ValueError):
+        PlanQueue(0)
+    with pytest.raises(ValueError):
+        PlanQueue(2, 3)
+    assert PlanQueue(4, None).low_watermark == 2
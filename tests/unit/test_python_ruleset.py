@@ -0,0 +1,180 @@
+import uuid
+
+import pytest
+from drools.rule import Rule
+
+from ansible_rulebook import rule_engine as lang
+from ansible_rulebook.conf import settings
+from ansible_rulebook.json_generator import visit_ruleset
+from ansible_rulebook.python_ruleset import PythonRuleset, jvm_features
+from ansible_rulebook.rule_generator import create_engine_ruleset
+from ansible_rulebook.rules_parser import parse_rule_sets
+
+
+def _ruleset_ast(*rules, **options):
+    ruleset = dict(
+        name=f"Test python ruleset {uuid.uuid4()}",
+        hosts="all",
+        sources=[dict(range=dict(limit=5))],
+        rules=[
+            dict(name=f"r{i}", action=dict(noop={}), **rule)
+            for i, rule in enumerate(rules)
+        ],
+        **options,
+    )
+    return visit_ruleset(parse_rule_sets([ruleset])[0], dict(limit=3))[
+        "RuleSet"
+    ]
+
+
+def _python_ruleset(*conditions):
+    ruleset_ast = _ruleset_ast(
+        *[dict(condition=condition) for condition in conditions]
+    )
+    ruleset = PythonRuleset(ruleset_ast["name"], ruleset_ast)
+    matches = []
+    for i in range(len(conditions)):
+        ruleset.add_rule(
+            Rule(f"r{i}", lambda m, i=i: matches.append((f"r{i}", m.data)))
+        )
+    return ruleset, matches
+
+
+def test_jvm_features():
+    assert jvm_features(_ruleset_ast(dict(condition="event.i == 1"))) == []
+    assert jvm_features(
+        _ruleset_ast(
+            dict(condition=dict(all=["event.i == 1"], timeout="5 seconds")),
+            dict(condition=dict(all=["event.i == 1", "event.j == 1"])),
+            dict(condition=dict(not_all=["event.i == 1"], timeout="5 sec")),
+            dict(
+                condition="event.i == 1",
+                throttle=dict(once_within="5 minutes", group_by_attributes=[]),
+            ),
+            dict(condition="event.i is not defined"),
+            dict(condition="event.l is selectattr('k', '==', 1)"),
+            dict(condition="event.i == 1", enabled=False),
+        )
+    ) == [
+        "rule r0 has a timeout",
+        "rule r1 matches several events",
+        "rule r2 has a timeout",
+        "rule r3 is throttled",
+        "rule r4 uses IsNotDefinedExpression",
+        "rule r5 uses SelectAttrExpression",
+    ]
+    assert jvm_features(
+        _ruleset_ast(dict(condition="event.i == 1"), match_multiple_rules=True)
+    ) == ["the ruleset matches multiple rules"]
+
+
+@pytest.mark.parametrize(
+    "condition,matched,unmatched",
+    [
+        ("event.i == 1", [1, 1.0], [2, "1", True, None, [1]]),
+        ("event.i != 1", [2, "1", True, None], [1, 1.0]),
+        ("event.i > 1", [2, 1.5], [1, "2", None, True]),
+        ("not (event.i > 1)", [1, None], [2, "1"]),
+        ("event.i <= vars.limit", [3, 0], [4, "3"]),
+        ("event.i", [True], [1, "true", False, None]),
+        ("not event.i", [False, 1, None], [True]),
+        ("event.i is defined", [0, None, False], []),
+        ("event.i in [1, 'a']", [1.0, "a"], [True, None, "1"]),
+        ("event.i not in [1, 'a']", [2, None], [1, "a"]),
+        ("event.i contains 1", [[2, 1], 1, [1.0]], [["1"], "1", {"1": 1}]),
+        ("event.i not contains 1", [["1"], [], {"1": 1}], [[1], 1]),
+        ("event.i is search('b', ignorecase=true)", ["aB", "b"], ["a", 1]),
+        ("event.i is match('b')", ["ba"], ["ab", "B"]),
+        ("event.i is not match('b')", ["ab", 1], ["ba"]),
+        ("event.i.k[1] == 'x'", [dict(k=["y", "x"])], [dict(k="yx"), 1]),
+        ("event.i == 1 or event.j == 1", [1], [2]),
+        ("event.i == 1 and event.j is defined", [], [1]),
+    ],
+)
+def test_python_ruleset_conditions(condition, matched, unmatched):
+    ruleset, matches = _python_ruleset(condition)
+    for value in matched + unmatched:
+        lang.post(ruleset.name, dict(i=value))
+    assert matches == [("r0", dict(m=dict(i=value))) for value in matched]
+
+    # Like drools, a missing attribute fails every test
+    matches.clear()
+    lang.post(ruleset.name, dict(j=1))
+    expected = [("r0", dict(m=dict(j=1)))] if " or " in condition else []
+    assert matches == expected
+
+
+def test_python_ruleset_events():
+    ruleset, matches = _python_ruleset(
+        "event.i == 1",
+        "event.i > 0",
+        dict(any=["event.j == 1", "events.second << event.j == 2"]),
+    )
+    for event in (dict(i=1), dict(i=2), dict(j=1), dict(j=2), dict(k=1)):
+        lang.post(ruleset.name, event)
+    assert matches == [
+        ("r0", dict(m=dict(i=1))),
+        ("r1", dict(m=dict(i=2))),
+        ("r2", dict(m_0=dict(j=1))),
+        ("r2", dict(second=dict(j=2))),
+    ]
+    stats = lang.session_stats(ruleset.name)
+    assert stats["ruleSetName"] == ruleset.name
+    assert stats["numberOfRules"] == 3
+    assert stats["rulesTriggered"] == 4
+    assert stats["eventsProcessed"] == 5
+    assert stats["eventsMatched"] == 4
+    assert stats["eventsSuppressed"] == 1
+    assert stats["lastRuleFired"] == "r2"
+    assert "end" in lang.end_session(ruleset.name)
+
+
+def test_python_ruleset_facts():
+    ruleset, matches = _python_ruleset("event.i == 1", "fact.i > 0")
+    lang.assert_fact(ruleset.name, dict(i=1, meta=dict(uuid="1")))
+    lang.assert_fact(ruleset.name, dict(i=2))
+    lang.assert_fact(ruleset.name, dict(i=1))
+    # Like drools, a fact no rule matches is not kept
+    lang.assert_fact(ruleset.name, dict(j=1))
+    assert [name for name, _ in matches] == ["r0", "r1", "r1", "r0", "r1"]
+    assert lang.get_facts(ruleset.name) == [
+        dict(i=1, meta=dict(uuid="1")),
+        dict(i=2),
+        dict(i=1),
+    ]
+    assert lang.session_stats(ruleset.name)["permanentStorageCount"] == 3
+
+    lang.retract_matching_facts(ruleset.name, dict(i=1), False, ["meta"])
+    assert lang.get_facts(ruleset.name) == [dict(i=2)]
+    lang.assert_fact(ruleset.name, dict(i=2, j=1))
+    lang.retract_matching_facts(ruleset.name, dict(i=2), True, [])
+    assert lang.get_facts(ruleset.name) == []
+    lang.assert_fact(ruleset.name, dict(i=3))
+    lang.retract_fact(ruleset.name, dict(i=3))
+    assert lang.get_facts(ruleset.name) == []
+
+
+def test_python_ruleset_matches_copy():
+    ruleset, matches = _python_ruleset("event.i == 1", "fact.i > 0")
+    event = dict(i=1, l=[1])
+    lang.post(ruleset.name, event)
+    fact = dict(i=1, l=[1])
+    lang.assert_fact(ruleset.name, fact)
+    event["l"].append(2)
+    fact["l"].append(2)
+    matches[1][1]["m"]["l"].append(3)
+    assert matches == [
+        ("r0", dict(m=dict(i=1, l=[1]))),
+        ("r0", dict(m=dict(i=1, l=[1, 3]))),
+        ("r1", dict(m=dict(i=1, l=[1]))),
+    ]
+    assert lang.get_facts(ruleset.name) == [dict(i=1, l=[1])]
+
+
+def test_create_engine_ruleset(monkeypatch):
+    ruleset_ast = _ruleset_ast(dict(condition="event.i == 1"))
+    assert isinstance(create_engine_ruleset(ruleset_ast), PythonRuleset)
+
+    monkeypatch.setattr(settings, "rule_engine", "drools")
+    ruleset_ast = _ruleset_ast(dict(condition="event.i == 1"))
+    assert not isinstance(create_engine_ruleset(ruleset_ast), PythonRuleset)
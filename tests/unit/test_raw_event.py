@@ -0,0 +1,53 @@
+import json
+import pickle
+
+import pytest
+
+from ansible_rulebook.raw_event import (
+    RawEvent,
+    event_view,
+    parse_event,
+    serialize_event,
+)
+
+
+def test_raw_event_splice_meta():
+    event = RawEvent(b' {"i": 1}\n')
+    assert not event.has_meta()
+    event.meta = dict(uuid="1")
+    assert json.loads(event.to_json()) == dict(i=1, meta=dict(uuid="1"))
+    assert event.view() == dict(i=1, meta=dict(uuid="1"))
+    # Reading the event doesn't serialize it again
+    assert event.to_json() == '{"i": 1,"meta":{"uuid": "1"}}'
+
+    event = RawEvent("{}")
+    event.meta = dict(uuid="1")
+    assert json.loads(event.to_json()) == dict(meta=dict(uuid="1"))
+
+
+def test_raw_event_parse():
+    event = RawEvent('{"i": 1, "meta": {"uuid": "1"}}')
+    assert event.has_meta()
+    parse_event(event)["j"] = 2
+    assert json.loads(event.to_json()) == dict(i=1, j=2, meta=dict(uuid="1"))
+    assert event_view(event) is event.event()
+
+
+def test_raw_event_pickle():
+    event = RawEvent('{"i": 1}')
+    event.meta = dict(uuid="1")
+    event = pickle.loads(pickle.dumps(event))
+    assert event.view() == dict(i=1, meta=dict(uuid="1"))
+
+
+def test_other_events():
+    event = dict(i=1)
+    assert event_view(event) is event
+    assert parse_event(event) is event
+    assert serialize_event(event) is event
+
+
+@pytest.mark.parametrize("data", ["[1]", '"a"', ""])
+def test_raw_event_not_object(data):
+    with pytest.raises(ValueError):
+        RawEvent(data)
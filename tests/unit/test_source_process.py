@@ -0,0 +1,106 @@
+import datetime
+import pickle
+
+import pytest
+
+from ansible_rulebook.exception import SourceProcessException
+from ansible_rulebook.raw_event import RawEvent
+from ansible_rulebook.source_process import (
+    FRAME_HEADER,
+    FRAME_JSON,
+    FRAME_PICKLE,
+    RingBuffer,
+    decode_error,
+    decode_event,
+    encode_error,
+    encode_event,
+)
+
+
+@pytest.fixture
+def ring():
+    ring = RingBuffer.create(64)
+    yield ring
+    ring.close()
+
+
+def test_ring_buffer_frames(ring):
+    assert not ring.readable()
+    assert ring.read() == []
+    assert ring.write(FRAME_JSON, b"first")
+    assert ring.write(FRAME_PICKLE, b"")
+    assert ring.readable()
+    assert ring.read() == [(FRAME_JSON, b"first"), (FRAME_PICKLE, b"")]
+    assert not ring.readable()
+
+
+def test_ring_buffer_wraps(ring):
+    payload = bytes(range(20))
+    for _ in range(10):
+        assert ring.write(FRAME_JSON, payload)
+        assert ring.write(FRAME_JSON, payload)
+        assert ring.read() == [(FRAME_JSON, payload)] * 2
+
+
+def test_ring_buffer_full(ring):
+    payload = b"x" * (32 - FRAME_HEADER.size)
+    assert ring.write(FRAME_JSON, payload)
+    assert ring.write(FRAME_JSON, payload)
+    assert not ring.write(FRAME_JSON, b"")
+    assert ring.read(limit=1) == [(FRAME_JSON, payload)]
+    assert ring.write(FRAME_JSON, payload)
+    assert ring.read() == [(FRAME_JSON, payload)] * 2
+
+    with pytest.raises(ValueError):
+        ring.write(FRAME_JSON, b"x" * 64)
+
+
+def test_ring_buffer_attach(ring):
+    reader = RingBuffer.attach(ring.name)
+    try:
+        ring.write(FRAME_JSON, b"shared")
+        ring.reader_waiting = True
+        assert reader.reader_waiting
+        assert reader.read() == [(FRAME_JSON, b"shared")]
+        assert not ring.readable()
+    finally:
+        reader.close()
+
+
+def test_encode_event():
+    event = decode_event(*encode_event(dict(i=1, j=[1, "a"])))
+    assert isinstance(event, RawEvent)
+    assert event.view() == dict(i=1, j=[1, "a"])
+
+    raw = RawEvent('{"i": 1}')
+    raw.meta = dict(uuid="1")
+    assert decode_event(*encode_event(raw)).view() == raw.view()
+
+    # Events that JSON would change are pickled
+    now = datetime.datetime.now()
+    for event in (
+        dict(at=now),
+        [1, 2],
+        {1: "a"},
+        dict(t=(1, 2)),
+        dict(x=float("nan")),
+    ):
+        kind, payload = encode_event(event)
+        assert kind == FRAME_PICKLE
+        assert repr(decode_event(kind, payload)) == repr(event)
+
+
+def test_encode_error():
+    error = decode_error(encode_error(ConnectionError("reset")))
+    assert isinstance(error, ConnectionError)
+    assert str(error) == "reset"
+
+    class LocalError(Exception):
+        pass
+
+    error = decode_error(encode_error(LocalError("local")))
+    assert isinstance(error, SourceProcessException)
+    assert str(error) == "LocalError: local"
+
+    error = decode_error(pickle.dumps(ConnectionError)[:-2])
+    assert isinstance(error, SourceProcessException)
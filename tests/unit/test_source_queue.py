@@ -0,0 +1,217 @@
+import asyncio
+
+import pytest
+
+from ansible_rulebook.messages import Shutdown
+from ansible_rulebook.source_queue import (
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_SPILL_TO_DISK,
+    FairSourceQueue,
+    FanOutQueue,
+    SourceQueue,
+)
+
+
+def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+@pytest.mark.asyncio
+async def test_source_queue_block():
+    queue = SourceQueue(2)
+    await queue.put(dict(i=0))
+    await queue.put(dict(i=1))
+    assert queue.full()
+
+    task = asyncio.create_task(queue.put(dict(i=2)))
+    await asyncio.sleep(0)
+    assert not task.done()
+
+    assert queue.get_nowait() == dict(i=0)
+    await task
+    assert drain(queue) == [dict(i=1), dict(i=2)]
+    assert queue.stats()["highWaterMark"] == 2
+
+
+@pytest.mark.parametrize(
+    "overflow, expected",
+    [
+        (OVERFLOW_DROP_OLDEST, [dict(i=2), dict(i=3)]),
+        (OVERFLOW_DROP_NEWEST, [dict(i=0), dict(i=1)]),
+    ],
+)
+@pytest.mark.asyncio
+async def test_source_queue_drop(overflow, expected):
+    queue = SourceQueue(2, overflow)
+    for i in range(4):
+        await queue.put(dict(i=i))
+
+    assert not queue.full()
+    assert queue.stats()["dropped"] == 2
+    assert drain(queue) == expected
+
+
+@pytest.mark.parametrize(
+    "overflow", [OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST]
+)
+def test_source_queue_drop_keeps_shutdown(overflow):
+    queue = SourceQueue(1, overflow)
+    queue.put_nowait(dict(i=0))
+    queue.put_nowait(Shutdown())
+    queue.put_nowait(dict(i=1))
+
+    items = drain(queue)
+    assert Shutdown() in items
+    assert len(items) == 2
+
+
+def test_source_queue_spill_to_disk():
+    queue = SourceQueue(2, OVERFLOW_SPILL_TO_DISK)
+    for i in range(5):
+        queue.put_nowait(dict(i=i))
+    assert queue.qsize() == 5
+
+    assert queue.get_nowait() == dict(i=0)
+    queue.put_nowait(dict(i=5))
+
+    assert drain(queue) == [dict(i=i) for i in range(1, 6)]
+    stats = queue.stats()
+    assert stats["spilled"] == 4
+    assert stats["highWaterMark"] == 5
+    assert stats["size"] == 0
+    queue.close()
+
+
+def test_source_queue_spill_keeps_shutdown_order():
+    queue = SourceQueue(2, OVERFLOW_SPILL_TO_DISK)
+    for i in range(4):
+        queue.put_nowait(dict(i=i))
+    queue.put_nowait(Shutdown())
+    queue.put_nowait(dict(i=4))
+
+    assert drain(queue) == [dict(i=i) for i in range(4)] + [
+        Shutdown(),
+        dict(i=4),
+    ]
+    queue.close()
+
+
+def test_source_queue_invalid_args():
+    with pytest.raises(ValueError):
+        SourceQueue(0)
+    with pytest.raises(ValueError):
+        SourceQueue(1, "bogus")
+
+
+@pytest.mark.asyncio
+async def test_fan_out_queue():
+    blocking = SourceQueue(1)
+    dropping = SourceQueue(1, OVERFLOW_DROP_NEWEST)
+    fan_out = FanOutQueue([blocking])
+    fan_out.subscribe(dropping)
+
+    event = dict(i=0)
+    await fan_out.put(event)
+    assert blocking.get_nowait() is event
+    assert dropping.qsize() == 1
+
+    # The dropping subscriber doesn't hold back the blocking one
+    await fan_out.put(dict(i=1))
+    assert dropping.stats()["dropped"] == 1
+    task = asyncio.create_task(fan_out.put(dict(i=2)))
+    await asyncio.sleep(0)
+    assert not task.done()
+    assert blocking.get_nowait() == dict(i=1)
+    await task
+    assert drain(blocking) == [dict(i=2)]
+    assert drain(dropping) == [dict(i=0)]
+
+
+@pytest.mark.asyncio
+async def test_fan_out_queue_unsubscribe():
+    queues = [SourceQueue(), SourceQueue()]
+    fan_out = FanOutQueue(queues)
+    fan_out.unsubscribe(queues[0])
+
+    await fan_out.put(dict(i=0))
+    assert drain(queues[0]) == []
+    assert drain(queues[1]) == [dict(i=0)]
+
+
+def test_fan_out_queue_record_restart():
+    queues = [SourceQueue(), SourceQueue()]
+    fan_out = FanOutQueue(queues)
+    fan_out.record_restart()
+    assert [queue.stats()["restarts"] for queue in queues] == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_fair_source_queue_weights():
+    queue = FairSourceQueue(10)
+    logs = queue.add_source("logs", weight=3)
+    health = queue.add_source("health")
+    for i in range(8):
+        await logs.put(dict(logs=i))
+    await health.put(dict(health=0))
+    await health.put(dict(health=1))
+
+    order = [next(iter(e)) for e in drain(queue)]
+    assert order == [
+        "logs",
+        "logs",
+        "logs",
+        "health",
+        "logs",
+        "logs",
+        "logs",
+        "health",
+        "logs",
+        "logs",
+    ]
+    stats = queue.stats()
+    assert stats["size"] == 0
+    assert stats["sources"]["logs"]["dequeued"] == 8
+    assert stats["sources"]["health"]["dequeued"] == 2
+    assert stats["sources"]["health"]["weight"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fair_source_queue_flooded():
+    queue = FairSourceQueue(2)
+    noisy = queue.add_source("noisy")
+    quiet = queue.add_source("quiet")
+
+    async def flood_lane():
+        for i in range(20):
+            await noisy.put(dict(i=i))
+
+    flood = asyncio.create_task(flood_lane())
+    await asyncio.sleep(0)
+    assert noisy.full()
+
+    # The quiet source is not blocked by the full lane of the noisy one
+    await asyncio.wait_for(quiet.put(dict(quiet=True)), 1)
+    taken = [await queue.get() for _ in range(3)]
+    assert dict(quiet=True) in taken
+    flood.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flood
+
+
+@pytest.mark.asyncio
+async def test_fair_source_queue_get_waits():
+    queue = FairSourceQueue()
+    lane = queue.add_source("es")
+    same_name = queue.add_source("es")
+    assert same_name.name == "es_2"
+
+    getter = asyncio.create_task(queue.get())
+    await asyncio.sleep(0)
+    assert not getter.done()
+    await same_name.put(Shutdown())
+    assert isinstance(await asyncio.wait_for(getter, 1), Shutdown)
+    assert lane.stats()["dequeued"] == 0
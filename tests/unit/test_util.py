@@ -13,9 +13,10 @@
 #  limitations under the License.
 import importlib.metadata
 import logging
-import subprocess
+from collections import ChainMap
 from unittest.mock import patch
 
+import jinja2
 import pytest
 
 from ansible_rulebook.conf import settings
@@ -25,12 +26,16 @@ from ansible_rulebook.exception import (
 )
 from ansible_rulebook.util import (
     MASKED_STRING,
+    compile_template,
+    copy_value,
     decryptable,
     get_installed_collections,
     get_package_version,
     get_version,
     has_builtin_filter,
     mask_sensitive_variable_values,
+    needs_rendering,
+    render_string,
     startup_logging,
 )
 from ansible_rulebook.vault import Vault
@@ -147,60 +152,30 @@ def test_get_package_version(caplog):
         assert "Cannot read version" in caplog.text
 
 
-@patch("ansible_rulebook.conf.settings.ansible_galaxy_path", None)
-def test_get_installed_collections_no_ansible_galaxy_path():
-    assert get_installed_collections() is None
+def test_get_installed_collections_none():
+    with patch(
+        "ansible_rulebook.util.format_installed_collections",
+        return_value=None,
+    ):
+        assert get_installed_collections() is None
 
 
-@patch(
-    "ansible_rulebook.conf.settings.ansible_galaxy_path",
-    "/path/to/ansible-galaxy",
-)
 def test_get_installed_collections_success():
-    subprocess_output = "collection1\ncollection2\n"
-    subprocess_mock = subprocess.CompletedProcess(
-        args=["/path/to/ansible-galaxy", "collection", "list"],
-        returncode=0,
-        stdout=subprocess_output,
-        stderr="",
-    )
-    subprocess_run_mock = subprocess_mock
-    subprocess_run_mock.stdout = subprocess_output
-    subprocess_run_mock.stderr = ""
-    subprocess_run_mock.check_returncode = lambda: None
-
-    with patch("subprocess.run", return_value=subprocess_run_mock) as run_mock:
-        assert get_installed_collections() == subprocess_output
-
-    run_mock.assert_called_once_with(
-        ["/path/to/ansible-galaxy", "collection", "list"],
-        check=True,
-        text=True,
-        capture_output=True,
-    )
+    output = "# /path/ansible_collections\nansible.eda 1.0.0\n"
+    with patch(
+        "ansible_rulebook.util.format_installed_collections",
+        return_value=output,
+    ):
+        assert get_installed_collections() == output
 
 
-@patch(
-    "ansible_rulebook.conf.settings.ansible_galaxy_path",
-    "/path/to/ansible-galaxy",
-)
 def test_get_installed_collections_error():
-    subprocess_error = subprocess.CalledProcessError(
-        returncode=1, cmd=["ansible-galaxy"]
-    )
-    subprocess_run_mock = subprocess_error
-    subprocess_run_mock.check_returncode = lambda: None
-
-    with patch("subprocess.run", side_effect=subprocess_run_mock) as run_mock:
+    with patch(
+        "ansible_rulebook.util.format_installed_collections",
+        side_effect=PermissionError("denied"),
+    ):
         assert get_installed_collections() is None
 
-    run_mock.assert_called_once_with(
-        [settings.ansible_galaxy_path, "collection", "list"],
-        check=True,
-        text=True,
-        capture_output=True,
-    )
-
 
 def test_startup_logging(caplog):
     logger = logging.getLogger("test_logger")
@@ -356,3 +331,56 @@ def test_startup_logging_no_collections(caplog):
 )
 def test_mask_sensitive_variable_values(extra_vars, expected):
     assert mask_sensitive_variable_values(extra_vars) == expected
+
+
+def test_render_string_cached_template():
+    compile_template.cache_clear()
+    assert render_string("{{ event.i }}", dict(event=dict(i=1))) == 1
+    assert render_string("{{ event.i }}", dict(event=dict(i=2))) == 2
+    assert render_string("plain {{", {}) == "plain {{"
+    info = compile_template.cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("Hello World", False),
+        (12, False),
+        ("This is event data {{ event.i }}", True),
+        (FRED, True),
+        ({"a": ["x", {"b": "{{ fred }}"}]}, True),
+        ({"a": ["x", {"b": "fred"}]}, False),
+    ],
+)
+def test_needs_rendering(value, expected):
+    assert needs_rendering(value) == expected
+
+
+def test_copy_value():
+    value = {"a": [1, {"b": "c"}], "d": "e"}
+    result = copy_value(value)
+    assert result == value
+    assert result is not value
+    assert result["a"] is not value["a"]
+    assert result["a"][1] is not value["a"][1]
+
+
+def test_render_string_chain_map_context():
+    variables = {"name": "fred", "items": [1, 2]}
+    context = ChainMap({"event": {"i": 3}}, variables)
+    assert render_string("{{ name }}-{{ event.i }}", context) == "fred-3"
+    assert render_string("{{ items | length }}", context) == 2
+    assert render_string("{{ range(2) | list }}", context) == [0, 1]
+    with pytest.raises(jinja2.exceptions.UndefinedError):
+        render_string("{{ event.missing.x }}", context)
+    assert variables == {"name": "fred", "items": [1, 2]}
+
+
+def test_mask_sensitive_variable_values_chain_map():
+    context = ChainMap({"event": {"i": 1}}, {"password": "secret"})
+    assert mask_sensitive_variable_values(context) == {
+        "event": {"i": 1},
+        "password": MASKED_STRING,
+    }